@@ -8,6 +8,7 @@ GIF Maker - 将多张图片转换为GIF动画
 import os
 import sys
 import argparse
+import multiprocessing
 from pathlib import Path
 from PIL import Image
 
@@ -59,6 +60,24 @@ def main():
 
   #  （0）
   python GifMaker.py -i *.png -o output.gif -l 3
+
+  # 使用4个进程并行预处理（0表示使用全部CPU核心）
+  python GifMaker.py -d ./images -o output.gif --workers 4
+
+  # 所有帧共享一份全局调色板
+  python GifMaker.py -d ./images -o output.gif --palette global
+
+  # 录屏序列：全局调色板 + 帧间差分编码
+  python GifMaker.py -d ./captures -o output.gif --palette global --delta
+
+  # 限制输出文件大小（自动选择尺寸、颜色数和抽帧间隔）
+  python GifMaker.py -d ./images -o output.gif --max-size 8MB
+
+  # 只估算输出大小和导出耗时，不写入文件
+  python GifMaker.py -d ./images -o output.gif --dry-run
+
+  # 使用磁盘帧缓存，只修改了时长或少数图片后再次导出时无需重新处理其余帧
+  python GifMaker.py -d ./images -o output.gif --cache
         """
     )
 
@@ -78,6 +97,18 @@ def main():
                         help='不优化GIF文件')
     parser.add_argument('--pattern', default='*',
                         help='目录模式匹配（当使用 -d 时），默认: *')
+    parser.add_argument('--palette', choices=['local', 'global'], default='local',
+                        help='调色板模式: local 每帧独立量化, global 共享全局调色板（色差过大时自动回退），默认: local')
+    parser.add_argument('--delta', action='store_true',
+                        help='帧间差分编码：只写出每帧变化的区域，适合录屏类序列')
+    parser.add_argument('--max-size',
+                        help='输出文件大小上限，如 8MB、500KB；自动搜索满足上限的尺寸、颜色数和抽帧间隔')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='只抽样估算输出文件大小和导出耗时（含置信区间），不生成GIF')
+    parser.add_argument('--cache', action='store_true',
+                        help='使用磁盘帧缓存保存预处理结果，再次导出相同图片时直接读取')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='并行预处理的进程数，0表示使用全部CPU核心，默认: 1（串行）')
 
     args = parser.parse_args()
 
@@ -90,6 +121,10 @@ def main():
         print("错误: 未找到任何图片文件")
         sys.exit(1)
 
+    # 动画GIF、WebP和多页TIFF的每一帧都作为单独的输入帧
+    from function.multiframe import expand_multiframe_paths
+    image_paths = expand_multiframe_paths(image_paths)
+
     print(f"找到 {len(image_paths)} 张图片:")
     for img in image_paths:
         print(f"  - {img}")
@@ -104,22 +139,65 @@ def main():
             print("错误: 尺寸格式不正确，应为 WIDTHxHEIGHT (如 800x600)")
             sys.exit(1)
 
+    max_bytes = None
+    if args.max_size:
+        from function.size_target import parse_size
+        try:
+            max_bytes = parse_size(args.max_size)
+        except ValueError as e:
+            print(f"错误: {e}")
+            sys.exit(1)
+
+    if args.dry_run:
+        from function.size_estimator import estimate_export
+        try:
+            estimate = estimate_export(image_paths, resize=resize, duration=args.duration,
+                                       palette_mode=args.palette, delta=args.delta, workers=args.workers)
+        except Exception as e:
+            print(f"错误: {e}")
+            sys.exit(1)
+        print(f"估算（抽样 {estimate['sample_count']}/{estimate['frame_count']} 帧，约95%置信区间）:")
+        print(f"  文件大小: {estimate['bytes'] / 1024:.1f} KB "
+              f"({estimate['bytes_low'] / 1024:.1f} - {estimate['bytes_high'] / 1024:.1f} KB)")
+        print(f"  导出耗时: {estimate['seconds']:.1f} s "
+              f"({estimate['seconds_low']:.1f} - {estimate['seconds_high']:.1f} s)")
+        print(f"  动画时长: {estimate['total_duration_ms'] / 1000:.1f} s")
+        return
+
+    cache = None
+    if args.cache:
+        from function.frame_cache import get_default_cache
+        cache = get_default_cache()
+
     #  GIF
     try:
-        create_gif(
-            image_paths=image_paths,
-            output_path=args.output,
+        options = dict(
             duration=args.duration,
             loop=args.loop,
             resize=resize,
-            optimize=not args.no_optimize
+            optimize=not args.no_optimize,
+            workers=args.workers,
+            palette_mode=args.palette,
+            delta=args.delta,
+            cache=cache
         )
+        if max_bytes is not None:
+            from function.size_target import export_to_size
+            export_to_size(image_paths, args.output, max_bytes, **options)
+        else:
+            create_gif(image_paths=image_paths, output_path=args.output, **options)
+        if cache is not None:
+            stats = cache.stats()
+            print(f"帧缓存: 命中 {stats['hits']}，未命中 {stats['misses']}，淘汰 {stats['evictions']}，"
+                  f"占用 {stats['total_bytes'] / 1024 / 1024:.1f} MB")
     except Exception as e:
         print(f"错误: {e}")
         sys.exit(1)
 
 
 if __name__ == '__main__':
+    # 打包为exe后子进程需要此调用才能正常启动进程池
+    multiprocessing.freeze_support()
     if len(sys.argv) > 1:
         main()
     else:
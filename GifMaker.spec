@@ -65,11 +65,32 @@ a = Analysis(
         'gui.preview',
         'gui.crop_gui',
         'gui.gifpreview_gui',
+        'gui.export_progress_gui',
         'function.file_manager',
         'function.image_utils',
         'function.crop_backup',
         'function.history_manager',
         'function.gif_operations',
+        'function.gif_writer',
+        'function.gif_blocks',
+        'function.gif_splice',
+        'function.multiframe',
+        'function.frame_pipeline',
+        'function.shared_frames',
+        'function.palette',
+        'function.frame_delta',
+        'function.frame_cache',
+        'function.size_target',
+        'function.size_estimator',
+        'function.export_task',
+        'function.frame_source',
+        'function.frame_prefetch',
+        'function.lru_cache',
+        'function.thumbnail_cache',
+        'function.thumbnail_store',
+        'function.image_metadata',
+        'function.grid_layout',
+        'function.playback_clock',
         'function.list_operations',
         'function.preview',
         'function.ui_operations',
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+帧间差分编码基准测试
+对比录屏类序列在完整帧与差分帧两种编码方式下的耗时和文件大小
+
+用法:
+    python benchmarks/bench_delta.py --frames 60 --palette global
+"""
+
+import argparse
+import io
+import os
+import tempfile
+
+from bench_utils import make_screen_frames, timed
+
+from function.gif_operations import create_gif
+
+
+def main():
+    parser = argparse.ArgumentParser(description='帧间差分编码基准测试')
+    parser.add_argument('--frames', type=int, default=60, help='测试帧数，默认: 60')
+    parser.add_argument('--size', default='1280x720', help='图片尺寸，默认: 1280x720')
+    parser.add_argument('--palette', choices=['local', 'global'], default='global',
+                        help='调色板模式，默认: global')
+    args = parser.parse_args()
+
+    size = tuple(map(int, args.size.split('x')))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_screen_frames(os.path.join(tmp, 'frames'), args.frames, size)
+
+        full_output = io.BytesIO()
+        full_time, _ = timed(create_gif, paths, full_output, palette_mode=args.palette)
+        delta_output = io.BytesIO()
+        delta_time, _ = timed(create_gif, paths, delta_output, palette_mode=args.palette, delta=True)
+
+    full_size = len(full_output.getvalue())
+    delta_size = len(delta_output.getvalue())
+    print()
+    print(f"帧数: {args.frames}  尺寸: {size}  调色板: {args.palette}")
+    print(f"完整帧: {full_time:.2f}s  {full_size / 1024:.1f} KB")
+    print(f"差分帧: {delta_time:.2f}s  {delta_size / 1024:.1f} KB")
+    print(f"体积比: {delta_size / full_size:.1%}  耗时比: {delta_time / full_time:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
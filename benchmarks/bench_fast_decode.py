@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+快速缩小解码基准测试
+对比大尺寸JPEG缩小为GIF帧时，完整解码后缩放与 draft()/reduce() 快速解码的耗时和峰值内存
+
+每种方式在独立子进程中运行，以便分别统计峰值内存（仅支持类Unix系统）。
+
+用法:
+    python benchmarks/bench_fast_decode.py --frames 16 --size 4000x3000 --resize 320x240
+"""
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_utils import make_photo_frames
+
+from PIL import Image
+
+from function.frame_pipeline import process_frame
+
+
+def full_decode_frame(img_path, resize):
+    """原始路径：按原始分辨率解码后直接缩放"""
+    with Image.open(img_path) as img:
+        return img.resize(resize, Image.Resampling.LANCZOS).convert('P', palette=Image.ADAPTIVE)
+
+
+def peak_memory_kb():
+    """
+    读取当前进程的峰值内存（KB）
+
+    优先使用 /proc 中的 VmHWM：ru_maxrss 会继承 fork 时父进程的峰值，
+    父进程生成测试图片后该值会掩盖子进程的真实峰值。
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_child(mode, directory, resize):
+    """在子进程中解码目录中的全部图片，输出耗时和峰值内存"""
+    decode = process_frame if mode == 'fast' else full_decode_frame
+    paths = sorted(os.path.join(directory, name) for name in os.listdir(directory))
+    start = time.perf_counter()
+    for path in paths:
+        decode(path, resize)
+    elapsed = time.perf_counter() - start
+    peak_kb = peak_memory_kb()
+    print(f"{elapsed} {peak_kb}")
+
+
+def measure(mode, directory, resize):
+    """启动子进程运行一种解码方式，返回 (耗时, 峰值内存MB)"""
+    output = subprocess.check_output([
+        sys.executable, os.path.abspath(__file__), '--child', mode,
+        '--dir', directory, '--resize', f"{resize[0]}x{resize[1]}"
+    ], text=True)
+    elapsed, peak_kb = output.split()
+    return float(elapsed), int(peak_kb) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description='快速缩小解码基准测试')
+    parser.add_argument('--frames', type=int, default=16, help='测试帧数，默认: 16')
+    parser.add_argument('--size', default='4000x3000', help='源图片尺寸，默认: 4000x3000')
+    parser.add_argument('--resize', default='320x240', help='输出尺寸，默认: 320x240')
+    parser.add_argument('--child', choices=['full', 'fast'], help=argparse.SUPPRESS)
+    parser.add_argument('--dir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    resize = tuple(map(int, args.resize.split('x')))
+    if args.child:
+        run_child(args.child, args.dir, resize)
+        return
+
+    size = tuple(map(int, args.size.split('x')))
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = os.path.join(tmp, 'frames')
+        make_photo_frames(directory, args.frames, size)
+        full_time, full_peak = measure('full', directory, resize)
+        fast_time, fast_peak = measure('fast', directory, resize)
+
+    print(f"帧数: {args.frames}  源尺寸: {size}  输出尺寸: {resize}")
+    print(f"完整解码: {full_time:.2f}s ({full_time / args.frames * 1000:.0f} ms/帧)  峰值内存: {full_peak:.0f} MB")
+    print(f"快速解码: {fast_time:.2f}s ({fast_time / args.frames * 1000:.0f} ms/帧)  峰值内存: {fast_peak:.0f} MB")
+    print(f"加速比: {full_time / fast_time:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+网格布局基准测试
+1. 适应窗口：对比二分查找（每次试算完整布局并重新读取所有图片尺寸）
+   与按列数直接求解缩放比例（只使用缓存的尺寸）的耗时
+2. 布局引擎：对比原有的逐张循环布局与 GridLayoutEngine 的完整布局，
+   以及插入、删除、移动一张图片后的增量更新耗时（使用合成尺寸，不读取文件）
+
+用法:
+    python benchmarks/bench_grid_layout.py --count 5000 --items 10000,100000 --canvas 1600x900
+"""
+
+import argparse
+import os
+import random
+import tempfile
+
+from bench_utils import timed
+
+import numpy as np
+from PIL import Image
+
+from function.grid_layout import GridLayoutEngine, fit_grid_scale, fits_canvas, get_grid_sizes, scale_sizes
+from function.image_metadata import get_metadata_index
+from function.image_utils import calculate_grid_layout
+
+
+def make_sized_images(directory, count):
+    """生成尺寸略有差异的小图片（只有尺寸参与布局计算）"""
+    rng = random.Random(42)
+    paths = []
+    for i in range(count):
+        size = (rng.choice((40, 40, 40, 36)), rng.choice((30, 30, 27)))
+        path = os.path.join(directory, f"img_{i:05d}.png")
+        Image.new('RGB', size, (i % 256, 128, 64)).save(path)
+        paths.append(path)
+    return paths
+
+
+def bisect_fit(image_paths, canvas_width, canvas_height):
+    """原有方法：最多20次二分，每次都重新读取所有图片尺寸并计算完整布局"""
+    min_scale, max_scale, best_scale = 0.01, 5.0, 1.0
+    for _ in range(20):
+        test_scale = (min_scale + max_scale) / 2
+        get_metadata_index().invalidate()
+        layout = calculate_grid_layout(image_paths, {}, test_scale,
+                                       canvas_width=canvas_width, canvas_height=canvas_height)
+        max_x = max(item['position'][0] + item['size'][0] for item in layout)
+        max_y = max(item['position'][1] + item['size'][1] for item in layout)
+        if max_x <= canvas_width - 10 and max_y <= canvas_height - 10:
+            best_scale = min_scale = test_scale
+        else:
+            max_scale = test_scale
+        if max_scale - min_scale < 0.001:
+            break
+    return best_scale
+
+
+def loop_layout(sizes, scale, canvas_width, padding=10):
+    """原有方法：逐张图片循环计算列宽、行高和坐标，返回 (x, y) 列表"""
+    display_sizes = [(w, h) if scale == 1.0 else (int(w * scale), int(h * scale)) for w, h in sizes]
+    avg_width = sum(size[0] for size in display_sizes) / len(display_sizes)
+    cols = max(1, int(canvas_width / (avg_width + padding)))
+    rows = (len(display_sizes) + cols - 1) // cols
+    col_widths = [0] * cols
+    row_heights = [0] * rows
+    for i, (width, height) in enumerate(display_sizes):
+        col_widths[i % cols] = max(col_widths[i % cols], width)
+        row_heights[i // cols] = max(row_heights[i // cols], height)
+    col_positions = [padding]
+    for i in range(1, cols):
+        col_positions.append(col_positions[-1] + col_widths[i - 1] + padding)
+    row_positions = [padding]
+    for i in range(1, rows):
+        row_positions.append(row_positions[-1] + row_heights[i - 1] + padding)
+    return [(col_positions[i % cols], row_positions[i // cols]) for i in range(len(display_sizes))]
+
+
+def bench_engine(count, canvas_width, scale=0.25):
+    """测试 count 张图片的完整布局和增量更新耗时"""
+    rng = np.random.default_rng(42)
+    sizes = np.stack((rng.integers(600, 1000, count), rng.integers(400, 800, count)), axis=1)
+    paths = [f"img_{i:06d}.png" for i in range(count)]
+    size_list = sizes.tolist()
+
+    loop_time, loop_positions = timed(loop_layout, size_list, scale, canvas_width, repeat=3)
+
+    def full_layout():
+        engine = GridLayoutEngine(scale, canvas_width)
+        engine.insert(0, list(paths), sizes)
+        return engine
+    engine_time, engine = timed(full_layout, repeat=3)
+    same = engine.positions().tolist() == [list(p) for p in loop_positions]
+
+    middle = count // 2
+    insert_time, _ = timed(engine.insert, middle, ['extra.png'], [[800, 600]], repeat=1)
+    delete_time, _ = timed(engine.delete, [middle], repeat=1)
+    move_time, _ = timed(engine.move, count - 10, count - 20, repeat=1)
+    dicts_time, _ = timed(engine.layout, repeat=3)
+
+    print()
+    print(f"图片数: {count}  缩放: {scale}  列数: {engine.cols}  结果一致: {same}")
+    print(f"逐张循环布局:   {loop_time * 1000:.1f}ms")
+    print(f"引擎完整布局:   {engine_time * 1000:.1f}ms ({loop_time / engine_time:.1f}x)")
+    print(f"中间插入一张:   {insert_time * 1000:.2f}ms")
+    print(f"中间删除一张:   {delete_time * 1000:.2f}ms")
+    print(f"末尾附近移动:   {move_time * 1000:.2f}ms")
+    print(f"生成布局字典:   {dicts_time * 1000:.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='网格布局基准测试')
+    parser.add_argument('--count', type=int, default=5000, help='图片数量，默认: 5000')
+    parser.add_argument('--items', default='10000,100000', help='布局引擎测试的图片数量（逗号分隔），默认: 10000,100000')
+    parser.add_argument('--canvas', default='1600x900', help='Canvas尺寸，默认: 1600x900')
+    args = parser.parse_args()
+
+    canvas_width, canvas_height = map(int, args.canvas.split('x'))
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"生成 {args.count} 张测试图片...")
+        paths = make_sized_images(directory, args.count)
+
+        bisect_time, bisect_scale = timed(bisect_fit, paths, canvas_width, canvas_height)
+        sizes_time, sizes = timed(get_grid_sizes, paths)
+        solve_time, solved_scale = timed(fit_grid_scale, sizes, canvas_width, canvas_height, repeat=5)
+
+    fits = solved_scale is not None and fits_canvas(scale_sizes(sizes, solved_scale), canvas_width, canvas_height)
+    print()
+    print(f"图片数: {args.count}  Canvas: {canvas_width}x{canvas_height}")
+    print(f"二分查找（每次重新读取尺寸）: {bisect_time * 1000:.1f}ms  缩放比例: {bisect_scale:.4f}")
+    print(f"读取缓存的尺寸: {sizes_time * 1000:.1f}ms")
+    print(f"直接求解: {solve_time * 1000:.2f}ms  缩放比例: {solved_scale}  完整显示: {fits}")
+
+    for count in map(int, args.items.split(',')):
+        bench_engine(count, canvas_width)
+
+
+if __name__ == '__main__':
+    main()
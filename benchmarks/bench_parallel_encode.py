@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+并行编码基准测试
+对比进程池只做预处理（主进程逐帧LZW编码）与预处理和编码都在进程池中完成的耗时，
+并检查两种方式的输出字节完全相同
+
+用法:
+    python benchmarks/bench_parallel_encode.py --frames 64 --workers 0
+"""
+
+import argparse
+import io
+import os
+import tempfile
+
+from bench_utils import make_photo_frames, timed
+
+from function.frame_pipeline import iter_processed_frames, resolve_workers, get_worker_pool, shutdown_worker_pool
+from function.gif_writer import EncodedFrame, GifStreamWriter
+
+
+def export(paths, size, workers, encode):
+    """按指定方式导出到内存，返回GIF字节"""
+    output = io.BytesIO()
+    writer = GifStreamWriter(output, size=size)
+    for _, frame, error in iter_processed_frames(paths, size, workers, encode=encode):
+        if error is not None:
+            raise error
+        if isinstance(frame, EncodedFrame):
+            writer.add_encoded_frame(frame, duration=100)
+        else:
+            writer.add_frame(frame, duration=100)
+    writer.close()
+    return output.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='并行编码基准测试')
+    parser.add_argument('--frames', type=int, default=64, help='测试帧数，默认: 64')
+    parser.add_argument('--size', default='1920x1080', help='源图片尺寸，默认: 1920x1080')
+    parser.add_argument('--resize', default='1280x720', help='输出尺寸，默认: 1280x720')
+    parser.add_argument('--workers', type=int, default=0, help='并行进程数，0表示全部CPU核心')
+    args = parser.parse_args()
+
+    size = tuple(map(int, args.size.split('x')))
+    resize = tuple(map(int, args.resize.split('x')))
+    workers = resolve_workers(args.workers)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_photo_frames(os.path.join(tmp, 'frames'), args.frames, size)
+
+        # 预热进程池，模拟多次导出之间复用进程池的场景
+        get_worker_pool(workers)
+        export(paths[:workers], resize, workers, encode=True)
+        serial_encode_time, serial_data = timed(export, paths, resize, workers, False)
+        parallel_encode_time, parallel_data = timed(export, paths, resize, workers, True)
+        shutdown_worker_pool()
+
+    print()
+    print(f"帧数: {args.frames}  源尺寸: {size}  输出尺寸: {resize}  进程数: {workers}  CPU: {os.cpu_count()}")
+    print(f"主进程编码: {serial_encode_time:.2f}s ({args.frames / serial_encode_time:.1f} 帧/秒)")
+    print(f"进程池编码: {parallel_encode_time:.2f}s ({args.frames / parallel_encode_time:.1f} 帧/秒)")
+    print(f"加速比: {serial_encode_time / parallel_encode_time:.2f}x")
+    print(f"输出字节相同: {serial_data == parallel_data}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+并行预处理基准测试
+对比 create_gif 串行路径与进程池并行预处理的耗时
+
+用法:
+    python benchmarks/bench_parallel_preprocess.py --frames 64 --workers 0
+"""
+
+import argparse
+import io
+import os
+import tempfile
+
+from bench_utils import make_photo_frames, timed
+
+from function.gif_operations import create_gif
+from function.frame_pipeline import resolve_workers, get_worker_pool, shutdown_worker_pool
+
+
+def main():
+    parser = argparse.ArgumentParser(description='并行预处理基准测试')
+    parser.add_argument('--frames', type=int, default=64, help='测试帧数，默认: 64')
+    parser.add_argument('--size', default='1920x1080', help='源图片尺寸，默认: 1920x1080')
+    parser.add_argument('--resize', default='640x360', help='输出尺寸，默认: 640x360')
+    parser.add_argument('--workers', type=int, default=0, help='并行进程数，0表示全部CPU核心')
+    args = parser.parse_args()
+
+    size = tuple(map(int, args.size.split('x')))
+    resize = tuple(map(int, args.resize.split('x')))
+    workers = resolve_workers(args.workers)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_photo_frames(os.path.join(tmp, 'frames'), args.frames, size)
+
+        serial_time, _ = timed(create_gif, paths, io.BytesIO(), resize=resize, workers=1)
+
+        # 预热进程池，模拟多次导出之间复用进程池的场景
+        get_worker_pool(workers)
+        create_gif(paths[:workers], io.BytesIO(), resize=resize, workers=workers)
+        parallel_time, _ = timed(create_gif, paths, io.BytesIO(), resize=resize, workers=workers)
+        shutdown_worker_pool()
+
+    print()
+    print(f"帧数: {args.frames}  源尺寸: {size}  输出尺寸: {resize}  CPU: {os.cpu_count()}")
+    print(f"串行:          {serial_time:.2f}s ({args.frames / serial_time:.1f} 帧/秒)")
+    print(f"并行({workers}进程): {parallel_time:.2f}s ({args.frames / parallel_time:.1f} 帧/秒)")
+    print(f"加速比: {serial_time / parallel_time:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
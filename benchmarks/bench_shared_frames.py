@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+共享内存帧传输基准测试
+对比进程池工作进程把大尺寸调色板帧 pickle 传回主进程与写入共享内存槽位的耗时
+
+工作进程只生成帧（复用预先生成的噪声画面），主进程读取每帧的全部像素，
+因此耗时差异主要来自帧数据的传输方式。
+
+用法:
+    python benchmarks/bench_shared_frames.py --frames 64 --size 3840x2160 --workers 0
+"""
+
+import argparse
+import os
+from collections import deque
+
+from bench_utils import timed
+
+from PIL import Image
+
+from function.frame_pipeline import RING_SPARE_SLOTS, resolve_workers, get_worker_pool, shutdown_worker_pool
+from function.shared_frames import SharedFrame, SharedFrameRing, write_shared_frame
+
+
+# 工作进程中按尺寸缓存的噪声画面
+_noise = {}
+
+
+def make_frame(size, shared=None):
+    """在工作进程中生成一帧调色板帧，指定 shared 时写入共享内存槽位"""
+    frame = _noise.get(size)
+    if frame is None:
+        frame = Image.effect_noise(size, 64).convert('P', palette=Image.ADAPTIVE)
+        _noise[size] = frame
+    return write_shared_frame(frame, shared)
+
+
+def transfer(pool, count, size, ring=None, depth=8):
+    """按顺序取回 count 帧并读取像素，返回像素校验和"""
+    pending = deque()
+    checksum = 0
+    submitted = 0
+    while submitted < count or pending:
+        while submitted < count and len(pending) < depth:
+            slot = ring.acquire() if ring is not None else None
+            pending.append(pool.submit(make_frame, size, ring.task_args(slot) if slot is not None else None))
+            submitted += 1
+        frame = pending.popleft().result()
+        if isinstance(frame, SharedFrame):
+            frame = ring.open(frame)
+        checksum += frame.getextrema()[1]
+        del frame
+    return checksum
+
+
+def main():
+    parser = argparse.ArgumentParser(description='共享内存帧传输基准测试')
+    parser.add_argument('--frames', type=int, default=64, help='测试帧数，默认: 64')
+    parser.add_argument('--size', default='3840x2160', help='帧尺寸，默认: 3840x2160')
+    parser.add_argument('--workers', type=int, default=0, help='并行进程数，0表示全部CPU核心')
+    args = parser.parse_args()
+
+    size = tuple(map(int, args.size.split('x')))
+    workers = resolve_workers(args.workers)
+    depth = workers * 2
+    pool = get_worker_pool(workers)
+
+    # 预热：每个工作进程生成噪声画面
+    transfer(pool, depth, size, depth=depth)
+    pickle_time, pickle_sum = timed(transfer, pool, args.frames, size, depth=depth, repeat=3)
+
+    ring = SharedFrameRing(depth + RING_SPARE_SLOTS, size[0] * size[1])
+    try:
+        transfer(pool, depth, size, ring, depth)
+        shared_time, shared_sum = timed(transfer, pool, args.frames, size, ring, depth, repeat=3)
+    finally:
+        ring.close()
+        shutdown_worker_pool()
+
+    megabytes = args.frames * size[0] * size[1] / 1024 / 1024
+    print()
+    print(f"帧数: {args.frames}  帧尺寸: {size}  进程数: {workers}  CPU: {os.cpu_count()}")
+    print(f"pickle 传输: {pickle_time:.2f}s ({megabytes / pickle_time:.0f} MB/秒)")
+    print(f"共享内存:    {shared_time:.2f}s ({megabytes / shared_time:.0f} MB/秒)")
+    print(f"加速比: {pickle_time / shared_time:.2f}x  结果一致: {pickle_sum == shared_sum}")
+
+
+if __name__ == '__main__':
+    main()
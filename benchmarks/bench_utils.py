@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+基准测试公共工具
+生成合成测试图片、计时等
+"""
+
+import os
+import sys
+import time
+import random
+
+# 添加项目根目录到系统路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw
+
+
+def make_photo_frames(directory, count, size=(1920, 1080), ext='.jpg'):
+    """
+    生成类似照片的测试图片（渐变背景 + 随机色块）
+
+    Args:
+        directory: 输出目录
+        count: 图片数量
+        size: 图片尺寸
+        ext: 文件扩展名
+
+    Returns:
+        图片路径列表
+    """
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(42)
+    width, height = size
+    gradient = Image.linear_gradient('L').resize(size)
+    paths = []
+    for i in range(count):
+        img = Image.merge('RGB', (gradient, gradient.rotate(90, expand=False), Image.new('L', size, (i * 7) % 256)))
+        draw = ImageDraw.Draw(img)
+        for _ in range(20):
+            x, y = rng.randrange(width), rng.randrange(height)
+            color = tuple(rng.randrange(256) for _ in range(3))
+            draw.ellipse((x, y, x + width // 8, y + height // 8), fill=color)
+        path = os.path.join(directory, f"photo_{i:04d}{ext}")
+        img.save(path, quality=90) if ext == '.jpg' else img.save(path)
+        paths.append(path)
+    return paths
+
+
+def make_screen_frames(directory, count, size=(1280, 720), ext='.png'):
+    """
+    生成类似屏幕录制的测试图片（静态界面 + 小范围变化的光标和文字）
+
+    Args:
+        directory: 输出目录
+        count: 图片数量
+        size: 图片尺寸
+        ext: 文件扩展名
+
+    Returns:
+        图片路径列表
+    """
+    os.makedirs(directory, exist_ok=True)
+    width, height = size
+    base = Image.new('RGB', size, (240, 240, 240))
+    draw = ImageDraw.Draw(base)
+    draw.rectangle((0, 0, width, 40), fill=(45, 45, 60))
+    draw.rectangle((0, 40, 220, height), fill=(225, 228, 235))
+    for row in range(12):
+        draw.text((240, 60 + row * 40), f"Line {row}: the quick brown fox", fill=(30, 30, 30))
+    paths = []
+    for i in range(count):
+        img = base.copy()
+        draw = ImageDraw.Draw(img)
+        x = 250 + (i * 9) % (width - 300)
+        draw.rectangle((x, 560, x + 60, 590), fill=(30, 120, 220))
+        draw.text((250, 620), f"frame {i}", fill=(200, 30, 30))
+        path = os.path.join(directory, f"screen_{i:04d}{ext}")
+        img.save(path)
+        paths.append(path)
+    return paths
+
+
+def timed(func, *args, repeat=1, **kwargs):
+    """
+    多次执行函数并返回最短耗时
+
+    Returns:
+        (最短耗时秒数, 最后一次的返回值)
+    """
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best, result
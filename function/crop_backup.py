@@ -499,19 +499,15 @@ def find_smallest_image_path(image_paths):
     min_path = image_paths[0]
     min_index = 0
 
-    for i, path in enumerate(image_paths):
-        try:
-            from PIL import Image
-            img = Image.open(path)
-            width, height = img.size
-            size = width * height
-            if size < min_size:
-                min_size = size
-                min_path = path
-                min_index = i
-        except Exception as e:
-            print(f"无法读取图片尺寸 {path}: {e}")
+    from .image_metadata import get_metadata_index
+    for i, metadata in enumerate(get_metadata_index().get_many(image_paths)):
+        if metadata is None:
             continue
+        size = metadata.width * metadata.height
+        if size < min_size:
+            min_size = size
+            min_path = image_paths[i]
+            min_index = i
 
     return min_path, min_index
 
@@ -637,19 +633,15 @@ def determine_crop_strategy(image_paths: List[str], current_index: int) -> Tuple
         min_path = image_paths[0]
         min_index = 0
 
-        for i, path in enumerate(image_paths):
-            try:
-                from PIL import Image
-                img = Image.open(path)
-                width, height = img.size
-                size = width * height
-                if size < min_size:
-                    min_size = size
-                    min_path = path
-                    min_index = i
-            except Exception as e:
-                print(f"无法读取图片尺寸 {path}: {e}")
+        from .image_metadata import get_metadata_index
+        for i, metadata in enumerate(get_metadata_index().get_many(image_paths)):
+            if metadata is None:
                 continue
+            size = metadata.width * metadata.height
+            if size < min_size:
+                min_size = size
+                min_path = image_paths[i]
+                min_index = i
 
         current_image_path = min_path
         current_index = min_index
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+后台导出任务模块
+在工作线程中运行导出，界面线程通过 snapshot() 轮询进度、吞吐量和剩余时间
+"""
+
+import threading
+import time
+
+from .gif_operations import ExportCancelled
+
+
+class ExportTask:
+    """
+    后台导出任务
+
+    用法:
+        task = ExportTask(lambda progress, cancel: create_gif(..., progress_callback=progress,
+                                                            cancel_event=cancel), total_frames=len(paths))
+        task.start()
+        ...  # 在界面线程中定时调用 task.snapshot()
+        task.cancel()
+
+    工作线程只更新受锁保护的状态，不直接操作任何Tk控件。
+    """
+
+    def __init__(self, target, total_frames=None):
+        """
+        初始化导出任务
+
+        Args:
+            target: 导出函数，接受 (progress_callback, cancel_event) 两个参数，返回值作为任务结果
+            total_frames: 总帧数，用于计算吞吐量（帧/秒）
+        """
+        self.target = target
+        self.total_frames = total_frames
+        self.cancel_event = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._progress = 0
+        self._start_time = None
+        self._end_time = None
+        self._done = False
+        self._result = None
+        self._error = None
+
+    def start(self):
+        """在后台线程中启动导出"""
+        self._start_time = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _on_progress(self, percent):
+        with self._lock:
+            self._progress = percent
+
+    def _run(self):
+        try:
+            result = self.target(self._on_progress, self.cancel_event)
+            with self._lock:
+                self._result = result
+        except BaseException as e:
+            with self._lock:
+                self._error = e
+        finally:
+            with self._lock:
+                self._done = True
+                self._end_time = time.perf_counter()
+
+    def cancel(self):
+        """请求取消导出，导出函数会在处理下一帧前停止并删除未完成的文件"""
+        self.cancel_event.set()
+
+    def snapshot(self):
+        """
+        获取任务当前状态
+
+        Returns:
+            字典，包含 progress（0-100）、elapsed（秒）、frames_per_second、eta（剩余秒数或None）、
+            done、cancelled、result、error
+        """
+        with self._lock:
+            progress = self._progress
+            end_time = self._end_time if self._end_time is not None else time.perf_counter()
+            elapsed = end_time - self._start_time if self._start_time is not None else 0.0
+            frames_per_second = None
+            if self.total_frames and elapsed > 0:
+                frames_per_second = self.total_frames * progress / 100 / elapsed
+            eta = None
+            if 0 < progress < 100:
+                eta = elapsed * (100 - progress) / progress
+            return {
+                'progress': progress,
+                'elapsed': elapsed,
+                'frames_per_second': frames_per_second,
+                'eta': eta,
+                'done': self._done,
+                'cancelled': isinstance(self._error, ExportCancelled),
+                'result': self._result,
+                'error': self._error,
+            }
+
+    def wait(self, timeout=None):
+        """
+        等待导出结束
+
+        Args:
+            timeout: 最长等待秒数
+
+        Returns:
+            是否已结束
+        """
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self._done
@@ -49,16 +49,60 @@ def remove_duplicates_preserve_order(items):
     return result
 
 
-def batch_save_cropped_images(pending_crops):
-    """批量保存裁剪后的图片"""
+def cropped_frame_path(frame_ref: str) -> str:
+    """
+    获取帧引用裁剪结果的保存路径
+
+    多帧图片中的单帧无法写回原文件，裁剪结果另存为同目录下的
+    "<文件名>_frame<帧索引>.png"，已有同名文件时追加序号，避免覆盖
+    """
+    from .multiframe import split_frame_ref
+
+    path, index = split_frame_ref(frame_ref)
+    stem = os.path.splitext(path)[0]
+    save_path = f"{stem}_frame{index}.png"
+    counter = 1
+    while os.path.exists(save_path):
+        save_path = f"{stem}_frame{index}_{counter}.png"
+        counter += 1
+    return save_path
+
+
+def save_cropped_image(img_path: str, cropped_img) -> str:
+    """
+    保存裁剪后的图片，返回实际保存的路径
+
+    普通图片覆盖原文件；帧引用另存为独立的PNG文件（见 cropped_frame_path）
+    """
+    from .image_metadata import get_metadata_index
+    from .multiframe import split_frame_ref
+
+    if split_frame_ref(img_path)[1] is not None:
+        save_path = cropped_frame_path(img_path)
+    else:
+        save_path = img_path
+    cropped_img.save(save_path)
+    # 尺寸已改变，元数据索引中的条目立即失效
+    get_metadata_index().invalidate(save_path)
+    return save_path
+
+
+def batch_save_cropped_images(pending_crops, image_paths=None):
+    """
+    批量保存裁剪后的图片
+
+    帧引用的裁剪结果另存为独立文件，传入 image_paths 时列表中的帧引用就地替换为新文件路径
+    """
     saved_count = 0
     failed_count = 0
 
     for img_path, cropped_img in pending_crops.items():
         try:
-            cropped_img.save(img_path)
+            save_path = save_cropped_image(img_path, cropped_img)
+            if image_paths is not None and save_path != img_path:
+                image_paths[:] = [save_path if path == img_path else path for path in image_paths]
             saved_count += 1
-            print(f"已保存裁剪图片: {img_path}")
+            print(f"已保存裁剪图片: {save_path}")
         except Exception as e:
             failed_count += 1
             print(f"保存图片失败 {img_path}: {str(e)}")
@@ -81,8 +125,9 @@ def select_images(main_window_instance):
         ]
     )
     if files:
-        # 清除已有图片，只保留新选择的图片
-        main_window_instance.image_paths = list(files)
+        # 清除已有图片，只保留新选择的图片；动画GIF等多帧图片展开为逐帧引用
+        from function.multiframe import expand_multiframe_paths
+        main_window_instance.image_paths = expand_multiframe_paths(files)
 
         # 重置选择状态
         main_window_instance.selected_image_indices = set()
@@ -108,8 +153,9 @@ def select_directory(main_window_instance):
         image_files = get_image_files(directory)
 
         if image_files:
-            # 清除已有图片，只保留新选择的图片
-            main_window_instance.image_paths = image_files
+            # 清除已有图片，只保留新选择的图片；动画GIF等多帧图片展开为逐帧引用
+            from function.multiframe import expand_multiframe_paths
+            main_window_instance.image_paths = expand_multiframe_paths(image_files)
 
             # 重置选择状态
             main_window_instance.selected_image_indices = set()
@@ -166,11 +212,10 @@ def validate_gif_params(image_paths, output_path, resize_width, resize_height):
     return True, ""
 
 
-def estimate_gif_size(image_paths: list) -> float:
-    """估算GIF大小"""
-    total_original_size = sum(os.path.getsize(path)/1024 for path in image_paths)  # KB
-    estimated_gif_size = total_original_size * 0.3  #  30%
-    return estimated_gif_size
+def estimate_gif_size(image_paths: list, **settings) -> float:
+    """估算GIF大小（KB），对抽样帧按实际导出设置编码后推算，settings 同 estimate_export()"""
+    from .size_estimator import estimate_export
+    return estimate_export(image_paths, **settings)['bytes'] / 1024
 
 
 def is_single_image_mode(image_paths: list) -> bool:
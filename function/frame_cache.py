@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+"""
+帧缓存模块
+将预处理（解码、缩放、量化）后的调色板帧按内容寻址保存在磁盘上，
+再次导出相同的图片时直接读取，无需重新处理
+"""
+
+import hashlib
+import os
+import struct
+import sys
+import threading
+import zlib
+
+from PIL import Image
+
+
+# 缓存格式版本，预处理算法变化时递增以使旧缓存失效
+CACHE_VERSION = 1
+# 默认缓存容量上限（字节）
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# 缓存文件扩展名
+CACHE_SUFFIX = '.frame'
+
+_MAGIC = b'GMFC'
+_HEADER = struct.Struct('<4sHHH')
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_user_cache_dir(*parts):
+    """
+    获取当前用户的缓存目录
+
+    Windows 使用 %LOCALAPPDATA%\\GifMaker，其他系统使用 $XDG_CACHE_HOME/gifmaker（默认 ~/.cache/gifmaker）
+
+    Args:
+        *parts: 追加的子目录
+
+    Returns:
+        缓存目录路径（不保证已存在）
+    """
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~\\AppData\\Local')
+        root = os.path.join(base, 'GifMaker')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+        root = os.path.join(base, 'gifmaker')
+    return os.path.join(root, *parts)
+
+
+def _settings_digest(palette, colors=256):
+    """
+    计算量化设置的摘要
+
+    Args:
+        palette: 全局调色板（RGB字节串）或None（局部自适应调色板）
+        colors: 局部调色板的最大颜色数
+
+    Returns:
+        摘要字符串
+    """
+    if palette is None:
+        return f'adaptive-{colors}'
+    return hashlib.sha1(bytes(palette)).hexdigest()
+
+
+def encode_frame(frame):
+    """
+    将调色板帧序列化为缓存文件内容
+
+    Args:
+        frame: 'P' 模式的PIL.Image对象
+
+    Returns:
+        字节串
+    """
+    palette = bytes(frame.getpalette('RGB') or [])
+    header = _HEADER.pack(_MAGIC, frame.width, frame.height, len(palette) // 3)
+    return header + palette + zlib.compress(frame.tobytes(), 1)
+
+
+def decode_frame(data):
+    """
+    从缓存文件内容还原调色板帧
+
+    Args:
+        data: encode_frame() 生成的字节串
+
+    Returns:
+        'P' 模式的PIL.Image对象
+    """
+    magic, width, height, num_colors = _HEADER.unpack_from(data)
+    if magic != _MAGIC:
+        raise ValueError("无效的帧缓存文件")
+    offset = _HEADER.size
+    palette = data[offset:offset + num_colors * 3]
+    frame = Image.frombytes('P', (width, height), zlib.decompress(data[offset + num_colors * 3:]))
+    frame.putpalette(palette)
+    return frame
+
+
+class FrameCache:
+    """
+    预处理帧的磁盘缓存
+
+    缓存键由图片路径、修改时间、文件大小、目标尺寸和调色板设置共同决定，
+    任何一项变化都会使对应条目自然失效。条目按最近使用时间（文件修改时间）淘汰，
+    总大小超过 max_bytes 时删除最久未使用的条目。
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        初始化缓存
+
+        Args:
+            cache_dir: 缓存目录，None表示使用用户缓存目录下的 frames 子目录
+            max_bytes: 缓存容量上限（字节）
+        """
+        self.cache_dir = cache_dir or get_user_cache_dir('frames')
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.total_bytes = sum(size for _, size, _ in self._scan())
+
+    def _scan(self):
+        """
+        列出所有缓存条目
+
+        Returns:
+            (路径, 大小, 修改时间) 列表
+        """
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(CACHE_SUFFIX):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((entry.path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def make_key(self, img_path, resize=None, palette=None, colors=256):
+        """
+        计算图片在给定处理设置下的缓存键
+
+        Args:
+            img_path: 图片路径或多帧图片的帧引用
+            resize: 目标尺寸 (width, height) 或 None
+            palette: 全局调色板（RGB字节串）或None
+            colors: 局部调色板的最大颜色数
+
+        Returns:
+            缓存键字符串，图片无法访问时返回None
+        """
+        from .multiframe import split_frame_ref
+        path, frame_index = split_frame_ref(img_path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        source = (
+            CACHE_VERSION,
+            os.path.abspath(path),
+            stat.st_mtime_ns,
+            stat.st_size,
+            tuple(resize) if resize else None,
+            _settings_digest(palette, colors),
+        )
+        if frame_index is not None:
+            # 多帧图片的每一帧单独缓存
+            source += (frame_index,)
+        return hashlib.sha1(repr(source).encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key + CACHE_SUFFIX)
+
+    def get(self, key):
+        """
+        读取缓存的帧
+
+        Args:
+            key: make_key() 返回的缓存键
+
+        Returns:
+            'P' 模式的PIL.Image对象，未命中时返回None
+        """
+        if key is None:
+            return None
+        path = self._entry_path(key)
+        try:
+            with open(path, 'rb') as f:
+                frame = decode_frame(f.read())
+            # 更新修改时间，作为最近使用时间
+            os.utime(path)
+        except (OSError, ValueError, zlib.error, struct.error):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return frame
+
+    def put(self, key, frame):
+        """
+        写入缓存的帧，超出容量时淘汰最久未使用的条目
+
+        Args:
+            key: make_key() 返回的缓存键
+            frame: 'P' 模式的PIL.Image对象
+        """
+        if key is None or frame.mode != 'P':
+            return
+        data = encode_frame(frame)
+        path = self._entry_path(key)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            with self._lock:
+                # 覆盖已有条目时扣除旧条目的大小，避免总大小虚增导致提前淘汰
+                try:
+                    old_size = os.path.getsize(path)
+                except OSError:
+                    old_size = 0
+                os.replace(temp_path, path)
+                self.total_bytes += len(data) - old_size
+                if self.total_bytes > self.max_bytes:
+                    self._evict()
+        except OSError as e:
+            print(f"警告: 无法写入帧缓存: {e}")
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+    def _evict(self):
+        """删除最久未使用的条目，直到总大小降到上限的 90% 以下（调用方需持有锁）"""
+        entries = sorted(self._scan(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        limit = self.max_bytes * 0.9
+        for path, size, _ in entries:
+            if total <= limit:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+        self.total_bytes = total
+
+    def clear(self):
+        """删除所有缓存条目"""
+        with self._lock:
+            for path, _, _ in self._scan():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self.total_bytes = 0
+
+    def stats(self):
+        """
+        获取缓存统计信息
+
+        Returns:
+            包含 hits、misses、evictions、hit_rate、total_bytes 的字典
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'total_bytes': self.total_bytes,
+            }
+
+    def reset_stats(self):
+        """清零命中统计"""
+        with self._lock:
+            self.hits = self.misses = self.evictions = 0
+
+
+def get_default_cache():
+    """
+    获取默认的共享帧缓存（首次调用时创建）
+
+    Returns:
+        FrameCache对象，缓存目录无法创建时返回None
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            try:
+                _default_cache = FrameCache()
+            except OSError as e:
+                print(f"警告: 无法创建帧缓存目录: {e}")
+                return None
+        return _default_cache
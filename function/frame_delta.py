@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+帧间差分编码模块
+将每一帧与上一帧合成后的画面比较，只输出发生变化的矩形区域，
+区域内未变化的像素标记为透明
+"""
+
+import numpy as np
+from PIL import Image
+
+
+# 差分帧使用的处置方法：保留当前画面，下一帧直接叠加在其上
+DISPOSAL_KEEP = 1
+
+
+def _palette_array(frame):
+    """
+    获取帧调色板的 (256, 3) 查找表，不足256色的部分补零
+
+    Args:
+        frame: 'P' 模式的PIL.Image对象
+
+    Returns:
+        (调色板字节串, numpy数组)
+    """
+    palette = bytes(frame.getpalette('RGB') or [])
+    table = np.zeros((256, 3), dtype=np.uint8)
+    colors = np.frombuffer(palette, dtype=np.uint8).reshape(-1, 3)[:256]
+    table[:len(colors)] = colors
+    return palette, table
+
+
+def _free_index(indices, palette_length):
+    """
+    查找变化像素中未使用的调色板索引，用作透明色
+
+    Args:
+        indices: 变化像素的调色板索引数组
+        palette_length: 调色板颜色数量
+
+    Returns:
+        可用的索引，全部256个索引都被占用时返回None
+    """
+    counts = np.bincount(indices.ravel(), minlength=256)
+    free = np.flatnonzero(counts[:256] == 0)
+    if free.size == 0:
+        return None
+    # 优先使用调色板范围内的索引，避免扩展调色板
+    inside = free[free < palette_length]
+    return int(inside[0] if inside.size else free[0])
+
+
+class DeltaFrameEncoder:
+    """
+    帧间差分编码器
+
+    按顺序传入完整画布大小的调色板帧，返回需要实际写入的子帧、偏移量和透明色索引。
+    比较在调色板索引（调色板相同时）或RGB颜色（调色板不同时）上以NumPy向量化完成。
+    """
+
+    def __init__(self):
+        self._previous_indices = None
+        self._previous_palette = None
+        self._previous_table = None
+
+    def reset(self):
+        """清除上一帧状态，下一帧将作为完整帧输出"""
+        self._previous_indices = None
+        self._previous_palette = None
+        self._previous_table = None
+
+    def _changed_mask(self, indices, palette, table):
+        """
+        计算与上一帧合成画面相比发生变化的像素
+
+        Returns:
+            布尔数组，True表示该像素发生变化
+        """
+        if palette == self._previous_palette:
+            return indices != self._previous_indices
+        current = table[indices]
+        previous = self._previous_table[self._previous_indices]
+        return np.any(current != previous, axis=2)
+
+    def encode(self, frame):
+        """
+        对一帧进行差分编码
+
+        Args:
+            frame: 与画布同尺寸的 'P' 模式PIL.Image对象
+
+        Returns:
+            (要写入的帧, 偏移量 (x, y), 透明色索引或None, 处置方法)
+        """
+        indices = np.asarray(frame)
+        palette, table = _palette_array(frame)
+
+        if self._previous_indices is None or self._previous_indices.shape != indices.shape:
+            self._previous_indices, self._previous_palette, self._previous_table = indices, palette, table
+            return frame, (0, 0), None, DISPOSAL_KEEP
+
+        changed = self._changed_mask(indices, palette, table)
+        # 合成后的画面与当前帧完全一致，直接以当前帧作为下一次比较的基准
+        self._previous_indices, self._previous_palette, self._previous_table = indices, palette, table
+
+        rows = np.flatnonzero(changed.any(axis=1))
+        if rows.size == 0:
+            # 画面没有变化：输出一个完全透明的 1x1 帧占位
+            pixel = frame.crop((0, 0, 1, 1))
+            return pixel, (0, 0), pixel.getpixel((0, 0)), DISPOSAL_KEEP
+
+        cols = np.flatnonzero(changed.any(axis=0))
+        top, bottom = int(rows[0]), int(rows[-1]) + 1
+        left, right = int(cols[0]), int(cols[-1]) + 1
+
+        region = frame.crop((left, top, right, bottom))
+        region_changed = changed[top:bottom, left:right]
+        if region_changed.all():
+            return region, (left, top), None, DISPOSAL_KEEP
+
+        transparency = _free_index(indices[top:bottom, left:right][region_changed], len(palette) // 3)
+        if transparency is None:
+            # 所有索引都被变化像素占用，只能输出不透明的矩形区域
+            return region, (left, top), None, DISPOSAL_KEEP
+
+        if transparency >= len(palette) // 3:
+            region.putpalette(palette + bytes(3 * (transparency + 1) - len(palette)))
+
+        # 未变化的像素填充为透明色
+        unchanged = Image.fromarray(np.where(region_changed, 0, 255).astype(np.uint8))
+        region.paste(transparency, mask=unchanged)
+        return region, (left, top), transparency, DISPOSAL_KEEP
@@ -0,0 +1,409 @@
+# -*- coding: utf-8 -*-
+"""
+帧预处理流水线模块
+负责单帧的解码、缩放、量化，以及基于进程池的并行预处理和并行LZW编码
+"""
+
+import atexit
+import hashlib
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from PIL import Image
+
+from .gif_writer import encode_frame
+from .image_utils import STANDARD_MODES, reduce_for_target, to_standard_mode
+from .multiframe import open_image
+from .palette import quantize_to_palette
+from .shared_frames import SharedFrame, SharedFrameRing, write_shared_frame
+
+
+# 进程池在多次导出之间复用，避免重复创建子进程的开销
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+# 共享内存环形缓冲区在进程池排队任务数之外多留的槽位，供调用方持有当前帧和等待合并的帧
+RING_SPARE_SLOTS = 2
+
+# 与上一张图片字节完全相同时，iter_processed_frames 产出此标记代替帧对象
+SAME_AS_PREVIOUS = object()
+
+
+def process_frame(img_path, resize=None, palette=None, colors=256):
+    """
+    打开单张图片，按需缩放并量化为调色板帧
+
+    缩小时先用 draft()/reduce() 廉价地解码到接近目标尺寸，再用 LANCZOS 完成最终缩放。
+
+    Args:
+        img_path: 图片路径或多帧图片的帧引用（"路径::帧索引"）
+        resize: 目标尺寸 (width, height) 或 None
+        palette: 全局调色板（RGB字节串），None表示为每帧单独计算局部调色板
+        colors: 局部调色板的最大颜色数
+
+    Returns:
+        'P' 模式的PIL.Image对象
+    """
+    with open_image(img_path) as img:
+        frame = img
+        if resize and tuple(resize) != img.size:
+            # 调色板图片只能按最近邻缩放，先转换为RGB；黑白和16位图片无法直接量化
+            frame = to_standard_mode(reduce_for_target(img, resize))
+            frame = frame.resize(resize, Image.Resampling.LANCZOS)
+        elif frame.mode not in STANDARD_MODES and frame.mode != 'P':
+            frame = to_standard_mode(frame)
+        if palette is not None:
+            # 映射到共享的全局调色板
+            frame = quantize_to_palette(frame, palette)
+        elif frame.mode != 'P':
+            # 转换为调色板模式以优化GIF
+            frame = frame.convert('P', palette=Image.ADAPTIVE, colors=colors)
+        elif colors < 256:
+            # 已是调色板模式但需要减少颜色数，重新量化
+            frame = frame.convert('RGB').convert('P', palette=Image.ADAPTIVE, colors=colors)
+        elif frame is img:
+            frame = img.copy()
+    return frame
+
+
+def file_digest(img_path):
+    """
+    计算图片文件内容的摘要
+
+    Args:
+        img_path: 图片路径
+
+    Returns:
+        摘要字节串
+    """
+    h = hashlib.blake2b()
+    with open(img_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.digest()
+
+
+def frame_digest(frame):
+    """
+    计算调色板帧像素和调色板的摘要，用于识别像素完全相同的帧
+
+    Args:
+        frame: 'P' 模式的PIL.Image对象
+
+    Returns:
+        摘要字节串
+    """
+    digest = hashlib.blake2b(repr(frame.size).encode())
+    digest.update(bytes(frame.getpalette('RGB') or []))
+    digest.update(frame.tobytes())
+    return digest.digest()
+
+
+class _DuplicateFileFilter:
+    """
+    识别与上一张图片字节完全相同的文件
+
+    先比较文件大小，只有大小相同时才读取文件计算摘要，
+    因此对内容各不相同的序列几乎没有额外开销。
+    """
+
+    def __init__(self):
+        self._path = None
+        self._size = None
+        self._digest = None
+
+    def _stat_size(self, img_path):
+        try:
+            return os.path.getsize(img_path)
+        except OSError:
+            return None
+
+    def is_duplicate(self, img_path):
+        """
+        判断图片是否与上一次传入的图片字节完全相同
+
+        Args:
+            img_path: 图片路径
+
+        Returns:
+            bool
+        """
+        size = self._stat_size(img_path)
+        previous_path, previous_size, previous_digest = self._path, self._size, self._digest
+        self._path, self._size, self._digest = img_path, size, None
+        if size is None or size != previous_size:
+            return False
+        try:
+            if previous_digest is None:
+                previous_digest = file_digest(previous_path)
+            self._digest = file_digest(img_path)
+        except OSError:
+            return False
+        return self._digest == previous_digest
+
+
+def _process_frame_safe(img_path, resize, palette=None, colors=256, shared=None):
+    """
+    在子进程中处理单帧，异常作为返回值传回，避免打断整个流水线
+
+    指定 shared 时帧像素写入共享内存槽位，只传回 SharedFrame 描述。
+
+    Returns:
+        (帧对象、SharedFrame对象或None, 异常或None)
+    """
+    try:
+        return write_shared_frame(process_frame(img_path, resize, palette, colors), shared), None
+    except Exception as e:
+        return None, e
+
+
+def _encode_frame_safe(frame, palette=None, optimize=True, keep_frame=False, shared=None):
+    """
+    在子进程中编码单帧并计算帧摘要，异常作为返回值传回
+
+    Args:
+        frame: 'P' 模式的PIL.Image对象
+        palette: 全局调色板（RGB字节串）或None
+        optimize: 是否裁剪局部调色板中未使用的颜色
+        keep_frame: 是否在结果中附带编码前的帧（用于写入帧缓存）
+        shared: 共享内存槽位参数，附带的帧写入该槽位
+
+    Returns:
+        (EncodedFrame对象或None, 异常或None)
+    """
+    try:
+        encoded = encode_frame(frame, palette, optimize)
+        encoded.digest = frame_digest(frame)
+        if keep_frame:
+            encoded.frame = write_shared_frame(frame, shared)
+        return encoded, None
+    except Exception as e:
+        return None, e
+
+
+def _process_and_encode_safe(img_path, resize, palette=None, colors=256, optimize=True, keep_frame=False,
+                             shared=None):
+    """
+    在子进程中预处理并编码单帧，只把编码结果传回主进程
+
+    Returns:
+        (EncodedFrame对象或None, 异常或None)
+    """
+    frame, error = _process_frame_safe(img_path, resize, palette, colors)
+    if error is not None:
+        return None, error
+    return _encode_frame_safe(frame, palette, optimize, keep_frame, shared)
+
+
+def resolve_workers(workers):
+    """
+    解析工作进程数量
+
+    Args:
+        workers: 进程数，None或1表示串行处理，0表示使用全部CPU核心
+
+    Returns:
+        实际使用的进程数（至少为1）
+    """
+    if workers is None:
+        return 1
+    if workers <= 0:
+        return os.cpu_count() or 1
+    return workers
+
+
+def get_worker_pool(workers):
+    """
+    获取共享的进程池，进程数变化时重新创建
+
+    Args:
+        workers: 进程数
+
+    Returns:
+        ProcessPoolExecutor对象
+    """
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None and _pool_workers != workers:
+            _pool.shutdown(wait=True)
+            _pool = None
+        if _pool is None:
+            if os.name == 'posix':
+                # 先启动资源跟踪进程，使子进程共用它，映射共享内存的子进程退出时不会误删主进程的共享内存
+                from multiprocessing import resource_tracker
+                resource_tracker.ensure_running()
+            _pool = ProcessPoolExecutor(max_workers=workers)
+            _pool_workers = workers
+        return _pool
+
+
+def shutdown_worker_pool():
+    """关闭共享的进程池"""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+            _pool_workers = 0
+
+
+atexit.register(shutdown_worker_pool)
+
+
+def _create_ring(slot_count, slot_bytes):
+    """
+    创建共享内存环形缓冲区，系统不支持或共享内存不足时返回None（回退到 pickle 传输）
+
+    Args:
+        slot_count: 槽位数量
+        slot_bytes: 每个槽位的字节数
+
+    Returns:
+        SharedFrameRing对象或None
+    """
+    try:
+        return SharedFrameRing(slot_count, slot_bytes)
+    except (OSError, ValueError) as e:
+        print(f"提示: 无法创建共享内存，帧数据改用序列化传输: {e}")
+        return None
+
+
+def _receive_shared(ring, slot, frame):
+    """
+    把工作进程写入共享内存的帧还原为图片对象，未使用槽位时立即归还
+
+    Args:
+        ring: SharedFrameRing对象
+        slot: 提交任务时分配的槽位编号
+        frame: 任务返回的帧对象、SharedFrame 或 EncodedFrame（出错时为None）
+
+    Returns:
+        帧对象或 EncodedFrame 对象
+    """
+    if isinstance(frame, SharedFrame):
+        return ring.open(frame)
+    if isinstance(getattr(frame, 'frame', None), SharedFrame):
+        frame.frame = ring.open(frame.frame)
+        return frame
+    ring.release(slot)
+    return frame
+
+
+def _completed(result):
+    """
+    创建一个已完成的Future，使缓存命中和重复帧可以与进程池任务一起按顺序排队
+
+    Args:
+        result: Future的结果
+
+    Returns:
+        已完成的Future对象
+    """
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+def iter_processed_frames(image_paths, resize=None, workers=None, palette=None, skip_duplicates=False,
+                          cache=None, colors=256, encode=False, optimize=True):
+    """
+    按原始顺序逐帧产出预处理结果
+
+    并行模式下最多同时提交 2 * workers 个任务，
+    已完成但尚未轮到的帧才会暂存在内存中，因此内存占用与总帧数无关。
+    skip_duplicates 为 True 时，与上一张图片字节完全相同的文件不再解码，
+    直接产出 SAME_AS_PREVIOUS 标记。
+    指定 cache 时先在主进程中查询帧缓存，命中的帧不再提交处理，未命中的帧处理后写入缓存。
+    encode 为 True 时进程池中的任务在预处理之后继续完成LZW编码（缓存命中的帧只提交编码），
+    产出 EncodedFrame 对象，主进程只需按顺序拼接，传回的数据量也从像素缩小到压缩后的大小。
+    并行模式下仍需把帧像素传回主进程时（未启用 encode，或需要写入帧缓存），
+    帧像素经共享内存环形缓冲区传递，产出的帧直接引用共享内存，调用方释放后槽位才会复用。
+
+    Args:
+        image_paths: 图片路径列表
+        resize: 目标尺寸 (width, height) 或 None
+        workers: 进程数，None或1表示串行处理，0表示使用全部CPU核心
+        palette: 全局调色板（RGB字节串），None表示使用局部调色板
+        skip_duplicates: 是否跳过与上一张图片字节完全相同的文件
+        cache: FrameCache对象或None
+        colors: 局部调色板的最大颜色数
+        encode: 是否同时编码帧
+        optimize: 编码时是否裁剪局部调色板中未使用的颜色
+
+    Yields:
+        (图片路径, 帧对象、EncodedFrame对象、SAME_AS_PREVIOUS或None, 异常或None)
+    """
+    duplicates = _DuplicateFileFilter() if skip_duplicates else None
+    workers = resolve_workers(workers)
+    pool = get_worker_pool(workers) if workers > 1 and len(image_paths) > 1 else None
+    max_pending = workers * 2
+    pending = deque()
+    paths = iter(image_paths)
+    ring = None
+    if pool is not None and resize and (not encode or cache is not None):
+        ring = _create_ring(max_pending + RING_SPARE_SLOTS, resize[0] * resize[1])
+
+    def submit(img_path):
+        # 每个条目为 (图片路径, 需要写入缓存的键, 共享内存槽位, Future)
+        if duplicates is not None and duplicates.is_duplicate(img_path):
+            pending.append((img_path, None, None, _completed((SAME_AS_PREVIOUS, None))))
+            return
+        key = None
+        if cache is not None:
+            key = cache.make_key(img_path, resize, palette, colors)
+            frame = cache.get(key)
+            if frame is not None:
+                if not encode:
+                    future = _completed((frame, None))
+                elif pool is None:
+                    future = _completed(_encode_frame_safe(frame, palette, optimize))
+                else:
+                    future = pool.submit(_encode_frame_safe, frame, palette, optimize)
+                pending.append((img_path, None, None, future))
+                return
+        slot = ring.acquire() if ring is not None else None
+        shared = ring.task_args(slot) if slot is not None else None
+        if encode:
+            task = (_process_and_encode_safe, img_path, resize, palette, colors, optimize, key is not None, shared)
+        else:
+            task = (_process_frame_safe, img_path, resize, palette, colors, shared)
+        if pool is None:
+            future = _completed(task[0](*task[1:]))
+        else:
+            future = pool.submit(*task)
+        pending.append((img_path, key, slot, future))
+
+    try:
+        # 串行模式下每次只准备一帧
+        for img_path in paths:
+            submit(img_path)
+            if pool is None or len(pending) >= max_pending:
+                break
+
+        while pending:
+            img_path, key, slot, future = pending.popleft()
+            # 取出一帧后立即补充新任务，保持进程池满载
+            next_path = next(paths, None)
+            if next_path is not None:
+                submit(next_path)
+            frame, error = future.result()
+            if slot is not None:
+                frame = _receive_shared(ring, slot, frame)
+            if key is not None and error is None:
+                if encode:
+                    cache.put(key, frame.frame)
+                    frame.frame = None
+                else:
+                    cache.put(key, frame)
+            yield img_path, frame, error
+            # 不再引用已产出的帧，使其共享内存槽位在调用方释放后即可复用
+            del frame
+    finally:
+        # 提前结束（异常或取消）时丢弃尚未开始的任务
+        for _, _, _, future in pending:
+            future.cancel()
+        if ring is not None:
+            ring.close()
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+预览帧预渲染模块
+在工作线程中把播放位置之后的若干帧缩放到当前缩放比例，
+界面线程只需把渲染好的图片交给 PhotoImage
+"""
+
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+
+# 默认预渲染的帧数
+DEFAULT_DEPTH = 8
+
+
+def display_size(frame_size, scale):
+    """
+    计算帧在给定缩放比例下的显示尺寸
+
+    Args:
+        frame_size: 帧原始尺寸 (width, height)
+        scale: 缩放比例
+
+    Returns:
+        (width, height)，每边至少为1
+    """
+    return max(1, int(frame_size[0] * scale)), max(1, int(frame_size[1] * scale))
+
+
+def render_frame(frame, size):
+    """
+    将帧缩放到显示尺寸并转换为可直接交给 PhotoImage 的RGB图像
+
+    Args:
+        frame: PIL.Image对象
+        size: 显示尺寸 (width, height)
+
+    Returns:
+        'RGB' 模式的PIL.Image对象
+    """
+    if size != frame.size:
+        if size[0] >= frame.width:
+            # 放大时使用高质量插值，保持清晰
+            resampling = Image.Resampling.LANCZOS
+        else:
+            # 缩小时使用双线性插值，提高性能
+            resampling = Image.Resampling.BILINEAR
+        frame = frame.resize(size, resampling)
+    return frame.convert('RGB')
+
+
+class FramePrefetcher:
+    """
+    预览帧预渲染器
+
+    request() 指定起始帧和缩放比例后，工作线程依次渲染其后 depth 帧。
+    新请求会让工作线程在当前帧渲染完成后立即转向最新的位置，
+    快速拖动进度条时只有最后一次请求的帧会被渲染；缩放比例变化时丢弃旧比例的结果。
+    """
+
+    def __init__(self, frames, depth=DEFAULT_DEPTH):
+        """
+        初始化预渲染器并启动工作线程
+
+        Args:
+            frames: 帧序列（帧列表或 LazyFrameSource）
+            depth: 预渲染的帧数
+        """
+        self.frames = frames
+        self.depth = depth
+        self._rendered = OrderedDict()
+        self._target = None
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _get_frame(self, index):
+        # 延迟帧源的旁路访问不移动其播放位置
+        if hasattr(self.frames, 'get'):
+            return self.frames.get(index, seek=False)
+        return self.frames[index]
+
+    def request(self, index, scale):
+        """
+        请求从指定帧开始预渲染
+
+        Args:
+            index: 起始帧索引
+            scale: 缩放比例
+        """
+        with self._condition:
+            if self._target is not None and self._target[1] != scale:
+                self._rendered.clear()
+            self._target = (index % len(self.frames), scale)
+            self._condition.notify_all()
+
+    def take(self, index, size):
+        """
+        取出已渲染的帧
+
+        Args:
+            index: 帧索引
+            size: 显示尺寸 (width, height)
+
+        Returns:
+            'RGB' 模式的PIL.Image对象，尚未渲染时返回None
+        """
+        with self._condition:
+            return self._rendered.pop((index, size), None)
+
+    def _next_job(self):
+        """
+        找出下一个需要渲染的帧（调用方需持有锁）
+
+        Returns:
+            (帧索引, 缩放比例)，没有需要渲染的帧时返回None
+        """
+        if self._target is None:
+            return None
+        start, scale = self._target
+        count = len(self.frames)
+        for step in range(min(self.depth, count)):
+            index = (start + step) % count
+            if not any(key[0] == index for key in self._rendered):
+                return index, scale
+        return None
+
+    def _run(self):
+        while True:
+            with self._condition:
+                job = self._next_job()
+                while not self._closed and job is None:
+                    self._condition.wait()
+                    job = self._next_job()
+                if self._closed:
+                    return
+                target = self._target
+            index, scale = job
+            try:
+                frame = self._get_frame(index)
+                size = display_size(frame.size, scale)
+                image = render_frame(frame, size)
+            except Exception as e:
+                print(f"警告: 无法预渲染第 {index + 1} 帧: {e}")
+                image = None
+            with self._condition:
+                # 渲染期间缩放比例可能已经变化，旧比例的结果直接丢弃
+                if image is not None and self._target is not None and self._target[1] == target[1]:
+                    self._rendered[(index, size)] = image
+                    while len(self._rendered) > self.depth:
+                        self._rendered.popitem(last=False)
+                elif image is None:
+                    # 渲染失败的帧不再重试，避免工作线程空转
+                    self._rendered[(index, None)] = None
+
+    def close(self):
+        """停止工作线程并释放已渲染的帧"""
+        with self._condition:
+            self._closed = True
+            self._rendered.clear()
+            self._condition.notify_all()
@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+"""
+延迟帧源模块
+按需解码和量化预览帧，只在内存中保留播放位置附近的一小段帧，
+其余帧由后台线程在播放位置前方预先解码
+"""
+
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+from .frame_pipeline import process_frame
+
+
+# 播放位置前方预先解码的帧数
+DEFAULT_AHEAD = 16
+# 播放位置后方保留的帧数（便于后退和循环播放）
+DEFAULT_BEHIND = 4
+
+
+class LazyFrameSource:
+    """
+    延迟解码的帧序列
+
+    支持 len()、下标访问和迭代，可以替代预先解码好的帧列表传给 GifPreviewWindow。
+    下标访问会把播放位置移动到该帧：已解码的帧直接返回，否则在调用线程中立即解码这一帧。
+    后台线程先计算全局调色板（如需要），再按离播放位置由近到远的顺序解码窗口内的帧，
+    窗口外的帧会被释放，内存占用只与窗口大小有关，与总帧数无关。
+    """
+
+    def __init__(self, image_paths, resize=None, palette_mode='local', colors=256, cache=None,
+                 ahead=DEFAULT_AHEAD, behind=DEFAULT_BEHIND):
+        """
+        初始化帧源并启动后台解码线程
+
+        Args:
+            image_paths: 图片路径列表
+            resize: 目标尺寸 (width, height) 或 None
+            palette_mode: 调色板模式，'local' 或 'global'
+            colors: 调色板的最大颜色数
+            cache: FrameCache对象，None表示不使用磁盘帧缓存
+            ahead: 播放位置前方预先解码的帧数
+            behind: 播放位置后方保留的帧数
+        """
+        if not image_paths:
+            raise ValueError("至少需要一张图片")
+        self.image_paths = list(image_paths)
+        self.resize = tuple(resize) if resize else None
+        self.palette_mode = palette_mode
+        self.colors = colors
+        self.cache = cache
+        self.ahead = ahead
+        self.behind = behind
+        self.palette = None
+
+        self._frames = OrderedDict()
+        self._decoding = set()
+        self._position = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._palette_ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def __len__(self):
+        return len(self.image_paths)
+
+    def __getitem__(self, index):
+        """
+        获取指定帧，并把播放位置移动到该帧
+
+        Args:
+            index: 帧索引（支持负数）
+
+        Returns:
+            'P' 模式的PIL.Image对象
+        """
+        return self.get(index)
+
+    def get(self, index, seek=True):
+        """
+        获取指定帧
+
+        Args:
+            index: 帧索引（支持负数）
+            seek: 是否把播放位置移动到该帧；预取等旁路访问应传 False，以免打乱解码窗口
+
+        Returns:
+            'P' 模式的PIL.Image对象
+        """
+        if index < 0:
+            index += len(self.image_paths)
+        if not 0 <= index < len(self.image_paths):
+            raise IndexError("帧索引超出范围")
+        if seek:
+            self.seek(index)
+        return self._load(index)
+
+    def __iter__(self):
+        """按顺序逐帧返回，不改变播放位置，也不占用窗口"""
+        self._palette_ready.wait()
+        for index in range(len(self.image_paths)):
+            with self._condition:
+                frame = self._frames.get(index)
+            yield frame if frame is not None else self._decode(index)
+
+    def seek(self, index):
+        """
+        移动播放位置，后台线程随即开始解码新位置附近的帧
+
+        Args:
+            index: 帧索引
+        """
+        with self._condition:
+            self._position = index
+            self._trim()
+            self._condition.notify_all()
+
+    def is_palette_ready(self):
+        """
+        判断全局调色板是否已准备好（不会等待）
+
+        调色板准备好之前，下标访问会阻塞调用线程；界面线程应先轮询此方法。
+
+        Returns:
+            bool
+        """
+        return self._palette_ready.is_set()
+
+    def is_ready(self, index):
+        """
+        判断指定帧是否已解码（不会触发解码）
+
+        Args:
+            index: 帧索引
+
+        Returns:
+            是否已在内存中
+        """
+        with self._condition:
+            return index in self._frames
+
+    def _in_window(self, index):
+        offset = (index - self._position) % len(self.image_paths)
+        return offset <= self.ahead or len(self.image_paths) - offset <= self.behind
+
+    def _trim(self):
+        """释放窗口外的帧（调用方需持有锁）"""
+        for index in [index for index in self._frames if not self._in_window(index)]:
+            del self._frames[index]
+
+    def _wanted(self):
+        """
+        按离播放位置由近到远的顺序找出下一个需要解码的帧（调用方需持有锁）
+
+        Returns:
+            帧索引，窗口内的帧都已解码时返回None
+        """
+        count = len(self.image_paths)
+        for step in range(max(self.ahead, self.behind) + 1):
+            candidates = []
+            if step <= self.ahead:
+                candidates.append((self._position + step) % count)
+            if 0 < step <= self.behind:
+                candidates.append((self._position - step) % count)
+            for index in candidates:
+                if index not in self._frames and index not in self._decoding:
+                    return index
+        return None
+
+    def _decode(self, index):
+        """
+        解码并量化一帧，图片无法加载时返回同尺寸的黑色占位帧
+
+        Args:
+            index: 帧索引
+
+        Returns:
+            'P' 模式的PIL.Image对象
+        """
+        img_path = self.image_paths[index]
+        key = None
+        if self.cache is not None:
+            key = self.cache.make_key(img_path, self.resize, self.palette, self.colors)
+            frame = self.cache.get(key)
+            if frame is not None:
+                return frame
+        try:
+            frame = process_frame(img_path, self.resize, self.palette, self.colors)
+        except Exception as e:
+            print(f"警告: 无法加载图片 {img_path}: {e}")
+            frame = Image.new('P', self.resize or (1, 1), 0)
+            frame.putpalette(b'\x00\x00\x00')
+            return frame
+        if self.cache is not None:
+            self.cache.put(key, frame)
+        return frame
+
+    def _load(self, index):
+        """
+        获取指定帧，必要时在调用线程中解码；后台线程正在解码该帧时等待其完成
+
+        Args:
+            index: 帧索引
+
+        Returns:
+            'P' 模式的PIL.Image对象
+        """
+        self._palette_ready.wait()
+        with self._condition:
+            while index in self._decoding:
+                self._condition.wait()
+            frame = self._frames.get(index)
+            if frame is not None:
+                self._frames.move_to_end(index)
+                return frame
+            self._decoding.add(index)
+        frame = None
+        try:
+            frame = self._decode(index)
+        finally:
+            with self._condition:
+                self._decoding.discard(index)
+                if frame is not None and self._in_window(index):
+                    self._frames[index] = frame
+                self._condition.notify_all()
+        return frame
+
+    def _run(self):
+        """后台线程：先准备调色板，再持续解码播放位置附近的帧"""
+        try:
+            if self.palette_mode == 'global':
+                # 所有帧共享一份全局调色板，色差过大时回退到局部调色板
+                from .palette import build_global_palette
+                self.palette, _ = build_global_palette(self.image_paths, self.resize, colors=self.colors)
+        except Exception as e:
+            print(f"警告: 无法计算全局调色板: {e}")
+        finally:
+            self._palette_ready.set()
+
+        while True:
+            with self._condition:
+                index = self._wanted()
+                while not self._closed and index is None:
+                    self._condition.wait()
+                    index = self._wanted()
+                if self._closed:
+                    return
+                self._decoding.add(index)
+            frame = None
+            try:
+                frame = self._decode(index)
+            finally:
+                with self._condition:
+                    self._decoding.discard(index)
+                    # 解码期间播放位置可能已经移走
+                    if frame is not None and self._in_window(index):
+                        self._frames[index] = frame
+                    self._condition.notify_all()
+
+    def export(self, output_path, duration=100, loop=0, delta=True, progress_callback=None, cancel_event=None):
+        """
+        保存与预览完全相同的GIF
+
+        帧按顺序逐帧取出：窗口内已解码的帧直接使用，其余帧从磁盘帧缓存读取或重新解码，
+        量化结果与预览一致，不再重新量化；内存占用与总帧数无关。
+        会等待全局调色板计算完成，应在后台线程中调用。
+
+        Args:
+            output_path: 输出文件路径
+            duration: 每帧持续时间（毫秒）
+            loop: 循环次数（0表示无限循环）
+            delta: 是否启用帧间差分编码
+            progress_callback: 进度回调函数，接受当前进度百分比作为参数
+            cancel_event: threading.Event对象，设置后中止保存
+        """
+        from .gif_operations import save_gif
+        self._palette_ready.wait()
+        save_gif(self, output_path, duration=duration, loop=loop, delta=delta, global_palette=self.palette,
+                 frame_size=self.resize, progress_callback=progress_callback, cancel_event=cancel_event)
+
+    def close(self):
+        """停止后台解码线程并释放所有帧"""
+        with self._condition:
+            self._closed = True
+            self._frames.clear()
+            self._condition.notify_all()
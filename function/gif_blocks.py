@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+"""
+GIF块结构模块
+解析已编码GIF文件的块结构（文件头、颜色表、扩展块、图像块），
+并在不重新编码的情况下直接修改帧持续时间和循环次数
+"""
+
+import os
+import struct
+
+
+# 图形控制扩展块的标签
+GCE_LABEL = 0xF9
+# 应用扩展块的标签
+APPLICATION_LABEL = 0xFF
+# 记录循环次数的应用扩展标识
+LOOP_APPLICATIONS = (b'NETSCAPE2.0', b'ANIMEXTS1.0')
+
+
+class GifFormatError(ValueError):
+    """GIF文件结构无效或被截断"""
+
+
+class GifFrameBlocks:
+    """
+    单帧在GIF文件中的位置和参数
+
+    start 为该帧之前第一个扩展块（通常是图形控制扩展块）的偏移，end 为图像数据结束符之后的偏移，
+    [start, end) 即可原样复制的完整帧数据。
+    """
+
+    def __init__(self, start):
+        self.start = start
+        self.gce_offset = None  # 图形控制扩展块的偏移，没有时为None
+        self.delay = 0  # 持续时间（1/100秒）
+        self.disposal = 0
+        self.transparency = None
+        self.descriptor_offset = None  # 图像描述符的偏移
+        self.left = 0
+        self.top = 0
+        self.width = 0
+        self.height = 0
+        self.local_table_size = 0  # 局部颜色表的字节数，0表示使用全局颜色表
+        self.data_offset = None  # LZW 最小码长字节的偏移
+        self.end = None
+
+    @property
+    def duration(self):
+        """持续时间（毫秒）"""
+        return self.delay * 10
+
+
+class GifLayout:
+    """GIF文件的块结构"""
+
+    def __init__(self):
+        self.size = (0, 0)
+        self.background = 0
+        self.global_table_size = 0  # 全局颜色表的字节数
+        self.header_end = 0  # 逻辑屏幕描述符和全局颜色表之后的偏移
+        self.loop = None  # 循环次数，没有循环扩展块时为None
+        self.loop_offset = None  # 循环次数字段（2字节）的偏移
+        self.frames = []
+        self.trailer_offset = None  # 文件结束符的偏移（截断的文件为None）
+
+
+def _skip_sub_blocks(data, pos):
+    """
+    跳过一串数据子块
+
+    Args:
+        data: 文件内容
+        pos: 第一个子块长度字节的偏移
+
+    Returns:
+        块结束符之后的偏移
+    """
+    length = len(data)
+    while True:
+        if pos >= length:
+            raise GifFormatError("GIF数据子块被截断")
+        size = data[pos]
+        pos += 1
+        if size == 0:
+            return pos
+        pos += size
+
+
+def parse_gif(data):
+    """
+    解析GIF文件的块结构（不解码任何图像数据）
+
+    Args:
+        data: GIF文件内容（bytes、bytearray 或 mmap）
+
+    Returns:
+        GifLayout对象
+    """
+    if len(data) < 13 or bytes(data[:3]) != b'GIF':
+        raise GifFormatError("不是有效的GIF文件")
+
+    layout = GifLayout()
+    width, height, flags, background = struct.unpack_from('<HHBB', data, 6)
+    layout.size = (width, height)
+    layout.background = background
+    if flags & 0x80:
+        layout.global_table_size = 3 << ((flags & 0x07) + 1)
+    pos = 13 + layout.global_table_size
+    layout.header_end = pos
+
+    frame = None
+    length = len(data)
+    while pos < length:
+        block = data[pos]
+        if block == 0x3B:
+            layout.trailer_offset = pos
+            break
+        if block == 0x21:
+            if pos + 2 > length:
+                raise GifFormatError("GIF扩展块被截断")
+            label = data[pos + 1]
+            if frame is None:
+                frame = GifFrameBlocks(pos)
+            if label == GCE_LABEL and pos + 8 <= length and data[pos + 2] == 4:
+                packed, delay, transparency = struct.unpack_from('<BHB', data, pos + 3)
+                frame.gce_offset = pos
+                frame.delay = delay
+                frame.disposal = (packed >> 2) & 0x07
+                frame.transparency = transparency if packed & 0x01 else None
+            elif label == APPLICATION_LABEL and pos + 14 <= length and data[pos + 2] == 11:
+                identifier = bytes(data[pos + 3:pos + 14])
+                sub = pos + 14
+                if (identifier in LOOP_APPLICATIONS and sub + 5 <= length
+                        and data[sub] == 3 and data[sub + 1] == 1):
+                    layout.loop_offset = sub + 2
+                    layout.loop = struct.unpack_from('<H', data, sub + 2)[0]
+                    # 循环扩展块属于文件头，不属于任何帧
+                    if frame.start == pos and frame.gce_offset is None:
+                        frame = None
+                        pos = _skip_sub_blocks(data, sub)
+                        continue
+            pos = _skip_sub_blocks(data, pos + 2)
+        elif block == 0x2C:
+            if pos + 11 > length:
+                raise GifFormatError("GIF图像描述符被截断")
+            if frame is None:
+                frame = GifFrameBlocks(pos)
+            left, top, frame_width, frame_height, packed = struct.unpack_from('<HHHHB', data, pos + 1)
+            frame.descriptor_offset = pos
+            frame.left, frame.top = left, top
+            frame.width, frame.height = frame_width, frame_height
+            if packed & 0x80:
+                frame.local_table_size = 3 << ((packed & 0x07) + 1)
+            frame.data_offset = pos + 10 + frame.local_table_size
+            # 跳过 LZW 最小码长字节和图像数据子块
+            pos = _skip_sub_blocks(data, frame.data_offset + 1)
+            frame.end = pos
+            layout.frames.append(frame)
+            frame = None
+        else:
+            raise GifFormatError(f"无效的GIF块类型 0x{block:02X}（偏移 {pos}）")
+    return layout
+
+
+def file_signature(path):
+    """
+    获取文件的修改时间和大小，用于判断文件是否被改动
+
+    Args:
+        path: 文件路径
+
+    Returns:
+        (修改时间纳秒, 大小)，文件不存在时返回None
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def read_gif_layout(gif_path):
+    """
+    读取GIF文件并解析块结构
+
+    Args:
+        gif_path: GIF文件路径
+
+    Returns:
+        (文件内容, GifLayout对象)
+    """
+    with open(gif_path, 'rb') as f:
+        data = f.read()
+    return data, parse_gif(data)
+
+
+def _graphic_control_block(delay, disposal=0, transparency=None):
+    """
+    构造图形控制扩展块
+
+    Args:
+        delay: 持续时间（1/100秒）
+        disposal: 帧处置方法
+        transparency: 透明色索引或None
+
+    Returns:
+        字节串
+    """
+    packed = (disposal & 0x07) << 2
+    if transparency is not None:
+        packed |= 0x01
+    return struct.pack('<BBBBHBB', 0x21, GCE_LABEL, 4, packed, delay, transparency or 0, 0)
+
+
+def _loop_block(loop):
+    """构造记录循环次数的 NETSCAPE2.0 应用扩展块"""
+    return b'!\xff\x0bNETSCAPE2.0\x03\x01' + struct.pack('<H', loop) + b'\x00'
+
+
+def _to_delay(duration):
+    """将毫秒转换为GIF的 1/100 秒单位（与 Pillow 写入时的取整方式相同）"""
+    return max(0, min(0xFFFF, int(duration / 10)))
+
+
+def _write_patched(data, output_path, replacements, insertions):
+    """
+    写出修改后的文件
+
+    Args:
+        data: 原文件内容
+        output_path: 输出文件路径
+        replacements: [(偏移, 等长的新字节串)] 列表
+        insertions: [(偏移, 插入的字节串)] 列表
+    """
+    edits = sorted([(offset, len(new), new) for offset, new in replacements] +
+                   [(offset, 0, new) for offset, new in insertions], key=lambda edit: (edit[0], edit[1]))
+    temp_path = f"{output_path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'wb') as f:
+            pos = 0
+            view = memoryview(data)
+            for offset, replaced, new in edits:
+                f.write(view[pos:offset])
+                f.write(new)
+                pos = offset + replaced
+            f.write(view[pos:])
+        os.replace(temp_path, output_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def patch_gif_timing(gif_path, output_path=None, duration=None, loop=None):
+    """
+    直接修改已编码GIF中的帧持续时间和循环次数，不重新编码任何帧
+
+    持续时间只保存在每帧的图形控制扩展块中，循环次数只保存在 NETSCAPE2.0 应用扩展块中，
+    因此只需改写这些字段的几个字节。所有字段都已存在时原地修改，耗时与文件大小基本无关；
+    缺少图形控制扩展块或循环扩展块时插入新块并重写文件，同样不涉及 LZW 数据。
+
+    Args:
+        gif_path: GIF文件路径
+        output_path: 输出文件路径，None表示修改原文件
+        duration: 新的持续时间（毫秒）：整数表示所有帧相同，列表为逐帧的值，
+                  函数则接受原持续时间（毫秒）返回新持续时间；None表示不修改
+        loop: 新的循环次数（0表示无限循环），None表示不修改
+
+    Returns:
+        帧数
+    """
+    data, layout = read_gif_layout(gif_path)
+    frames = layout.frames
+    if isinstance(duration, (list, tuple)) and len(duration) != len(frames):
+        raise ValueError(f"持续时间列表长度 ({len(duration)}) 与帧数 ({len(frames)}) 不一致")
+
+    replacements = []
+    insertions = []
+    if duration is not None:
+        for i, frame in enumerate(frames):
+            if callable(duration):
+                new_duration = duration(frame.duration)
+            elif isinstance(duration, (list, tuple)):
+                new_duration = duration[i]
+            else:
+                new_duration = duration
+            delay = _to_delay(new_duration)
+            if frame.gce_offset is not None:
+                if delay != frame.delay:
+                    replacements.append((frame.gce_offset + 4, struct.pack('<H', delay)))
+            elif delay:
+                insertions.append((frame.start, _graphic_control_block(delay)))
+
+    if loop is not None and loop != layout.loop:
+        if layout.loop_offset is not None:
+            replacements.append((layout.loop_offset, struct.pack('<H', loop)))
+        else:
+            insertions.append((layout.header_end, _loop_block(loop)))
+
+    if output_path is None or os.path.abspath(output_path) == os.path.abspath(gif_path):
+        if not insertions:
+            # 所有修改都是等长替换，原地写入
+            if replacements:
+                with open(gif_path, 'r+b') as f:
+                    for offset, new in replacements:
+                        f.seek(offset)
+                        f.write(new)
+            return len(frames)
+        output_path = gif_path
+    _write_patched(data, output_path, replacements, insertions)
+    return len(frames)
@@ -4,23 +4,183 @@ GIF操作模块
 处理GIF创建和相关操作的非GUI功能
 """
 
-from PIL import Image
 import os
 
+from .gif_writer import EncodedFrame, GifStreamWriter, to_palette_frame
+from .frame_pipeline import iter_processed_frames, frame_digest, resolve_workers, SAME_AS_PREVIOUS
+from .palette import build_global_palette
 
-def save_gif(frames, output_path, duration=100, loop=0):
+
+# 写入的帧数达到总数的该比例后才根据已写入大小预测最终大小
+PROJECTION_MIN_FRACTION = 0.1
+# 预测大小超过上限的该倍数时提前放弃导出（预测有误差，留出余量）
+PROJECTION_TOLERANCE = 1.2
+
+
+class ExportCancelled(Exception):
+    """导出被用户取消"""
+
+
+def check_cancelled(cancel_event):
     """
-    保存GIF文件
+    检查导出是否已被取消
+
+    Args:
+        cancel_event: threading.Event对象或None
+
+    Raises:
+        ExportCancelled: 取消事件已设置
+    """
+    if cancel_event is not None and cancel_event.is_set():
+        raise ExportCancelled("导出已取消")
+
+
+class SizeLimitExceeded(ValueError):
+    """导出的GIF超过（或预计超过）大小上限"""
+
+    def __init__(self, message, projected_bytes):
+        super().__init__(message)
+        self.projected_bytes = projected_bytes
+
+
+def frame_durations(duration, count):
+    """
+    将帧持续时间参数展开为逐帧列表
+
+    Args:
+        duration: 统一的持续时间（毫秒），或与帧数等长的持续时间列表
+        count: 帧数
+
+    Returns:
+        持续时间列表
+    """
+    if isinstance(duration, (list, tuple)):
+        if len(duration) != count:
+            raise ValueError(f"帧持续时间列表长度 ({len(duration)}) 与帧数 ({count}) 不一致")
+        return list(duration)
+    return [duration] * count
+
+
+def _shared_palette(frames):
+    """
+    获取所有帧共用的调色板
 
     Args:
         frames: 图像帧列表
+
+    Returns:
+        所有帧都是 'P' 模式且调色板完全相同时返回该调色板（RGB字节串），否则返回None
+    """
+    shared = None
+    for frame in frames:
+        if frame.mode != 'P':
+            return None
+        palette = bytes(frame.getpalette('RGB') or [])
+        if shared is None:
+            shared = palette
+        elif palette != shared:
+            return None
+    return shared or None
+
+
+def save_gif(frames, output_path, duration=100, loop=0, delta=True, global_palette=None, frame_size=None,
+             progress_callback=None, cancel_event=None):
+    """
+    保存GIF文件
+
+    已是 'P' 模式的帧直接按原有调色板编码写入，不再经过RGB往返和二次量化，
+    输出与预览完全一致；只有其他模式的帧才会转换。所有帧共用同一调色板时写为全局颜色表。
+    连续的重复帧合并为一帧，持续时间累加；delta 为 True 时每帧只写出相对上一帧变化的区域。
+    画布尺寸取 frame_size 或第一帧的尺寸，尺寸不同的帧按最近邻缩放到画布尺寸后写入。
+    frames 也可以是 LazyFrameSource 等支持 len() 和迭代的帧序列，帧在写入时逐帧取出；
+    此时应传入已知的 global_palette 和 frame_size，避免为检查调色板和尺寸预先遍历全部帧。
+
+    Args:
+        frames: 图像帧列表或帧序列
         output_path: 输出文件路径
-        duration: 每帧持续时间（毫秒）
+        duration: 每帧持续时间（毫秒），或与帧数等长的持续时间列表
         loop: 循环次数（0表示无限循环）
+        delta: 是否启用帧间差分编码（要求所有帧尺寸相同）
+        global_palette: 所有帧共用的调色板（RGB字节串），None表示检查各帧是否共用调色板
+        frame_size: 所有帧的统一尺寸 (width, height)，None表示检查各帧尺寸
+        progress_callback: 进度回调函数，接受当前进度百分比作为参数
+        cancel_event: threading.Event对象，设置后中止保存并删除未完成的文件
+    """
+    _prepare_output_path(output_path)
+    if not frames:
+        raise ValueError("没有可保存的帧")
+
+    total_frames = len(frames)
+    durations = frame_durations(duration, total_frames)
+    if global_palette is None:
+        global_palette = _shared_palette(frames)
+    delta_encoder = None
+    if delta and (frame_size is not None or len({frame.size for frame in frames}) == 1):
+        from .frame_delta import DeltaFrameEncoder
+        delta_encoder = DeltaFrameEncoder()
+
+    with GifStreamWriter(output_path, loop=loop, global_palette=global_palette) as writer:
+        def write_frame(frame, frame_duration):
+            if delta_encoder is not None:
+                region, offset, transparency, disposal = delta_encoder.encode(to_palette_frame(frame))
+                writer.add_frame(region, duration=frame_duration, disposal=disposal, offset=offset,
+                                 transparency=transparency)
+            else:
+                writer.add_frame(frame, duration=frame_duration)
+
+        pending_frame, pending_digest, pending_duration = None, None, 0
+        for i, (frame, frame_duration) in enumerate(zip(frames, durations)):
+            check_cancelled(cancel_event)
+            digest = frame_digest(frame) if frame.mode == 'P' else None
+            if pending_frame is not None and digest is not None and digest == pending_digest:
+                pending_duration += frame_duration
+            else:
+                if pending_frame is not None:
+                    write_frame(pending_frame, pending_duration)
+                pending_frame, pending_digest, pending_duration = frame, digest, frame_duration
+            if progress_callback:
+                progress_callback(int((i + 1) / total_frames * 99))
+        write_frame(pending_frame, pending_duration)
+        check_cancelled(cancel_event)
+    if progress_callback:
+        progress_callback(100)
+    return True
+
+
+def probe_size(image_paths):
+    """
+    读取第一张可打开图片的尺寸（只解析文件头）
+
+    Args:
+        image_paths: 图片路径列表
+
+    Returns:
+        (width, height) 或 None
+    """
+    from .multiframe import open_image
+    for img_path in image_paths:
+        try:
+            with open_image(img_path) as img:
+                return img.size
+        except Exception:
+            continue
+    return None
+
+
+def _prepare_output_path(output_path):
+    """
+    检查输出路径并确保输出目录存在
+
+    Args:
+        output_path: 输出文件路径或可写的文件对象
     """
     if not output_path:
         raise ValueError("请先设置输出文件路径")
 
+    # 文件对象无需检查目录
+    if hasattr(output_path, 'write'):
+        return
+
     # 检查输出路径是否包含目录部分
     output_dir = os.path.dirname(output_path)
     if not output_dir:
@@ -30,96 +190,154 @@ def save_gif(frames, output_path, duration=100, loop=0):
     if output_dir and not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
-    try:
-        # 确保所有帧具有相同的颜色模式
-        # 转换所有帧为RGB模式，然后再保存为GIF
-        converted_frames = []
-        for frame in frames:
-            # 转换为RGB模式
-            if frame.mode != 'RGB':
-                frame = frame.convert('RGB')
-            converted_frames.append(frame)
-
-        # 保存为GIF
-        converted_frames[0].save(
-            output_path,
-            save_all=True,
-            append_images=converted_frames[1:],
-            duration=duration,
-            loop=loop,
-            optimize=True
-        )
-        return True
-    except Exception as e:
-        raise e
-
-
-def create_gif(image_paths, output_path, duration=100, loop=0, resize=None, optimize=True, progress_callback=None):
+
+def create_gif(image_paths, output_path, duration=100, loop=0, resize=None, optimize=True, progress_callback=None,
+               workers=None, palette_mode='local', delta=False, coalesce=True,
+               cache=None, colors=256, max_bytes=None, cancel_event=None, frame_map=None):
     """
     将多张图片创建为GIF动画
 
+    图片逐张解码、缩放、量化并立即写入输出文件，
+    峰值内存只与单帧大小有关，与帧数无关。
+    指定 workers 时，解码、缩放和量化会分摊到共享进程池中并行执行，
+    结果按原始顺序写入；未启用帧间差分编码时LZW编码也在进程池中完成，
+    主进程只按顺序拼接编码好的图像块，解码结果与串行编码完全相同。
+    palette_mode 为 'global' 时先从抽样帧计算一份共享调色板，所有帧映射到该调色板，
+    输出文件不再包含局部颜色表；抽样色差过大时自动回退到局部调色板。
+    delta 为 True 时每帧只写出相对上一帧发生变化的矩形区域，区域内未变化的像素设为透明，
+    适合界面录屏等大部分画面静止的序列。
+    coalesce 为 True 时，连续重复的帧（文件字节相同或量化后像素相同）合并为一帧，
+    持续时间为各帧之和；字节相同的文件不再解码，像素相同的帧不再编码。
+    指定 cache 时预处理结果保存在磁盘帧缓存中，输入和设置未变的帧再次导出时只需编码。
+    指定 max_bytes 时，一旦已写入的大小或按已写入部分推算的最终大小超过上限，
+    立即放弃导出、删除未完成的文件并抛出 SizeLimitExceeded。
+    指定 cancel_event 时每处理一帧检查一次，事件被设置后删除未完成的文件并抛出 ExportCancelled，
+    可在后台线程中导出并随时取消。
+
     Args:
         image_paths: 图片路径列表
-        output_path: 输出GIF文件路径
-        duration: 每帧持续时间（毫秒）
+        output_path: 输出GIF文件路径或可写的二进制文件对象
+        duration: 每帧持续时间（毫秒），或与图片数量等长的持续时间列表
         loop: 循环次数（0表示无限循环）
         resize: 调整尺寸，格式为 (width, height) 或 None
         optimize: 是否优化GIF
         progress_callback: 进度回调函数，接受当前进度百分比作为参数
+        workers: 预处理进程数，None或1表示串行处理，0表示使用全部CPU核心
+        palette_mode: 调色板模式，'local'（每帧独立）或 'global'（共享全局调色板）
+        delta: 是否启用帧间差分编码
+        coalesce: 是否合并连续重复的帧
+        cache: FrameCache对象，None表示不使用帧缓存
+        colors: 调色板的最大颜色数（2-256）
+        max_bytes: 输出文件大小上限（字节），None表示不限制
+        cancel_event: threading.Event对象，设置后中止导出
+        frame_map: 列表，导出时依次追加每张图片在输出GIF中的帧索引（加载失败的图片为None），
+                   重复帧合并后多张图片对应同一帧；可用于之后按帧修补输出文件
     """
     if not image_paths:
         raise ValueError("至少需要一张图片")
 
-    if not output_path:
-        raise ValueError("请先设置输出文件路径")
-
-    # 检查输出路径是否包含目录部分
-    output_dir = os.path.dirname(output_path)
-    if not output_dir:
-        raise ValueError("输出路径必须包含目录部分，请选择完整的文件路径")
-
-    # 确保输出目录存在
-    if output_dir and not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+    _prepare_output_path(output_path)
 
-    # 加载和处理所有图片
-    images = []
     total_images = len(image_paths)
+    durations = frame_durations(duration, total_images)
+    # 未指定尺寸时，所有帧统一缩放到第一张图片的尺寸
+    target_size = tuple(resize) if resize else probe_size(image_paths)
+
+    global_palette = None
+    if palette_mode == 'global':
+        global_palette, error = build_global_palette(image_paths, target_size, colors=colors)
+        if global_palette is None:
+            print(f"提示: 抽样色差过大 ({error:.1f})，回退到局部调色板")
+
+    writer = GifStreamWriter(output_path, size=target_size, loop=loop, global_palette=global_palette,
+                             optimize=optimize)
+    # 帧间差分编码依赖上一帧，只能在主进程中按顺序编码
+    parallel_encode = not delta and resolve_workers(workers) > 1
+    frames = iter_processed_frames(image_paths, target_size, workers, global_palette, skip_duplicates=coalesce,
+                                   cache=cache, colors=colors, encode=parallel_encode, optimize=optimize)
+    delta_encoder = None
+    if delta:
+        from .frame_delta import DeltaFrameEncoder
+        delta_encoder = DeltaFrameEncoder()
+
+    def write_frame(frame, frame_duration):
+        if isinstance(frame, EncodedFrame):
+            writer.add_encoded_frame(frame, duration=frame_duration)
+        elif delta_encoder is not None:
+            region, offset, transparency, disposal = delta_encoder.encode(frame)
+            writer.add_frame(region, duration=frame_duration, disposal=disposal, offset=offset,
+                             transparency=transparency)
+        else:
+            writer.add_frame(frame, duration=frame_duration)
 
-    for i, img_path in enumerate(image_paths):
-        try:
-            img = Image.open(img_path)
-            if resize:
-                img = img.resize(resize, Image.Resampling.LANCZOS)
-            # 转换为调色板模式以优化GIF
-            if img.mode != 'P':
-                img = img.convert('P', palette=Image.ADAPTIVE)
-            images.append(img)
-
-            # 调用进度回调
+    def check_size_limit(processed):
+        # processed 为已写入文件的输入图片数
+        if max_bytes is None or processed <= 0:
+            return
+        projected = writer.bytes_written * total_images // processed
+        if writer.bytes_written > max_bytes:
+            raise SizeLimitExceeded(f"GIF大小超过上限 {max_bytes} 字节", projected)
+        if processed >= max(2, total_images * PROJECTION_MIN_FRACTION):
+            if projected > max_bytes * PROJECTION_TOLERANCE:
+                raise SizeLimitExceeded(f"预计GIF大小 {projected} 字节，超过上限 {max_bytes} 字节", projected)
+
+    # 等待写入的帧：后续重复帧的持续时间会累加到这一帧上
+    pending_frame, pending_digest, pending_duration = None, None, 0
+    previous_loaded = False
+    try:
+        for i, (img_path, frame, error) in enumerate(frames):
+            check_cancelled(cancel_event)
+            if error is not None:
+                print(f"警告: 无法加载图片 {img_path}: {error}")
+                previous_loaded = False
+            elif frame is SAME_AS_PREVIOUS:
+                # 与上一张图片字节相同；上一张加载失败时这一张同样无法加载
+                if previous_loaded:
+                    pending_duration += durations[i]
+                else:
+                    print(f"警告: 无法加载图片 {img_path}: 与上一张无法加载的图片内容相同")
+            else:
+                if not coalesce:
+                    digest = None
+                elif isinstance(frame, EncodedFrame):
+                    digest = frame.digest
+                else:
+                    digest = frame_digest(frame)
+                if pending_frame is not None and digest is not None and digest == pending_digest:
+                    pending_duration += durations[i]
+                else:
+                    if pending_frame is not None:
+                        write_frame(pending_frame, pending_duration)
+                    pending_frame, pending_digest, pending_duration = frame, digest, durations[i]
+                del frame
+                previous_loaded = True
+
+            if frame_map is not None:
+                # 等待写入的帧将成为输出中的下一帧
+                frame_map.append(writer.frame_count if previous_loaded else None)
+
+            # 第 i 张图片仍在等待合并，已写入的是前 i 张
+            check_size_limit(i)
+
+            # 调用进度回调（写入完成前最多报告99%）
             if progress_callback:
-                progress = int((i + 1) / total_images * 80)  # 加载图片占80%
-                progress_callback(progress)
+                progress_callback(int((i + 1) / total_images * 99))
 
-        except Exception as e:
-            print(f"警告: 无法加载图片 {img_path}: {e}")
-            if progress_callback:
-                progress = int((i + 1) / total_images * 80)
-                progress_callback(progress)
-            continue
+        if pending_frame is not None:
+            write_frame(pending_frame, pending_duration)
+            pending_frame = None
+        check_size_limit(total_images)
+        check_cancelled(cancel_event)
 
-    if not images:
-        raise ValueError("没有成功加载任何图片")
+        if writer.frame_count == 0:
+            raise ValueError("没有成功加载任何图片")
 
-    # 保存为GIF
-    images[0].save(
-        output_path,
-        save_all=True,
-        append_images=images[1:],
-        duration=duration,
-        loop=loop,
-        optimize=optimize
-    )
+        writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+    finally:
+        frames.close()
 
     # 完成
     if progress_callback:
@@ -131,10 +349,16 @@ def create_gif(image_paths, output_path, duration=100, loop=0, resize=None, opti
 def create_gif_from_gui(main_window_instance):
     """
     从GUI创建GIF
-    根据用户设置的参数生成GIF文件
+    根据用户设置的参数在后台线程中生成GIF文件，并显示可取消的进度对话框
     """
     from tkinter import messagebox
     from .file_manager import validate_gif_params
+    from .frame_cache import get_default_cache
+
+    # 同一时间只允许一个导出任务
+    if getattr(main_window_instance, 'export_task', None) is not None:
+        messagebox.showinfo("提示", "正在导出GIF，请等待当前导出完成或取消")
+        return
     from .ui_operations import browse_output
 
     # 检查输出路径是否已设置
@@ -181,18 +405,67 @@ def create_gif_from_gui(main_window_instance):
         except ValueError:
             pass
 
-    # 创建GIF
-    try:
-        create_gif(
-            image_paths=main_window_instance.image_paths,
-            output_path=output_path,
-            duration=main_window_instance.duration.get(),
-            loop=main_window_instance.loop.get(),
-            resize=resize,
-            optimize=main_window_instance.optimize.get()
-        )
-
-        messagebox.showinfo("成功", f"GIF已成功创建\n{output_path}")
-
-    except Exception as e:
-        messagebox.showerror("错误", f"创建GIF失败:\n{str(e)}")
\ No newline at end of file
+    max_bytes = None
+    max_size = main_window_instance.max_size.get().strip()
+    if max_size:
+        from .size_target import parse_size
+        try:
+            max_bytes = parse_size(max_size)
+        except ValueError as e:
+            messagebox.showerror("错误", str(e))
+            return
+
+    # 在后台线程中创建GIF，界面保持响应
+    options = dict(
+        duration=main_window_instance.duration.get(),
+        loop=main_window_instance.loop.get(),
+        resize=resize,
+        optimize=main_window_instance.optimize.get(),
+        workers=0,
+        palette_mode='global' if main_window_instance.global_palette.get() else 'local',
+        cache=get_default_cache()
+    )
+    # 复制路径列表，导出期间用户对列表的修改不影响本次导出
+    image_paths = list(main_window_instance.image_paths)
+
+    from .gif_splice import make_export_manifest, plan_splice, splice_gif_frames
+    # 上次导出后只改动了少数图片时，只重新编码这些图片对应的帧
+    last_export = getattr(main_window_instance, 'last_export', None)
+    replacements = None
+    if max_bytes is None:
+        replacements = plan_splice(last_export, image_paths, output_path, options)
+
+    def export(progress_callback, cancel_event):
+        # 返回本次导出的记录，供下次导出判断能否修补
+        if max_bytes is not None:
+            from .size_target import export_to_size
+            export_to_size(image_paths, output_path, max_bytes, progress_callback=progress_callback,
+                           cancel_event=cancel_event, **options)
+            return None
+        if replacements is not None:
+            if replacements:
+                splice_gif_frames(output_path, replacements, cancel_event=cancel_event)
+            progress_callback(100)
+            return make_export_manifest(image_paths, output_path, options, last_export['frame_map'])
+        frame_map = []
+        create_gif(image_paths=image_paths, output_path=output_path, progress_callback=progress_callback,
+                   cancel_event=cancel_event, frame_map=frame_map, **options)
+        return make_export_manifest(image_paths, output_path, options, frame_map)
+
+    def on_finished(state):
+        main_window_instance.export_task = None
+        main_window_instance.last_export = state['result']
+        if state['cancelled']:
+            messagebox.showinfo("提示", "已取消导出")
+        elif state['error'] is not None:
+            messagebox.showerror("错误", f"创建GIF失败:\n{str(state['error'])}")
+        else:
+            messagebox.showinfo("成功", f"GIF已成功创建\n{output_path}\n用时 {state['elapsed']:.1f} 秒")
+
+    from .export_task import ExportTask
+    from gui.export_progress_gui import ExportProgressDialog
+
+    task = ExportTask(export, total_frames=len(image_paths))
+    main_window_instance.export_task = task
+    task.start()
+    ExportProgressDialog(main_window_instance.root, task, on_finished=on_finished)
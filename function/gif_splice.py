@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+"""
+GIF帧修补模块
+只重新编码已编码GIF中被修改的帧，其余帧的LZW数据按字节原样复制，
+修补耗时与修改的帧数成正比，与动画总长度基本无关
+"""
+
+import io
+import os
+
+from PIL import Image
+
+from .gif_blocks import file_signature, read_gif_layout
+from .gif_writer import GifStreamWriter, to_palette_frame
+
+
+# 帧处置方法：保留
+DISPOSAL_KEEP = 1
+# 改动的帧超过该比例时重新完整导出比修补更划算
+SPLICE_MAX_FRACTION = 0.5
+
+
+def _is_self_contained(frame, size):
+    """
+    判断帧是否与之前的画面无关（覆盖整个画布且不透明）
+
+    Args:
+        frame: GifFrameBlocks对象
+        size: 画布尺寸
+
+    Returns:
+        bool
+    """
+    return (frame.left == 0 and frame.top == 0 and (frame.width, frame.height) == tuple(size)
+            and frame.transparency is None)
+
+
+def _prepare_frame(image, size):
+    """
+    将替换图片缩放到画布尺寸，并按自身颜色量化为局部自适应调色板
+
+    原全局颜色表只由原来的帧生成，新图片的颜色可能不在其中，
+    映射到全局颜色表的色差往往很大，因此替换帧总是使用自己的局部颜色表。
+
+    Args:
+        image: PIL.Image对象或图片路径
+        size: 画布尺寸
+
+    Returns:
+        'P' 模式的PIL.Image对象
+    """
+    if not isinstance(image, Image.Image):
+        from .frame_pipeline import process_frame
+        return process_frame(image, size)
+    if image.size != tuple(size):
+        image = image.resize(size, Image.Resampling.LANCZOS)
+    return to_palette_frame(image)
+
+
+def _exact_palette_frame(image, palette):
+    """
+    将颜色全部来自调色板的画面无损地映射回该调色板
+
+    原文件解码出的画面只包含颜色表中的颜色，逐像素精确查找索引，
+    避免近似量化把相近的颜色映射到错误的索引。
+
+    Args:
+        image: 'RGB' 模式的PIL.Image对象
+        palette: RGB调色板字节串
+
+    Returns:
+        'P' 模式的PIL.Image对象，画面中有调色板以外的颜色时返回None
+    """
+    import numpy as np
+
+    colors = np.frombuffer(palette, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+    keys = (colors[:, 0] << 16) | (colors[:, 1] << 8) | colors[:, 2]
+    # 重复的颜色取第一个索引
+    unique_keys, first_index = np.unique(keys, return_index=True)
+    pixels = np.asarray(image, dtype=np.int32)
+    pixel_keys = (pixels[..., 0] << 16) | (pixels[..., 1] << 8) | pixels[..., 2]
+    positions = np.clip(np.searchsorted(unique_keys, pixel_keys), 0, len(unique_keys) - 1)
+    if not np.array_equal(unique_keys[positions], pixel_keys):
+        return None
+    frame = Image.fromarray(first_index[positions].astype(np.uint8), 'P')
+    frame.putpalette(palette)
+    return frame
+
+
+def _encode_frame(frame, size, global_palette, duration):
+    """
+    将单帧编码为可直接拼接进GIF的字节（图形控制扩展块、图像描述符、颜色表和LZW数据）
+
+    Args:
+        frame: 'P' 模式的PIL.Image对象
+        size: 画布尺寸
+        global_palette: 原文件的全局颜色表（RGB字节串）或None
+        duration: 帧持续时间（毫秒）
+
+    Returns:
+        字节串
+    """
+    buffer = io.BytesIO()
+    # 原文件没有全局颜色表时用占位颜色表，使帧写出局部颜色表
+    writer = GifStreamWriter(buffer, size=size, loop=None, global_palette=global_palette or b'\x00\x00\x00')
+    writer.add_frame(frame, duration=duration, disposal=DISPOSAL_KEEP)
+    return buffer.getvalue()[writer.header_bytes:]
+
+
+def _original_composites(gif_path, indices):
+    """
+    解码原文件中指定帧显示时的完整画面
+
+    Args:
+        gif_path: GIF文件路径
+        indices: 帧索引集合
+
+    Returns:
+        {帧索引: 'RGB' 模式的PIL.Image对象}
+    """
+    composites = {}
+    if not indices:
+        return composites
+    with Image.open(gif_path) as img:
+        # GIF只能顺序解码，一次遍历取出所有需要的帧
+        for index in sorted(indices):
+            img.seek(index)
+            composites[index] = img.convert('RGB')
+    return composites
+
+
+def splice_gif_frames(gif_path, replacements, output_path=None, cancel_event=None):
+    """
+    用新图片替换已编码GIF中的若干帧，其余帧按字节原样复制
+
+    替换帧按画布尺寸写为完整的不透明帧，使用按新图片颜色计算的局部自适应调色板。帧间差分编码的GIF中，替换帧之后依赖上一帧画面的帧
+    会按原文件中的完整画面重新编码（需要顺序解码原文件到该帧），直到遇到不依赖之前画面的帧为止；
+    每帧都是完整画面的GIF只需编码被替换的帧。帧的持续时间保持不变。
+
+    Args:
+        gif_path: GIF文件路径
+        replacements: {帧索引: PIL.Image对象或图片路径}
+        output_path: 输出文件路径，None表示修改原文件
+        cancel_event: threading.Event对象，设置后中止修补，原文件保持不变
+
+    Returns:
+        重新编码的帧索引列表（升序）
+
+    Raises:
+        ExportCancelled: 修补被取消
+    """
+    from .gif_operations import check_cancelled
+
+    data, layout = read_gif_layout(gif_path)
+    frames = layout.frames
+    for index in replacements:
+        if not 0 <= index < len(frames):
+            raise IndexError(f"帧索引 {index} 超出范围（共 {len(frames)} 帧）")
+
+    global_palette = bytes(data[13:13 + layout.global_table_size]) or None
+
+    # 找出因上一帧画面变化而需要按原画面重新编码的帧
+    rewritten = set()
+    for index in range(len(frames)):
+        if index in replacements:
+            continue
+        previous = index - 1
+        if previous < 0 or _is_self_contained(frames[index], layout.size):
+            continue
+        if previous in replacements:
+            rewritten.add(index)
+        elif previous in rewritten and frames[previous].disposal not in (0, DISPOSAL_KEEP):
+            # 重新编码的帧不再恢复原处置方法所需的画面，后一帧也要按原画面重新编码
+            rewritten.add(index)
+    composites = _original_composites(gif_path, rewritten)
+
+    encoded = {}
+    for index, image in replacements.items():
+        check_cancelled(cancel_event)
+        frame = _prepare_frame(image, layout.size)
+        encoded[index] = _encode_frame(frame, layout.size, global_palette, frames[index].duration)
+    for index, composite in composites.items():
+        check_cancelled(cancel_event)
+        # 原帧使用全局颜色表时，原画面可以无损地映射回全局颜色表，保持颜色与其余帧一致
+        frame = None
+        if global_palette is not None and frames[index].local_table_size == 0:
+            frame = _exact_palette_frame(composite, global_palette)
+        if frame is None:
+            frame = _prepare_frame(composite, layout.size)
+        encoded[index] = _encode_frame(frame, layout.size, global_palette, frames[index].duration)
+
+    output_path = output_path or gif_path
+    temp_path = f"{output_path}.{os.getpid()}.tmp"
+    view = memoryview(data)
+    try:
+        with open(temp_path, 'wb') as f:
+            pos = 0
+            for index, frame in enumerate(frames):
+                check_cancelled(cancel_event)
+                # 帧之间的其他块（如注释）原样保留
+                f.write(view[pos:frame.start])
+                if index in encoded:
+                    f.write(encoded[index])
+                else:
+                    f.write(view[frame.start:frame.end])
+                pos = frame.end
+            f.write(view[pos:])
+        os.replace(temp_path, output_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return sorted(encoded)
+
+
+def _input_signature(path):
+    """获取输入图片的标识，帧引用按所在文件的修改时间和大小判断是否改动"""
+    from .multiframe import source_path
+    return os.path.abspath(path), file_signature(source_path(path))
+
+
+def make_export_manifest(image_paths, output_path, options, frame_map):
+    """
+    记录一次完整导出的输入、设置和帧对应关系，供之后按帧修补输出文件
+
+    Args:
+        image_paths: 导出使用的图片路径列表
+        output_path: 输出GIF文件路径
+        options: 导出设置字典
+        frame_map: create_gif() 填写的每张图片对应的输出帧索引列表
+
+    Returns:
+        导出记录字典
+    """
+    return {
+        'output': os.path.abspath(output_path),
+        'output_signature': file_signature(output_path),
+        'options': dict(options),
+        'inputs': [_input_signature(path) for path in image_paths],
+        'frame_map': list(frame_map),
+    }
+
+
+def plan_splice(manifest, image_paths, output_path, options):
+    """
+    判断能否通过修补上次导出的文件完成本次导出
+
+    要求输出文件自上次导出后未被改动、导出设置相同、图片数量相同，
+    且每张改动过（路径、修改时间或大小不同）的图片在输出中独占一帧（未与相邻重复帧合并）。
+    未设置统一尺寸（resize 为 None）时画布尺寸由第一张图片决定，第一张图片改动后不能修补。
+
+    Args:
+        manifest: make_export_manifest() 返回的上次导出记录或None
+        image_paths: 本次导出的图片路径列表
+        output_path: 本次导出的输出文件路径
+        options: 本次导出设置字典
+
+    Returns:
+        {输出帧索引: 图片路径}（可能为空，表示无需修改）；无法修补时返回None
+    """
+    if manifest is None or manifest['output'] != os.path.abspath(output_path):
+        return None
+    if manifest['output_signature'] is None or manifest['output_signature'] != file_signature(output_path):
+        return None
+    if manifest['options'] != options or len(manifest['inputs']) != len(image_paths):
+        return None
+
+    frame_map = manifest['frame_map']
+    replacements = {}
+    for i, path in enumerate(image_paths):
+        if manifest['inputs'][i] == _input_signature(path):
+            continue
+        if i == 0 and options.get('resize') is None:
+            return None
+        frame_index = frame_map[i]
+        if frame_index is None or frame_map.count(frame_index) != 1:
+            return None
+        replacements[frame_index] = path
+    if len(replacements) > len(set(frame_map)) * SPLICE_MAX_FRACTION:
+        return None
+    return replacements
@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+"""
+GIF流式写入模块
+逐帧编码并写入GIF文件，内存中只保留当前正在写入的帧；
+完整画布帧也可以在子进程中预先编码，写入器只负责按顺序拼接
+"""
+
+import os
+import struct
+
+from PIL import Image, GifImagePlugin
+
+
+def palette_bytes(image):
+    """
+    获取调色板帧的RGB调色板字节
+
+    Args:
+        image: 'P' 模式的PIL.Image对象
+
+    Returns:
+        RGB调色板字节串（长度为3的倍数）
+    """
+    palette = image.getpalette('RGB') or []
+    return bytes(palette)
+
+
+def _color_table_size(num_colors):
+    """
+    计算颜色表大小字段（颜色数为 2 ** (size + 1)）
+
+    Args:
+        num_colors: 颜色数量
+
+    Returns:
+        颜色表大小字段值（0-7）
+    """
+    return max(0, (max(2, num_colors) - 1).bit_length() - 1)
+
+
+def padded_color_table(palette):
+    """
+    将调色板补齐到GIF要求的 2 的幂次长度
+
+    Args:
+        palette: RGB调色板字节串
+
+    Returns:
+        补齐后的颜色表字节串
+    """
+    num_colors = 2 << _color_table_size(len(palette) // 3)
+    return palette[:num_colors * 3].ljust(num_colors * 3, b'\x00')
+
+
+def to_palette_frame(image):
+    """
+    将任意模式的图片转换为可写入GIF的调色板帧
+
+    Args:
+        image: PIL.Image对象
+
+    Returns:
+        'P' 模式的PIL.Image对象
+    """
+    if image.mode == 'P':
+        return image
+    if image.mode in ('1', 'L'):
+        return image.convert('RGB').convert('P', palette=Image.ADAPTIVE)
+    return image.convert('P', palette=Image.ADAPTIVE)
+
+
+def optimize_palette(frame, transparency=None):
+    """
+    去除调色板中未被使用的颜色，缩小局部颜色表
+
+    Args:
+        frame: 'P' 模式的PIL.Image对象
+        transparency: 透明色索引或None
+
+    Returns:
+        (优化后的帧, 重新映射后的透明色索引)
+    """
+    palette = palette_bytes(frame)
+    used = [i for i, count in enumerate(frame.histogram()) if count]
+    if not used or len(used) * 3 >= len(palette):
+        return frame, transparency
+
+    # 只有颜色表能缩小一级以上时才值得重新映射
+    if _color_table_size(len(used)) >= _color_table_size(len(palette) // 3):
+        return frame, transparency
+
+    if transparency is not None:
+        if transparency in used:
+            transparency = used.index(transparency)
+        else:
+            transparency = None
+    return frame.remap_palette(used), transparency
+
+
+class EncodedFrame:
+    """
+    预先编码好的完整画布帧
+
+    data 为图像描述符、局部颜色表和LZW图像数据（不含图形控制扩展块），
+    持续时间在写入时才确定（重复帧合并会累加持续时间），由写入器补上图形控制扩展块。
+    对象可以在进程之间传递。
+    """
+
+    def __init__(self, size, palette, data, digest=None):
+        self.size = size
+        self.palette = palette  # 局部颜色表对应的调色板（未补齐），不含局部颜色表时为全局调色板
+        self.data = data
+        self.digest = digest  # 编码前调色板帧的 frame_digest()，用于合并重复帧
+        self.frame = None  # 需要写入帧缓存时附带的编码前调色板帧
+
+
+def encode_frame(frame, global_palette=None, optimize=True):
+    """
+    将一帧编码为放在画布左上角的完整画布帧，可在子进程中执行
+
+    帧调色板是全局调色板的前缀时不写局部颜色表，否则写入（按需裁剪未使用的颜色）。
+    未知全局调色板时（局部调色板模式下第一帧决定全局颜色表）一律写入局部颜色表，
+    写入器发现它与全局颜色表一致时再去掉，LZW数据不受影响。
+
+    Args:
+        frame: PIL.Image对象（非 'P' 模式时会自动量化）
+        global_palette: 全局调色板（RGB字节串）或None
+        optimize: 是否裁剪局部调色板中未使用的颜色
+
+    Returns:
+        EncodedFrame对象
+    """
+    frame = to_palette_frame(frame)
+    palette = palette_bytes(frame)
+    uses_global = bool(global_palette) and bool(palette) and global_palette[:len(palette)] == palette
+    if not uses_global and optimize:
+        frame, _ = optimize_palette(frame)
+        palette = palette_bytes(frame)
+    data = b''.join(GifImagePlugin.getdata(frame, (0, 0), include_color_table=not uses_global))
+    return EncodedFrame(frame.size, palette, data)
+
+
+class GifStreamWriter:
+    """
+    GIF流式写入器
+
+    用法:
+        writer = GifStreamWriter('out.gif', loop=0)
+        for frame in frames:
+            writer.add_frame(frame, duration=100)
+        writer.close()
+
+    每次 add_frame() 都会立即编码并写出该帧，写入器本身不保留任何帧数据，
+    因此无论序列多长，内存占用都只与单帧大小有关。
+    """
+
+    def __init__(self, output, size=None, loop=0, global_palette=None, optimize=True):
+        """
+        初始化写入器
+
+        Args:
+            output: 输出文件路径或可写的二进制文件对象
+            size: 画布尺寸 (width, height)，None表示使用第一帧的尺寸
+            loop: 循环次数（0表示无限循环，None表示不写入循环扩展块）
+            global_palette: 全局调色板（RGB字节串），None表示使用第一帧的调色板
+            optimize: 是否裁剪局部调色板中未使用的颜色
+        """
+        self._owns_file = not hasattr(output, 'write')
+        self.output_path = output if self._owns_file else None
+        self.fp = open(output, 'wb') if self._owns_file else output
+        self.size = tuple(size) if size else None
+        self.loop = loop
+        self.global_palette = bytes(global_palette) if global_palette else None
+        self.optimize = optimize
+        self.frame_count = 0
+        self.bytes_written = 0
+        self.header_bytes = 0
+        self.closed = False
+        self._header_written = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+    def _write(self, data):
+        """写入数据并统计字节数"""
+        self.fp.write(data)
+        self.bytes_written += len(data)
+
+    def _write_header(self, palette):
+        """
+        写入文件头、逻辑屏幕描述符、全局颜色表和循环扩展块
+
+        Args:
+            palette: 全局颜色表使用的RGB调色板字节串
+        """
+        width, height = self.size
+        table_size = _color_table_size(len(palette) // 3)
+        self._write(b'GIF89a' + struct.pack('<HH', width, height))
+        self._write(bytes((0x80 | table_size, 0, 0)))
+        self._write(padded_color_table(palette))
+        if self.loop is not None:
+            self._write(b'!\xff\x0bNETSCAPE2.0\x03\x01' + struct.pack('<H', self.loop) + b'\x00')
+        self.global_palette = palette
+        self.header_bytes = self.bytes_written
+        self._header_written = True
+
+    def _uses_global_palette(self, frame):
+        """
+        判断帧能否直接使用全局颜色表
+
+        帧调色板是全局调色板的前缀时，帧中所有索引在全局颜色表中对应的颜色都相同，
+        因此无需写入局部颜色表。
+
+        Args:
+            frame: 'P' 模式的PIL.Image对象
+
+        Returns:
+            bool
+        """
+        return self._is_global_prefix(palette_bytes(frame))
+
+    def _is_global_prefix(self, palette):
+        """判断调色板是否为全局调色板的前缀"""
+        return bool(palette) and self.global_palette[:len(palette)] == palette
+
+    def add_frame(self, frame, duration=100, disposal=0, offset=(0, 0), transparency=None):
+        """
+        编码并写入一帧
+
+        offset 为 (0, 0) 且尺寸与画布不同的整帧按最近邻缩放到画布尺寸；
+        带偏移的局部区域（差分编码产生的脏矩形）超出画布时抛出 ValueError。
+
+        Args:
+            frame: PIL.Image对象（非 'P' 模式时会自动量化）
+            duration: 帧持续时间（毫秒）
+            disposal: 帧处置方法（0-3）
+            offset: 帧在画布上的位置 (x, y)
+            transparency: 透明色索引或None
+        """
+        if self.closed:
+            raise ValueError("写入器已关闭")
+
+        frame = to_palette_frame(frame)
+
+        if not self._header_written:
+            if self.size is None:
+                self.size = frame.size
+            if self.global_palette is None:
+                if self.optimize:
+                    frame, transparency = optimize_palette(frame, transparency)
+                self._write_header(palette_bytes(frame))
+            else:
+                self._write_header(self.global_palette)
+
+        # 与画布尺寸不一致的整帧统一缩放到画布尺寸；带偏移的局部区域必须落在画布内
+        if offset == (0, 0) and frame.size != self.size:
+            frame = frame.resize(self.size, Image.Resampling.NEAREST)
+        elif offset[0] + frame.width > self.size[0] or offset[1] + frame.height > self.size[1]:
+            raise ValueError(f"帧尺寸 {frame.size} 超出画布尺寸 {self.size}")
+
+        uses_global = self._uses_global_palette(frame)
+        if not uses_global and self.optimize:
+            frame, transparency = optimize_palette(frame, transparency)
+
+        params = {
+            'duration': duration,
+            'disposal': disposal,
+            'include_color_table': not uses_global,
+        }
+        if transparency is not None:
+            params['transparency'] = transparency
+
+        for chunk in GifImagePlugin.getdata(frame, offset, **params):
+            self._write(chunk)
+        self.frame_count += 1
+
+    def add_encoded_frame(self, encoded, duration=100):
+        """
+        写入一帧由 encode_frame() 预先编码好的完整画布帧
+
+        局部颜色表与全局颜色表一致时去掉局部颜色表，持续时间非0时补上图形控制扩展块，
+        与 add_frame() 写出的帧解码结果完全相同。
+
+        Args:
+            encoded: EncodedFrame对象
+            duration: 帧持续时间（毫秒）
+        """
+        if self.closed:
+            raise ValueError("写入器已关闭")
+
+        if not self._header_written:
+            if self.size is None:
+                self.size = tuple(encoded.size)
+            self._write_header(self.global_palette or encoded.palette)
+
+        if encoded.size[0] > self.size[0] or encoded.size[1] > self.size[1]:
+            raise ValueError(f"帧尺寸 {encoded.size} 超出画布尺寸 {self.size}")
+
+        data = encoded.data
+        packed = data[9]
+        if packed & 0x80 and self._is_global_prefix(encoded.palette):
+            # 去掉局部颜色表，LZW数据中的索引在全局颜色表中对应相同的颜色
+            table_bytes = 3 << ((packed & 0x07) + 1)
+            data = data[:9] + bytes((packed & ~0x87,)) + data[10 + table_bytes:]
+
+        # 与 Pillow 写入图形控制扩展块的条件和取整方式相同
+        delay = int(duration / 10)
+        if delay:
+            self._write(b'!\xf9\x04\x00' + struct.pack('<H', delay) + b'\x00\x00')
+        self._write(data)
+        self.frame_count += 1
+
+    def close(self):
+        """写入文件结束符并关闭文件"""
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            if self._header_written:
+                self._write(b';')
+            if hasattr(self.fp, 'flush'):
+                self.fp.flush()
+        finally:
+            if self._owns_file:
+                self.fp.close()
+
+    def abort(self):
+        """放弃写入，关闭文件并删除未完成的输出文件"""
+        if not self.closed:
+            self.closed = True
+            if self._owns_file:
+                self.fp.close()
+        if self._owns_file and self.output_path and os.path.exists(self.output_path):
+            try:
+                os.remove(self.output_path)
+            except OSError:
+                pass
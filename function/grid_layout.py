@@ -0,0 +1,437 @@
+# -*- coding: utf-8 -*-
+"""
+网格布局模块
+根据元数据索引中缓存的图片尺寸计算网格预览的列数、总尺寸，
+并直接求解使所有图片完整显示在窗口内的最大缩放比例（不再逐次试算完整布局）
+"""
+
+import numpy as np
+
+from .image_metadata import get_metadata_index
+
+
+# 网格中图片之间以及与边缘的间距（像素）
+GRID_PADDING = 10
+# 无法读取尺寸的图片使用的默认尺寸
+DEFAULT_CELL_SIZE = (200, 150)
+# 适应窗口时允许的缩放比例范围
+FIT_MIN_SCALE = 0.01
+FIT_MAX_SCALE = 5.0
+# 适应窗口时二分缩放比例的相对精度
+FIT_TOLERANCE = 0.0001
+
+
+def get_grid_sizes(image_paths):
+    """
+    从元数据索引获取所有图片的原始尺寸
+
+    Args:
+        image_paths: 图片路径列表
+
+    Returns:
+        形状为 (N, 2) 的 int64 数组，无法读取的图片为 DEFAULT_CELL_SIZE
+    """
+    sizes = np.empty((len(image_paths), 2), dtype=np.int64)
+    for i, metadata in enumerate(get_metadata_index().get_many(image_paths)):
+        sizes[i] = metadata.size if metadata else DEFAULT_CELL_SIZE
+    return sizes
+
+
+def scale_sizes(sizes, scale):
+    """
+    计算缩放后的显示尺寸（与网格布局一致，向下取整）
+
+    Args:
+        sizes: 形状为 (N, 2) 的原始尺寸数组
+        scale: 缩放比例
+
+    Returns:
+        形状为 (N, 2) 的 int64 数组
+    """
+    if scale == 1.0:
+        return sizes
+    return (sizes * scale).astype(np.int64)
+
+
+def grid_columns(display_sizes, canvas_width):
+    """
+    按平均显示宽度计算列数
+
+    Args:
+        display_sizes: 形状为 (N, 2) 的显示尺寸数组
+        canvas_width: Canvas宽度
+
+    Returns:
+        列数（至少为1）
+    """
+    avg_width = display_sizes[:, 0].mean() if len(display_sizes) else DEFAULT_CELL_SIZE[0]
+    return max(1, int(canvas_width / (avg_width + GRID_PADDING)))
+
+
+def _track_sums(display_sizes, cols):
+    """
+    计算按 cols 列排列时各列最大宽度之和与各行最大高度之和
+
+    Returns:
+        (列宽之和, 行高之和)
+    """
+    count = len(display_sizes)
+    rows = -(-count // cols)
+    padded = np.zeros((rows * cols, 2), dtype=display_sizes.dtype)
+    padded[:count] = display_sizes
+    grid = padded.reshape(rows, cols, 2)
+    return int(grid[:, :, 0].max(axis=0).sum()), int(grid[:, :, 1].max(axis=1).sum())
+
+
+def grid_extent(display_sizes, canvas_width):
+    """
+    计算网格布局的总尺寸（最右和最下边缘的坐标）
+
+    Args:
+        display_sizes: 形状为 (N, 2) 的显示尺寸数组
+        canvas_width: Canvas宽度
+
+    Returns:
+        (列数, 最大x, 最大y)
+    """
+    count = len(display_sizes)
+    if not count:
+        return 1, 0, 0
+    cols = grid_columns(display_sizes, canvas_width)
+    width_sum, height_sum = _track_sums(display_sizes, cols)
+    rows = -(-count // cols)
+    return cols, GRID_PADDING * min(cols, count) + width_sum, GRID_PADDING * rows + height_sum
+
+
+def fits_canvas(display_sizes, canvas_width, canvas_height):
+    """判断网格布局是否能完整显示在Canvas中（右侧和下方保留间距）"""
+    _, max_x, max_y = grid_extent(display_sizes, canvas_width)
+    return max_x <= canvas_width - GRID_PADDING and max_y <= canvas_height - GRID_PADDING
+
+
+def _max_passing(predicate, low, high):
+    """
+    在 low 和 high 之间二分，找出 predicate 仍为真的最大缩放比例
+
+    要求 predicate(low) 为真，且 predicate 随比例增大只会由真变假。
+
+    Returns:
+        缩放比例（相对精度为 FIT_TOLERANCE）
+    """
+    if predicate(high):
+        return high
+    while high - low > low * FIT_TOLERANCE:
+        middle = (low + high) / 2
+        if predicate(middle):
+            low = middle
+        else:
+            high = middle
+    return low
+
+
+def fit_grid_scale(sizes, canvas_width, canvas_height, min_scale=FIT_MIN_SCALE, max_scale=FIT_MAX_SCALE):
+    """
+    求解使所有图片完整显示在Canvas中的最大缩放比例
+
+    列数由平均宽度决定，随缩放比例增大而减少，因此每个可能的列数对应一段缩放区间。
+    在该区间内列宽之和与行高之和都与缩放比例成正比，能放下的最大比例可以直接算出。
+    显示尺寸向下取整，每列、每行最多比按比例计算的少1像素，实际能放下的比例可能略大于算出的比例
+    （缩放比例较小时差距明显，列数也可能因此更少），所以每个列数只据此得到一段很窄的区间，
+    再在区间内按取整后的实际尺寸二分。按区间上界从大到小处理各列数，
+    上界不超过已找到的结果时即可停止，通常只需处理一两个列数。
+    每次验证只需对尺寸数组做一次向量化的按行、按列取最大值，不再读取图片。
+
+    Args:
+        sizes: 形状为 (N, 2) 的原始尺寸数组（get_grid_sizes() 的结果）
+        canvas_width: Canvas宽度
+        canvas_height: Canvas高度
+        min_scale: 最小缩放比例
+        max_scale: 最大缩放比例
+
+    Returns:
+        缩放比例，最小比例也放不下时返回None
+    """
+    count = len(sizes)
+    if not count:
+        return None
+    avg_width = float(sizes[:, 0].mean())
+    width_room = canvas_width - GRID_PADDING
+    height_room = canvas_height - GRID_PADDING
+
+    # 缩放范围内可能出现的列数（列数随比例增大而减少）
+    most_cols = grid_columns(scale_sizes(sizes, min_scale), canvas_width)
+    fewest_cols = grid_columns(scale_sizes(sizes, max_scale), canvas_width)
+
+    # 每个列数对应 (区间上界, 列数, 按比例计算时能放下的最大比例, 计入取整误差后的上界,
+    #               按比例计算时列数不少于 cols 的最大比例, 计入取整误差后的上界)
+    candidates = []
+    for cols in range(fewest_cols, most_cols + 1):
+        rows = -(-count // cols)
+        width_sum, height_sum = _track_sums(sizes, cols)
+        fit_low, fit_high = max_scale, max_scale
+        if width_sum:
+            room = width_room - GRID_PADDING * min(cols, count)
+            fit_low, fit_high = min(fit_low, room / width_sum), min(fit_high, (room + cols) / width_sum)
+        if height_sum:
+            room = height_room - GRID_PADDING * rows
+            fit_low, fit_high = min(fit_low, room / height_sum), min(fit_high, (room + rows) / height_sum)
+        cols_low, cols_high = max_scale, max_scale
+        if avg_width:
+            # 比例再大列数就会少于 cols
+            room = canvas_width / cols - GRID_PADDING
+            cols_low, cols_high = min(max_scale, room / avg_width), min(max_scale, (room + 1) / avg_width)
+        upper = min(fit_high, cols_high)
+        if upper >= min_scale and fit_low > 0 and cols_low > 0:
+            candidates.append((upper, cols, fit_low, fit_high, cols_low, cols_high))
+
+    best = None
+    for upper, cols, fit_low, fit_high, cols_low, cols_high in sorted(candidates, reverse=True):
+        if best is not None and upper <= best:
+            break
+        rows = -(-count // cols)
+
+        def fits_cols(scale):
+            width_sum, height_sum = _track_sums(scale_sizes(sizes, scale), cols)
+            return (GRID_PADDING * min(cols, count) + width_sum <= width_room
+                    and GRID_PADDING * rows + height_sum <= height_room)
+
+        def keeps_cols(scale):
+            return grid_columns(scale_sizes(sizes, scale), canvas_width) >= cols
+
+        scale = min(_max_passing(fits_cols, fit_low, fit_high), _max_passing(keeps_cols, cols_low, cols_high))
+        # 比例太小时列数会多于 cols，该列数的区间为空
+        if scale >= min_scale and (best is None or scale > best) and fits_canvas(
+                scale_sizes(sizes, scale), canvas_width, canvas_height):
+            best = scale
+    return best
+
+
+class GridLayoutEngine:
+    """
+    网格预览的布局引擎
+
+    图片原始尺寸、显示尺寸、列宽、行高和行列起始坐标都保存在 NumPy 数组中，
+    用向量化运算计算。插入、删除或调整顺序时，第一个变化位置之前的图片位置不变，
+    只重新计算该位置所在行及之后各行的行高和纵坐标；列数因平均宽度变化而改变时才完整重排。
+    缩放比例或 Canvas 宽度变化时重新计算显示尺寸和列数。
+    """
+
+    def __init__(self, scale=1.0, canvas_width=800):
+        """
+        初始化空布局
+
+        Args:
+            scale: 预览缩放比例
+            canvas_width: Canvas宽度
+        """
+        self.paths = []
+        self.sizes = np.zeros((0, 2), dtype=np.int64)
+        self.display_sizes = self.sizes
+        self.scale = scale
+        self.canvas_width = canvas_width
+        self.cols = 1
+        self.col_widths = np.zeros(0, dtype=np.int64)
+        self.row_heights = np.zeros(0, dtype=np.int64)
+        self.col_x = np.zeros(0, dtype=np.int64)
+        self.row_y = np.zeros(0, dtype=np.int64)
+        # 第 r 行为前 r+1 行中各列的最大宽度，最后一行即列宽
+        self._col_max = None
+        self.generation = get_metadata_index().generation
+
+    def __len__(self):
+        return len(self.paths)
+
+    def _relayout(self, start):
+        """
+        从第 start 张图片所在的行开始重新计算布局
+
+        Args:
+            start: 第一个变化的图片索引，等于图片数量表示只检查列数是否变化
+        """
+        count = len(self.paths)
+        if not count:
+            self.cols = 1
+            self.col_widths = self.row_heights = self.col_x = self.row_y = np.zeros(0, dtype=np.int64)
+            self._col_max = None
+            return
+        cols = grid_columns(self.display_sizes, self.canvas_width)
+        if cols != self.cols:
+            self.cols = cols
+            start = 0
+        rows = -(-count // cols)
+        # 已有的行数可能多于或少于新的行数，从第一个变化的行开始重算
+        first_row = min(start // cols, len(self.row_heights), rows)
+
+        # 只取第一个变化的行及之后的图片，末行不足一行时补零
+        tail = self.display_sizes[first_row * cols:]
+        padded = np.zeros(((rows - first_row) * cols, 2), dtype=np.int64)
+        padded[:len(tail)] = tail
+        grid = padded.reshape(rows - first_row, cols, 2)
+
+        col_max = np.maximum.accumulate(grid[:, :, 0], axis=0)
+        if first_row:
+            col_max = np.maximum(col_max, self._col_max[first_row - 1])
+            col_max = np.concatenate((self._col_max[:first_row], col_max))
+        self._col_max = col_max
+        self.col_widths = self._col_max[-1]
+        self.col_x = GRID_PADDING + np.concatenate(([0], np.cumsum(self.col_widths[:-1] + GRID_PADDING)))
+
+        heights = grid[:, :, 1].max(axis=1)
+        self.row_heights = np.concatenate((self.row_heights[:first_row], heights))
+        if first_row:
+            base = self.row_y[first_row - 1] + self.row_heights[first_row - 1] + GRID_PADDING
+        else:
+            base = GRID_PADDING
+        offsets = np.concatenate(([0], np.cumsum(heights + GRID_PADDING)))[:len(heights)]
+        self.row_y = np.concatenate((self.row_y[:first_row], base + offsets))
+
+    def _sync_paths(self, image_paths):
+        """
+        使图片列表与 image_paths 一致，已有图片的尺寸直接复用
+
+        Returns:
+            第一个变化的图片索引，没有变化时为图片数量
+        """
+        old_paths = self.paths
+        start = next((i for i, (old, new) in enumerate(zip(old_paths, image_paths)) if old != new),
+                     min(len(old_paths), len(image_paths)))
+        if start == len(old_paths) == len(image_paths):
+            return start
+        known = dict(zip(old_paths[start:], self.sizes[start:].tolist()))
+        tail = image_paths[start:]
+        missing = [path for path in tail if path not in known]
+        if missing:
+            known.update(zip(missing, get_grid_sizes(missing).tolist()))
+        tail_sizes = np.array([known[path] for path in tail], dtype=np.int64).reshape(-1, 2)
+        self.paths = list(image_paths)
+        self.sizes = np.concatenate((self.sizes[:start], tail_sizes))
+        self.display_sizes = np.concatenate((self.display_sizes[:start], scale_sizes(tail_sizes, self.scale)))
+        return start
+
+    def update(self, image_paths, scale=None, canvas_width=None):
+        """
+        按当前图片列表、缩放比例和 Canvas 宽度更新布局，只重新计算变化的部分
+
+        Args:
+            image_paths: 图片路径列表
+            scale: 预览缩放比例，None表示不变
+            canvas_width: Canvas宽度，None表示不变
+        """
+        generation = get_metadata_index().generation
+        if generation != self.generation:
+            # 元数据索引中有条目失效（例如图片被裁剪保存），重新读取所有尺寸
+            self.generation = generation
+            self.paths = list(image_paths)
+            self.sizes = get_grid_sizes(self.paths)
+            start = 0
+        else:
+            start = self._sync_paths(image_paths)
+        if scale is not None and scale != self.scale:
+            self.scale = scale
+            start = 0
+        if start == 0:
+            self.display_sizes = scale_sizes(self.sizes, self.scale)
+        if canvas_width is not None:
+            self.canvas_width = canvas_width
+        self._relayout(start)
+
+    def insert(self, index, image_paths, sizes=None):
+        """
+        在 index 处插入图片
+
+        Args:
+            index: 插入位置
+            image_paths: 要插入的图片路径列表
+            sizes: 对应的原始尺寸数组，None表示从元数据索引读取
+        """
+        index = max(0, min(index, len(self.paths)))
+        sizes = get_grid_sizes(image_paths) if sizes is None else np.asarray(sizes, dtype=np.int64).reshape(-1, 2)
+        self.paths[index:index] = image_paths
+        self.sizes = np.concatenate((self.sizes[:index], sizes, self.sizes[index:]))
+        self.display_sizes = np.concatenate((self.display_sizes[:index], scale_sizes(sizes, self.scale),
+                                             self.display_sizes[index:]))
+        self._relayout(index)
+
+    def delete(self, indices):
+        """
+        删除指定索引的图片
+
+        Args:
+            indices: 图片索引集合
+        """
+        indices = sorted(i for i in set(indices) if 0 <= i < len(self.paths))
+        if not indices:
+            return
+        for i in reversed(indices):
+            del self.paths[i]
+        self.sizes = np.delete(self.sizes, indices, axis=0)
+        self.display_sizes = np.delete(self.display_sizes, indices, axis=0)
+        self._relayout(indices[0])
+
+    def move(self, source, target):
+        """
+        把第 source 张图片移动到 target 位置（与列表先 pop(source) 再 insert(target) 相同）
+
+        Args:
+            source: 原索引
+            target: 新索引
+        """
+        if source == target:
+            return
+        self.paths.insert(target, self.paths.pop(source))
+        # 只有 source 和 target 之间的图片依次前移或后移一位
+        low, high = min(source, target), max(source, target) + 1
+        shift = 1 if target < source else -1
+        self.sizes = np.concatenate((self.sizes[:low], np.roll(self.sizes[low:high], shift, axis=0),
+                                     self.sizes[high:]))
+        self.display_sizes = np.concatenate((self.display_sizes[:low],
+                                             np.roll(self.display_sizes[low:high], shift, axis=0),
+                                             self.display_sizes[high:]))
+        self._relayout(low)
+
+    def positions(self):
+        """
+        计算所有图片的左上角坐标
+
+        Returns:
+            形状为 (N, 2) 的 int64 数组
+        """
+        indices = np.arange(len(self.paths))
+        return np.stack((self.col_x[indices % self.cols], self.row_y[indices // self.cols]), axis=1)
+
+    def extent(self):
+        """
+        计算布局的总尺寸
+
+        Returns:
+            (最大x, 最大y)，没有图片时为 (0, 0)
+        """
+        count = len(self.paths)
+        if not count:
+            return 0, 0
+        last_col = min(self.cols, count) - 1
+        return (int(self.col_x[last_col] + self.col_widths[last_col]),
+                int(self.row_y[-1] + self.row_heights[-1]))
+
+    def layout(self, pending_crops=()):
+        """
+        生成与 calculate_grid_layout() 相同格式的布局数据
+
+        Args:
+            pending_crops: 待裁剪的图片集合
+
+        Returns:
+            布局信息字典列表
+        """
+        cols = self.cols
+        positions = self.positions().tolist()
+        sizes = self.display_sizes.tolist()
+        return [{
+            'index': i,
+            'path': path,
+            'position': tuple(positions[i]),
+            'size': tuple(sizes[i]),
+            'col': i % cols,
+            'row': i // cols,
+            'is_cropped': path in pending_crops
+        } for i, path in enumerate(self.paths)]
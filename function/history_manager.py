@@ -353,7 +353,8 @@ def save_pending_crops(main_window_instance):
         return
 
     from function.file_manager import batch_save_cropped_images
-    saved_count, failed_count = batch_save_cropped_images(main_window_instance.pending_crops)
+    saved_count, failed_count = batch_save_cropped_images(main_window_instance.pending_crops,
+                                                          main_window_instance.image_paths)
 
     if saved_count > 0:
         main_window_instance.pending_crops.clear()
@@ -383,10 +384,11 @@ def on_window_close(main_window_instance):
 
         if result is True:
             # 保存所有待保存的裁剪图片
+            from .file_manager import save_cropped_image
             for img_path, cropped_img in main_window_instance.pending_crops.items():
                 try:
-                    cropped_img.save(img_path)
-                    print(f"已保存裁剪图 {img_path}")
+                    save_path = save_cropped_image(img_path, cropped_img)
+                    print(f"已保存裁剪图 {save_path}")
                 except Exception as e:
                     messagebox.showerror("错误", f"保存图片失败 {img_path}: {str(e)}")
             main_window_instance.pending_crops.clear()
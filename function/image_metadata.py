@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+图片元数据索引模块
+只读取文件头获取图片的宽高、模式、格式和文件大小，每个 (路径, 修改时间) 只读取一次，
+所有需要图片尺寸的地方共用同一个索引；大批量冷启动时用线程池并行读取（适合网络驱动器）
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from .gif_blocks import file_signature
+from .multiframe import FRAME_REF_SEPARATOR, split_frame_ref
+
+
+# 并行读取文件头的线程数（读取以等待磁盘或网络为主）
+PROBE_WORKERS = 8
+# 条目在该时长（秒）内视为有效，不再检查文件是否被修改
+VALIDATE_INTERVAL = 5.0
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+
+class ImageMetadata:
+    """单张图片（或多帧图片中一帧）的元数据"""
+
+    def __init__(self, width, height, mode, format, file_size):
+        self.width = width
+        self.height = height
+        self.mode = mode
+        self.format = format
+        self.file_size = file_size  # 字节，多帧图片为整个文件的大小
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+    @property
+    def size_kb(self):
+        return self.file_size / 1024
+
+    def as_info(self):
+        """转换为 get_image_info() 返回的字典格式"""
+        return {
+            'width': self.width,
+            'height': self.height,
+            'size_kb': self.size_kb,
+            'format': self.format,
+            'mode': self.mode,
+        }
+
+
+def probe_image(image_path, file_size):
+    """
+    只读取文件头获取图片元数据（不解码像素）
+
+    Args:
+        image_path: 图片路径或多帧图片的帧引用
+        file_size: 文件大小（字节）
+
+    Returns:
+        ImageMetadata对象
+    """
+    path, index = split_frame_ref(image_path)
+    with Image.open(path) as img:
+        image_format = img.format
+        if index is not None and os.path.splitext(path)[1].lower() != '.gif':
+            # 多页 TIFF 各页尺寸可能不同；GIF 的每一帧都按画布尺寸合成
+            img.seek(index)
+        return ImageMetadata(img.width, img.height, img.mode, image_format, file_size)
+
+
+class ImageMetadataIndex:
+    """
+    图片元数据索引
+
+    条目按图片路径保存，附带读取时文件的 (修改时间, 大小)。距上次确认超过 VALIDATE_INTERVAL
+    的条目在使用前重新 stat 一次，文件未变化时沿用，变化时重新读取文件头；
+    程序自身改写图片后应调用 invalidate() 立即使条目失效。
+    同一GIF的所有帧引用共用一次读取。
+    """
+
+    def __init__(self, workers=PROBE_WORKERS):
+        """
+        初始化索引
+
+        Args:
+            workers: 并行读取文件头的线程数
+        """
+        self.workers = workers
+        self.probes = 0
+        self.generation = 0  # 每次 invalidate() 递增，供保存了尺寸的调用方判断是否需要重新读取
+        self._entries = {}  # 键 -> (文件标识, ImageMetadata或None, 确认时间)
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def _key(self, image_path):
+        """GIF 的帧引用都使用文件本身的条目，其余按路径或帧引用区分"""
+        path, index = split_frame_ref(image_path)
+        if index is not None and os.path.splitext(path)[1].lower() == '.gif':
+            return path
+        return image_path
+
+    def _fresh(self, key, now):
+        """
+        获取无需重新确认的条目
+
+        Returns:
+            (是否有效, ImageMetadata或None)
+        """
+        entry = self._entries.get(key)
+        if entry is not None and now - entry[2] < VALIDATE_INTERVAL:
+            return True, entry[1]
+        return False, None
+
+    def _refresh(self, key):
+        """
+        确认条目是否仍然有效，文件变化时重新读取文件头
+
+        Returns:
+            ImageMetadata对象，文件不存在或无法识别时返回None
+        """
+        path = split_frame_ref(key)[0]
+        signature = file_signature(path)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry[0] == signature:
+            metadata = entry[1]
+        elif signature is None:
+            metadata = None
+        else:
+            try:
+                metadata = probe_image(key, signature[1])
+            except Exception as e:
+                print(f"无法读取图片信息 {key}: {e}")
+                metadata = None
+            with self._lock:
+                self.probes += 1
+        with self._lock:
+            self._entries[key] = (signature, metadata, now)
+        return metadata
+
+    def get(self, image_path):
+        """
+        获取一张图片的元数据
+
+        Args:
+            image_path: 图片路径或多帧图片的帧引用
+
+        Returns:
+            ImageMetadata对象，文件不存在或无法识别时返回None
+        """
+        key = self._key(image_path)
+        with self._lock:
+            valid, metadata = self._fresh(key, time.monotonic())
+        if valid:
+            return metadata
+        return self._refresh(key)
+
+    def get_many(self, image_paths):
+        """
+        批量获取元数据，需要确认或读取的条目在线程池中并行处理
+
+        Args:
+            image_paths: 图片路径或帧引用列表
+
+        Returns:
+            与 image_paths 等长的 ImageMetadata（或None）列表
+        """
+        keys = [self._key(path) for path in image_paths]
+        now = time.monotonic()
+        results = {}
+        stale = []
+        with self._lock:
+            for key in keys:
+                if key in results:
+                    continue
+                valid, metadata = self._fresh(key, now)
+                if valid:
+                    results[key] = metadata
+                else:
+                    results[key] = None
+                    stale.append(key)
+        if len(stale) > 1 and self.workers > 1:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='metadata')
+            for key, metadata in zip(stale, self._pool.map(self._refresh, stale)):
+                results[key] = metadata
+        else:
+            for key in stale:
+                results[key] = self._refresh(key)
+        return [results[key] for key in keys]
+
+    def invalidate(self, image_path=None):
+        """
+        使条目失效，下次使用时重新读取文件头
+
+        Args:
+            image_path: 图片路径或帧引用，None表示清空整个索引
+        """
+        with self._lock:
+            self.generation += 1
+            if image_path is None:
+                self._entries.clear()
+                return
+            path = split_frame_ref(image_path)[0]
+            self._entries.pop(self._key(image_path), None)
+            if path != image_path:
+                return
+            # 文件被改写时，该文件所有帧引用的条目一并失效
+            prefix = path + FRAME_REF_SEPARATOR
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+
+def get_metadata_index():
+    """
+    获取共享的图片元数据索引（首次调用时创建）
+
+    Returns:
+        ImageMetadataIndex对象
+    """
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = ImageMetadataIndex()
+        return _default_index
@@ -7,21 +7,98 @@
 from PIL import Image, ImageTk
 import os
 
+from .grid_layout import GridLayoutEngine
+from .image_metadata import get_metadata_index
+from .multiframe import open_image, source_path
 
-def load_image(image_path):
+
+# 快速解码时保留的最小倍数：先廉价地缩小到目标尺寸的该倍数以上，再做高质量重采样
+REDUCING_GAP = 2.0
+# reduce() 能正确处理的图片模式（P 模式会对调色板索引求平均，1 和 I;16 会抛出 ValueError）
+REDUCE_MODES = ('L', 'LA', 'RGB', 'RGBA', 'I', 'F')
+# to_standard_mode() 转换后的图片模式，缩放和自适应量化都能直接处理
+STANDARD_MODES = ('L', 'RGB', 'RGBA')
+
+
+def has_transparency(img):
+    """判断图片是否带有透明信息（Alpha通道或调色板透明色）"""
+    return 'A' in img.getbands() or 'a' in img.getbands() or 'transparency' in img.info
+
+
+def to_standard_mode(img):
+    """
+    将图片转换为 'L'、'RGB' 或 'RGBA' 模式
+
+    调色板图片按是否带透明色转换为 'RGBA' 或 'RGB'，黑白图片转换为 'L'，
+    16位灰度图片按比例缩放到8位（直接转换会把大于255的值全部截断为白色）。
+
+    Args:
+        img: PIL.Image对象
+
+    Returns:
+        转换后的PIL.Image对象（已是标准模式时返回原对象）
+    """
+    if img.mode in STANDARD_MODES:
+        return img
+    if img.mode.startswith('I;16'):
+        return img.convert('I').point(lambda value: value / 256).convert('L')
+    if img.mode in ('1', 'I', 'F'):
+        return img.convert('L')
+    return img.convert('RGBA' if has_transparency(img) else 'RGB')
+
+
+def reduce_for_target(img, target_size, reducing_gap=REDUCING_GAP):
+    """
+    以较低成本将图片缩小到接近目标尺寸
+
+    JPEG图片通过 draft() 在解码时直接按 1/2、1/4、1/8 缩小，
+    其他格式用整数倍的 reduce() 做区域平均；两者都保证结果不小于目标尺寸的 reducing_gap 倍，
+    调用方随后再用 LANCZOS 等高质量算法缩放到最终尺寸。
+    reduce() 不支持的模式（调色板、黑白、16位灰度等）先经 to_standard_mode() 转换，
+    此时返回图片的模式可能与原图不同，调色板透明色转换为Alpha通道。
+    必须在图片数据加载之前调用，draft() 才会生效。
+
+    Args:
+        img: 刚打开、尚未加载的PIL.Image对象
+        target_size: 目标尺寸 (width, height)
+        reducing_gap: 相对目标尺寸保留的最小倍数
+
+    Returns:
+        缩小后的PIL.Image对象（无需缩小时返回原对象）
+    """
+    target_width, target_height = target_size
+    request = (max(1, int(target_width * reducing_gap)), max(1, int(target_height * reducing_gap)))
+    if img.width < request[0] or img.height < request[1]:
+        return img
+
+    img.draft(None, request)
+    factor = min(img.width // request[0], img.height // request[1])
+    if factor > 1:
+        if img.mode not in REDUCE_MODES:
+            img = to_standard_mode(img)
+        img = img.reduce(factor)
+    return img
+
+
+def load_image(image_path, target_size=None):
     """
     加载图片
 
     Args:
-        image_path: 图片文件路径
+        image_path: 图片文件路径或多帧图片的帧引用
+        target_size: 显示尺寸 (width, height)，指定时对大图使用快速缩小解码，
+            返回的图片不小于该尺寸的两倍，仍需调用方缩放到最终尺寸；None表示按原始分辨率加载
 
     Returns:
         PIL.Image对象，如果加载失败返回None
     """
     try:
-        if not os.path.exists(image_path):
+        if not os.path.exists(source_path(image_path)):
             return None
-        return Image.open(image_path)
+        img = open_image(image_path)
+        if target_size:
+            img = reduce_for_target(img, target_size)
+        return img
     except Exception as e:
         print(f"无法加载图片 {image_path}: {e}")
         return None
@@ -129,28 +206,14 @@ def get_image_info(image_path):
         }
         如果加载失败返回None
     """
-    try:
-        if not os.path.exists(image_path):
-            return None
-
-        img = Image.open(image_path)
-        file_size = os.path.getsize(image_path) / 1024  # 转换为KB
-
-        return {
-            'width': img.width,
-            'height': img.height,
-            'size_kb': file_size,
-            'format': img.format,
-            'mode': img.mode
-        }
-    except Exception as e:
-        print(f"无法获取图片信息 {image_path}: {e}")
-        return None
+    # 从元数据索引读取，文件未修改时不再打开文件（多帧图片的大小为整个文件）
+    metadata = get_metadata_index().get(image_path)
+    return metadata.as_info() if metadata else None
 
 
 def calculate_grid_layout(image_paths, pending_crops, preview_scale=1.0, thumbnail_size=(200, 150), canvas_width=None, canvas_height=None):
     """
-    计算网格布局，返回每张图片的位置和大小
+    计算网格布局，返回每张图片的位置和大小（需要反复更新布局时应直接使用 GridLayoutEngine）
 
     Args:
         image_paths: 图片路径列表
@@ -175,89 +238,10 @@ def calculate_grid_layout(image_paths, pending_crops, preview_scale=1.0, thumbna
     if not image_paths:
         return []
 
-    # 使用传入的Canvas尺寸或默认值
-    if canvas_width is None:
-        canvas_width = 800
-    if canvas_height is None:
-        canvas_height = 600
-
-    # 加载所有图片获取实际尺寸
-    image_sizes = []
-    for img_path in image_paths:
-        img = load_image(img_path)
-        if img:
-            image_sizes.append((img.width, img.height))
-        else:
-            # 如果加载失败，使用默认尺寸
-            image_sizes.append((200, 150))
-
-    # 计算每张图片的显示尺寸
-    display_sizes = []
-    for i, (img_width, img_height) in enumerate(image_sizes):
-        if preview_scale == 1.0:
-            # 原始大小模式：使用图片的实际尺寸
-            display_sizes.append((img_width, img_height))
-        else:
-            # 缩放模式：根据图片实际尺寸计算缩放后的尺寸
-            display_sizes.append((
-                int(img_width * preview_scale),
-                int(img_height * preview_scale)
-            ))
-
-    padding = 10
-    
-    # 计算列数：基于所有图片的平均宽度
-    if display_sizes:
-        avg_width = sum(size[0] for size in display_sizes) / len(display_sizes)
-        avg_height = sum(size[1] for size in display_sizes) / len(display_sizes)
-    else:
-        avg_width = 200
-        avg_height = 150
-    
-    cols = max(1, int(canvas_width / (avg_width + padding)))
-    rows = (len(image_paths) + cols - 1) // cols
-
-    # 计算每列的最大宽度和每行的最大高度
-    col_widths = [0] * cols
-    row_heights = [0] * rows
-    
-    for i, img_path in enumerate(image_paths):
-        col = i % cols
-        row = i // cols
-        width, height = display_sizes[i]
-        col_widths[col] = max(col_widths[col], width)
-        row_heights[row] = max(row_heights[row], height)
-
-    # 计算每列和每行的起始位置
-    col_positions = [padding]
-    for i in range(1, cols):
-        col_positions.append(col_positions[-1] + col_widths[i-1] + padding)
-    
-    row_positions = [padding]
-    for i in range(1, rows):
-        row_positions.append(row_positions[-1] + row_heights[i-1] + padding)
-
-    layout = []
-
-    for i, img_path in enumerate(image_paths):
-        col = i % cols
-        row = i // cols
-
-        # 使用该列和该行的起始位置
-        x = col_positions[col]
-        y = row_positions[row]
-
-        layout.append({
-            'index': i,
-            'path': img_path,
-            'position': (x, y),
-            'size': display_sizes[i],
-            'col': col,
-            'row': row,
-            'is_cropped': img_path in pending_crops
-        })
-
-    return layout
+    # 使用传入的Canvas宽度或默认值（布局只与宽度有关）
+    engine = GridLayoutEngine(preview_scale, canvas_width if canvas_width is not None else 800)
+    engine.update(image_paths)
+    return engine.layout(pending_crops)
 
 
 def find_smallest_image_path(image_paths, all_image_paths):
@@ -278,17 +262,13 @@ def find_smallest_image_path(image_paths, all_image_paths):
     min_path = None
     min_index = -1
 
-    for img_path in image_paths:
-        try:
-            img_info = get_image_info(img_path)
-            if img_info:
-                size = img_info['width'] * img_info['height']
-                if size < min_size:
-                    min_size = size
-                    min_path = img_path
-                    if img_path in all_image_paths:
-                        min_index = all_image_paths.index(img_path)
-        except Exception:
-            continue
+    for img_path, metadata in zip(image_paths, get_metadata_index().get_many(image_paths)):
+        if metadata:
+            size = metadata.width * metadata.height
+            if size < min_size:
+                min_size = size
+                min_path = img_path
+                if img_path in all_image_paths:
+                    min_index = all_image_paths.index(img_path)
 
     return min_path, min_index
\ No newline at end of file
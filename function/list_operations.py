@@ -24,8 +24,9 @@ def show_image_properties(main_window_instance, index):
         return
 
     try:
-        from PIL import Image
+        from function.image_metadata import get_metadata_index
 
+        metadata_index = get_metadata_index()
         selected_indices = sorted(main_window_instance.selected_image_indices)
 
         if len(selected_indices) == 1:
@@ -35,17 +36,18 @@ def show_image_properties(main_window_instance, index):
                 return
 
             img_path = main_window_instance.image_paths[idx]
-            img = Image.open(img_path)
-            width, height = img.size
-            size_kb = os.path.getsize(img_path) / 1024
+            metadata = metadata_index.get(img_path)
+            if metadata is None:
+                messagebox.showerror("错误", f"无法读取图片属性: {img_path}")
+                return
 
             info_text = f"""图片属性:
 
 文件名: {os.path.basename(img_path)}
 路径: {img_path.replace('\\', '/')}
-尺寸: {width} x {height} 像素
-格式: {img.format}
-文件大小: {size_kb:.2f} KB"""
+尺寸: {metadata.width} x {metadata.height} 像素
+格式: {metadata.format}
+文件大小: {metadata.size_kb:.2f} KB"""
 
             messagebox.showinfo("图片属性", info_text)
         else:
@@ -58,22 +60,19 @@ def show_image_properties(main_window_instance, index):
             formats = set()
             modes = set()
 
-            for idx in selected_indices:
-                if idx < 0 or idx >= len(main_window_instance.image_paths):
+            selected_paths = [main_window_instance.image_paths[idx] for idx in selected_indices
+                              if 0 <= idx < len(main_window_instance.image_paths)]
+            for metadata in metadata_index.get_many(selected_paths):
+                if metadata is None:
                     continue
 
-                img_path = main_window_instance.image_paths[idx]
-                img = Image.open(img_path)
-                width, height = img.size
-                size_kb = os.path.getsize(img_path) / 1024
-
-                total_size_kb += size_kb
-                min_width = min(min_width, width)
-                min_height = min(min_height, height)
-                max_width = max(max_width, width)
-                max_height = max(max_height, height)
-                formats.add(img.format)
-                modes.add(img.mode)
+                total_size_kb += metadata.size_kb
+                min_width = min(min_width, metadata.width)
+                min_height = min(min_height, metadata.height)
+                max_width = max(max_width, metadata.width)
+                max_height = max(max_height, metadata.height)
+                formats.add(metadata.format)
+                modes.add(metadata.mode)
 
             info_text = f"""多张图片属性:
 
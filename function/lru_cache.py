@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+按字节预算淘汰的LRU缓存模块
+每个条目记录自身占用的字节数，总量超过预算时优先淘汰非当前分组（如其他缩放级别）的条目
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class ByteBudgetLRU:
+    """
+    按字节预算淘汰的LRU缓存
+
+    条目可以带一个分组标签（如预览的缩放比例）。超出预算时先按最近使用顺序淘汰
+    不属于当前分组的条目，仍然超出时再淘汰当前分组中最久未使用的条目。
+    单个条目超过整个预算时不缓存。
+    """
+
+    def __init__(self, max_bytes):
+        """
+        初始化缓存
+
+        Args:
+            max_bytes: 缓存容量上限（字节）
+        """
+        self.max_bytes = max_bytes
+        self.resident_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.active_group = None
+        self._entries = OrderedDict()  # key -> (value, size, group)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key, default=None):
+        """
+        读取条目并标记为最近使用
+
+        Args:
+            key: 缓存键
+            default: 未命中时的返回值
+
+        Returns:
+            缓存的值，未命中时返回 default
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size, group=None):
+        """
+        写入条目，超出预算时淘汰其他条目
+
+        Args:
+            key: 缓存键
+            value: 缓存的值
+            size: 条目占用的字节数
+            group: 分组标签
+        """
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.resident_bytes -= old[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size, group)
+            self.resident_bytes += size
+            self._evict()
+
+    def set_active_group(self, group):
+        """
+        设置当前分组，淘汰时优先保留该分组的条目
+
+        Args:
+            group: 分组标签
+        """
+        with self._lock:
+            self.active_group = group
+
+    def set_max_bytes(self, max_bytes):
+        """
+        调整容量上限，立即淘汰超出部分
+
+        Args:
+            max_bytes: 新的容量上限（字节）
+        """
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def _evict(self):
+        """淘汰条目直到总大小不超过上限（调用方需持有锁）"""
+        if self.resident_bytes <= self.max_bytes:
+            return
+        # 先淘汰其他分组，再淘汰当前分组，各自按最近使用顺序
+        victims = [key for key, entry in self._entries.items() if entry[2] != self.active_group]
+        victims += [key for key, entry in self._entries.items() if entry[2] == self.active_group]
+        for key in victims:
+            if self.resident_bytes <= self.max_bytes:
+                break
+            _, size, _ = self._entries.pop(key)
+            self.resident_bytes -= size
+            self.evictions += 1
+
+    def clear(self):
+        """删除所有条目"""
+        with self._lock:
+            self._entries.clear()
+            self.resident_bytes = 0
+
+    def stats(self):
+        """
+        获取缓存统计信息
+
+        Returns:
+            包含 hits、misses、evictions、hit_rate、resident_bytes、max_bytes、entries 的字典
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'resident_bytes': self.resident_bytes,
+                'max_bytes': self.max_bytes,
+                'entries': len(self._entries),
+            }
@@ -0,0 +1,480 @@
+# -*- coding: utf-8 -*-
+"""
+多帧图片模块
+把动画GIF、WebP和多页TIFF的每一帧作为独立的帧来源，用 "路径::帧索引" 的形式引用，
+GIF通过持久化的帧偏移索引和缓存的关键帧画面随机访问任意帧
+"""
+
+import bisect
+import hashlib
+import io
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+from PIL import Image
+
+from .frame_cache import get_user_cache_dir
+from .gif_blocks import file_signature, read_gif_layout
+
+
+# 帧引用中路径和帧索引之间的分隔符
+FRAME_REF_SEPARATOR = '::'
+# 可能包含多帧的图片格式
+MULTIFRAME_EXTENSIONS = {'.gif', '.webp', '.tif', '.tiff'}
+# 每隔多少帧缓存一次关键帧画面
+KEYFRAME_INTERVAL = 32
+# 索引格式版本，格式变化时递增以使旧索引失效
+INDEX_VERSION = 1
+# 帧索引和关键帧缓存的默认容量上限（字节）
+INDEX_MAX_BYTES = 256 * 1024 * 1024
+# 索引超过该时长未被使用时在垃圾回收中删除（秒）
+MAX_UNUSED_AGE = 30 * 24 * 3600
+# 两次垃圾回收之间的最小间隔（秒）
+GC_INTERVAL = 24 * 3600
+# 记录上次垃圾回收时间的文件
+GC_STAMP = 'last_gc'
+# 内存中最多保留的帧索引数（每个索引保存一张完整画布）
+MAX_OPEN_INDEXES = 8
+
+# 最近使用的帧索引，超出 MAX_OPEN_INDEXES 时淘汰最久未使用的
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+# 缓存目录的当前总大小，首次写入时统计；None表示尚未统计
+_store_bytes = None
+_store_lock = threading.Lock()
+_gc_checked = False
+
+
+def make_frame_ref(path, index):
+    """
+    构造帧引用
+
+    Args:
+        path: 多帧图片路径
+        index: 帧索引
+
+    Returns:
+        "路径::帧索引" 形式的字符串
+    """
+    return f"{path}{FRAME_REF_SEPARATOR}{index}"
+
+
+def split_frame_ref(ref):
+    """
+    拆分帧引用
+
+    Args:
+        ref: 图片路径或帧引用
+
+    Returns:
+        (文件路径, 帧索引)，普通图片路径的帧索引为None
+    """
+    path, separator, index = ref.rpartition(FRAME_REF_SEPARATOR)
+    if separator and index.isdigit():
+        return path, int(index)
+    return ref, None
+
+
+def source_path(ref):
+    """获取帧引用对应的文件路径（普通路径原样返回）"""
+    return split_frame_ref(ref)[0]
+
+
+def _index_dir():
+    """帧索引缓存目录"""
+    return get_user_cache_dir('frame_index')
+
+
+def _scan_index_entries(index_dir):
+    """
+    按索引列出缓存目录中的条目（索引文件和对应的关键帧目录）
+
+    Args:
+        index_dir: 缓存目录
+
+    Returns:
+        {索引键: [总大小, 最近使用时间, 路径列表]}
+    """
+    entries = {}
+    for entry in os.scandir(index_dir):
+        if entry.name == GC_STAMP or entry.name.endswith('.tmp'):
+            continue
+        key = entry.name[:-5] if entry.name.endswith('.json') else entry.name
+        item = entries.setdefault(key, [0, 0.0, []])
+        try:
+            stat = entry.stat()
+            if entry.is_dir():
+                item[0] += sum(child.stat().st_size for child in os.scandir(entry.path))
+            else:
+                item[0] += stat.st_size
+        except OSError:
+            continue
+        # 加载索引和写入关键帧都会更新修改时间，取较新的作为最近使用时间
+        item[1] = max(item[1], stat.st_mtime)
+        item[2].append(entry.path)
+    return entries
+
+
+def collect_index_garbage(max_bytes=None, max_age=MAX_UNUSED_AGE):
+    """
+    清理帧索引缓存目录
+
+    删除超过 max_age 未使用的索引（包括文件修改或删除后不再命中的旧索引）及其关键帧，
+    总大小超过 max_bytes 时再按最近使用时间淘汰，直到降到上限的 90% 以下。
+    指定 max_age 时同时删除中断写入遗留的临时文件，并记录本次垃圾回收的时间。
+
+    Args:
+        max_bytes: 容量上限（字节），None表示使用 INDEX_MAX_BYTES
+        max_age: 未使用时长上限（秒），None表示只按容量淘汰
+
+    Returns:
+        清理后的总大小（字节）
+    """
+    global _store_bytes
+    index_dir = _index_dir()
+    limit = (max_bytes if max_bytes is not None else INDEX_MAX_BYTES) * 0.9
+    oldest_kept = time.time() - max_age if max_age is not None else None
+    with _store_lock:
+        try:
+            entries = _scan_index_entries(index_dir)
+        except OSError:
+            return 0
+        total = sum(item[0] for item in entries.values())
+        for size, mtime, paths in sorted(entries.values(), key=lambda item: item[1]):
+            if total <= limit and (oldest_kept is None or mtime >= oldest_kept):
+                break
+            for path in paths:
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+            total -= size
+        _store_bytes = total
+
+    if max_age is not None:
+        for entry in os.scandir(index_dir):
+            if entry.name.endswith('.tmp'):
+                try:
+                    if time.time() - entry.stat().st_mtime > GC_INTERVAL:
+                        os.remove(entry.path)
+                except OSError:
+                    pass
+        try:
+            with open(os.path.join(index_dir, GC_STAMP), 'w', encoding='utf-8') as f:
+                f.write(str(int(time.time())))
+        except OSError as e:
+            print(f"警告: 无法记录帧索引垃圾回收时间: {e}")
+    return total
+
+
+def _collect_if_due():
+    """每个进程首次使用帧索引时，距上次垃圾回收超过 GC_INTERVAL 则执行一次"""
+    global _gc_checked
+    if _gc_checked:
+        return
+    _gc_checked = True
+    try:
+        last = os.path.getmtime(os.path.join(_index_dir(), GC_STAMP))
+    except OSError:
+        last = None
+    if last is None or time.time() - last >= GC_INTERVAL:
+        collect_index_garbage()
+
+
+def _record_written(size):
+    """
+    记录新写入缓存目录的字节数，超出容量上限时淘汰最久未使用的索引
+
+    Args:
+        size: 写入的字节数
+    """
+    global _store_bytes
+    with _store_lock:
+        if _store_bytes is None:
+            try:
+                _store_bytes = sum(item[0] for item in _scan_index_entries(_index_dir()).values())
+            except OSError:
+                _store_bytes = 0
+        else:
+            _store_bytes += size
+        over_limit = _store_bytes > INDEX_MAX_BYTES
+    if over_limit:
+        collect_index_garbage(max_age=None)
+
+
+class GifFrameIndex:
+    """
+    GIF帧随机访问索引
+
+    帧偏移表只需解析一次块结构即可得到（不解码图像数据），结果持久化到用户缓存目录。
+    解码第 n 帧时，从 n 之前最近的起点开始逐帧合成：不依赖之前画面的完整帧、
+    已缓存的关键帧画面（每 KEYFRAME_INTERVAL 帧一张，首次经过时写入磁盘）或上一次访问停下的位置。
+    每一帧单独解码，只涉及该帧自身的LZW数据。
+    """
+
+    def __init__(self, path):
+        """
+        加载或建立索引
+
+        Args:
+            path: GIF文件路径
+        """
+        self.path = path
+        signature = file_signature(path)
+        if signature is None:
+            raise FileNotFoundError(f"找不到文件: {path}")
+        source = (INDEX_VERSION, os.path.abspath(path), signature)
+        key = hashlib.sha1(repr(source).encode('utf-8')).hexdigest()
+        self.index_path = get_user_cache_dir('frame_index', key + '.json')
+        self.keyframe_dir = get_user_cache_dir('frame_index', key)
+
+        index = self._load_index()
+        if index is None:
+            index = self._build_index()
+        else:
+            try:
+                # 更新修改时间，作为垃圾回收时的最近使用时间
+                os.utime(self.index_path)
+            except OSError:
+                pass
+        self.size = tuple(index['size'])
+        self.header = bytes.fromhex(index['header'])
+        # 每帧: [起始偏移, 结束偏移, 图像描述符偏移, left, top, width, height, 处置方法, 是否为完整不透明帧]
+        self.frames = index['frames']
+        self._self_contained = [i for i, frame in enumerate(self.frames) if frame[8]]
+        self._keyframes = sorted(
+            int(name[:-4]) for name in (os.listdir(self.keyframe_dir) if os.path.isdir(self.keyframe_dir) else [])
+            if name.endswith('.png') and name[:-4].isdigit())
+        self._state = None  # (下一帧索引, 该帧绘制前的画布)
+        self._lock = threading.Lock()
+
+    @property
+    def frame_count(self):
+        return len(self.frames)
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _build_index(self):
+        """解析块结构建立帧偏移表，并尽量写入缓存目录"""
+        data, layout = read_gif_layout(self.path)
+        if not layout.frames:
+            raise ValueError(f"GIF中没有图像帧: {self.path}")
+        frames = []
+        for frame in layout.frames:
+            self_contained = ((frame.left, frame.top) == (0, 0) and (frame.width, frame.height) == layout.size
+                              and frame.transparency is None)
+            frames.append([frame.start, frame.end, frame.descriptor_offset, frame.left, frame.top,
+                           frame.width, frame.height, frame.disposal, self_contained])
+        index = {
+            'size': list(layout.size),
+            # 逻辑屏幕描述符的标志字节和全局颜色表
+            'header': bytes(data[10:11]).hex() + bytes(data[13:layout.header_end]).hex(),
+            'frames': frames,
+        }
+        try:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            temp_path = f"{self.index_path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(index, f)
+            os.replace(temp_path, self.index_path)
+            _record_written(os.path.getsize(self.index_path))
+        except OSError as e:
+            print(f"警告: 无法写入帧索引: {e}")
+        return index
+
+    def _decode_frame(self, f, index):
+        """
+        单独解码一帧的图像数据
+
+        把该帧的块原样放进一个只有一帧、画布与帧同样大小的GIF中交给 Pillow 解码。
+
+        Returns:
+            'RGBA' 模式的PIL.Image对象（透明色的 alpha 为0）
+        """
+        start, end, descriptor, _, _, width, height, _, _ = self.frames[index]
+        f.seek(start)
+        block = bytearray(f.read(end - start))
+        # 帧位置移到新画布的左上角
+        block[descriptor - start + 1:descriptor - start + 5] = b'\x00\x00\x00\x00'
+        mini = (b'GIF89a' + width.to_bytes(2, 'little') + height.to_bytes(2, 'little')
+                + self.header[:1] + b'\x00\x00' + self.header[1:] + bytes(block) + b';')
+        with Image.open(io.BytesIO(mini)) as img:
+            return img.convert('RGBA')
+
+    def _start_state(self, n):
+        """
+        找出解码第 n 帧的最近起点
+
+        Returns:
+            (起始帧索引, 该帧绘制前的画布)
+        """
+        start, canvas = 0, None
+        position = bisect.bisect_right(self._self_contained, n)
+        if position:
+            start = self._self_contained[position - 1]
+        position = bisect.bisect_right(self._keyframes, n)
+        if position and self._keyframes[position - 1] > start:
+            keyframe = self._keyframes[position - 1]
+            try:
+                with Image.open(os.path.join(self.keyframe_dir, f'{keyframe}.png')) as img:
+                    start, canvas = keyframe, img.convert('RGBA')
+            except OSError:
+                self._keyframes.remove(keyframe)
+        if self._state is not None and start <= self._state[0] <= n:
+            start, canvas = self._state[0], self._state[1].copy()
+        if canvas is None:
+            canvas = Image.new('RGBA', self.size, (0, 0, 0, 0))
+        return start, canvas
+
+    def _save_keyframe(self, index, canvas):
+        """把第 index 帧绘制前的画布写入关键帧缓存"""
+        try:
+            os.makedirs(self.keyframe_dir, exist_ok=True)
+            path = os.path.join(self.keyframe_dir, f'{index}.png')
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            canvas.save(temp_path, 'PNG', compress_level=1)
+            os.replace(temp_path, path)
+            bisect.insort(self._keyframes, index)
+            _record_written(os.path.getsize(path))
+        except OSError as e:
+            print(f"警告: 无法写入关键帧缓存: {e}")
+
+    def frame(self, n):
+        """
+        获取第 n 帧显示时的完整画面
+
+        Args:
+            n: 帧索引
+
+        Returns:
+            PIL.Image对象，画面完全不透明时为 'RGB' 模式，否则为 'RGBA' 模式
+        """
+        if not 0 <= n < len(self.frames):
+            raise IndexError(f"帧索引 {n} 超出范围（共 {len(self.frames)} 帧）")
+        with self._lock:
+            start, canvas = self._start_state(n)
+            result = None
+            with open(self.path, 'rb') as f:
+                for index in range(start, n + 1):
+                    _, _, _, left, top, width, height, disposal, self_contained = self.frames[index]
+                    if (index % KEYFRAME_INTERVAL == 0 and index > 0 and not self_contained
+                            and index not in self._keyframes):
+                        self._save_keyframe(index, canvas)
+                    image = self._decode_frame(f, index)
+                    previous = canvas.copy() if disposal == 3 else None
+                    canvas.paste(image, (left, top), image)
+                    if index == n:
+                        result = canvas.copy()
+                    if disposal == 2:
+                        # 恢复为背景（透明）
+                        canvas.paste((0, 0, 0, 0), (left, top, left + width, top + height))
+                    elif disposal == 3:
+                        # 恢复为绘制该帧之前的画面
+                        canvas = previous
+            self._state = (n + 1, canvas)
+        if result.getextrema()[3][0] == 255:
+            return result.convert('RGB')
+        return result
+
+
+def get_frame_index(path):
+    """
+    获取GIF文件的帧索引（同一文件未改动时复用同一个索引对象）
+
+    内存中只保留最近使用的 MAX_OPEN_INDEXES 个索引，被淘汰的索引再次使用时从磁盘缓存重新加载。
+
+    Args:
+        path: GIF文件路径
+
+    Returns:
+        GifFrameIndex对象
+    """
+    _collect_if_due()
+    key = (os.path.abspath(path), file_signature(path))
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = GifFrameIndex(path)
+            _indexes[key] = index
+            while len(_indexes) > MAX_OPEN_INDEXES:
+                _indexes.popitem(last=False)
+        else:
+            _indexes.move_to_end(key)
+        return index
+
+
+def count_frames(path):
+    """
+    获取图片文件的帧数
+
+    Args:
+        path: 图片路径
+
+    Returns:
+        帧数，单帧格式返回1
+    """
+    if os.path.splitext(path)[1].lower() not in MULTIFRAME_EXTENSIONS:
+        return 1
+    if os.path.splitext(path)[1].lower() == '.gif':
+        return get_frame_index(path).frame_count
+    with Image.open(path) as img:
+        return getattr(img, 'n_frames', 1)
+
+
+def expand_multiframe_paths(image_paths):
+    """
+    把多帧图片展开为逐帧的帧引用，单帧图片保持原路径
+
+    Args:
+        image_paths: 图片路径列表
+
+    Returns:
+        展开后的路径和帧引用列表
+    """
+    expanded = []
+    for path in image_paths:
+        try:
+            count = count_frames(path)
+        except Exception as e:
+            print(f"警告: 无法读取图片帧数 {path}: {e}")
+            count = 1
+        if count > 1:
+            expanded.extend(make_frame_ref(path, index) for index in range(count))
+        else:
+            expanded.append(path)
+    return expanded
+
+
+def open_image(ref):
+    """
+    打开图片路径或帧引用
+
+    普通路径与 Image.open() 相同（延迟解码）；帧引用返回该帧显示时的完整画面。
+
+    Args:
+        ref: 图片路径或帧引用
+
+    Returns:
+        PIL.Image对象
+    """
+    path, index = split_frame_ref(ref)
+    if index is None:
+        return Image.open(path)
+    if os.path.splitext(path)[1].lower() == '.gif':
+        return get_frame_index(path).frame(index)
+    with Image.open(path) as img:
+        # WebP/TIFF 由 Pillow 定位帧：TIFF 各页独立，WebP 由解码器合成
+        img.seek(index)
+        return img.convert('RGBA')
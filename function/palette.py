@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+全局调色板模块
+从抽样帧中计算一次共享调色板，并将所有帧快速映射到该调色板上
+"""
+
+from PIL import Image, ImageChops, ImageStat
+
+from .multiframe import open_image
+
+
+# 抽样帧数量
+DEFAULT_SAMPLE_COUNT = 16
+# 抽样帧缩略图的最长边（像素）
+SAMPLE_EDGE = 256
+# 抽样像素映射到全局调色板后允许的最大均方根色差（0-255），超过则回退到局部调色板
+MAX_PALETTE_ERROR = 10.0
+
+
+def sample_paths(image_paths, sample_count):
+    """
+    在路径列表中均匀抽取若干帧
+
+    Args:
+        image_paths: 图片路径列表
+        sample_count: 抽样数量
+
+    Returns:
+        抽样后的路径列表
+    """
+    if len(image_paths) <= sample_count:
+        return list(image_paths)
+    step = (len(image_paths) - 1) / (sample_count - 1)
+    return [image_paths[round(i * step)] for i in range(sample_count)]
+
+
+def _sample_size(size):
+    """
+    计算抽样缩略图尺寸，保持目标尺寸的宽高比
+
+    Args:
+        size: 目标尺寸 (width, height)
+
+    Returns:
+        缩略图尺寸 (width, height)
+    """
+    width, height = size
+    scale = min(1.0, SAMPLE_EDGE / max(width, height))
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def make_palette_image(palette):
+    """
+    用调色板字节创建可用于 quantize(palette=...) 的调色板图片
+
+    Args:
+        palette: RGB调色板字节串
+
+    Returns:
+        'P' 模式的PIL.Image对象
+    """
+    palette_image = Image.new('P', (1, 1))
+    palette_image.putpalette(palette)
+    return palette_image
+
+
+def quantize_to_palette(image, palette):
+    """
+    将图片映射到给定的调色板（不抖动，速度快且结果稳定）
+
+    Args:
+        image: PIL.Image对象
+        palette: RGB调色板字节串或调色板图片
+
+    Returns:
+        'P' 模式的PIL.Image对象，其调色板与给定调色板完全一致
+    """
+    if not isinstance(palette, Image.Image):
+        palette = make_palette_image(palette)
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    return image.quantize(palette=palette, dither=Image.Dither.NONE)
+
+
+def palette_error(image, palette):
+    """
+    计算图片映射到调色板后的均方根色差
+
+    Args:
+        image: PIL.Image对象
+        palette: RGB调色板字节串或调色板图片
+
+    Returns:
+        三个通道均方根色差的平均值（0-255）
+    """
+    rgb = image.convert('RGB')
+    mapped = quantize_to_palette(rgb, palette).convert('RGB')
+    rms = ImageStat.Stat(ImageChops.difference(rgb, mapped)).rms
+    return sum(rms) / len(rms)
+
+
+def build_global_palette(image_paths, size=None, colors=256, sample_count=DEFAULT_SAMPLE_COUNT,
+                         max_error=MAX_PALETTE_ERROR):
+    """
+    从抽样帧计算共享的全局调色板
+
+    抽样帧缩小后拼接成一张图片统一量化，得到一份调色板；
+    再把抽样像素映射回该调色板估算色差，色差过大（如各帧色彩差异很大）时返回None，
+    调用方应回退到每帧独立的局部调色板。
+
+    Args:
+        image_paths: 图片路径列表
+        size: 输出帧尺寸 (width, height)，None表示使用第一张抽样图片的尺寸
+        colors: 调色板颜色数量（最多256）
+        sample_count: 抽样帧数量
+        max_error: 允许的最大均方根色差，None表示不检查
+
+    Returns:
+        (RGB调色板字节串或None, 抽样色差)
+    """
+    thumbnails = []
+    thumb_size = _sample_size(size) if size else None
+    for img_path in sample_paths(image_paths, sample_count):
+        try:
+            with open_image(img_path) as img:
+                if thumb_size is None:
+                    thumb_size = _sample_size(img.size)
+                # JPEG等格式可以直接以较低分辨率解码
+                img.draft('RGB', thumb_size)
+                thumbnails.append(img.convert('RGB').resize(thumb_size, Image.Resampling.BILINEAR))
+        except Exception as e:
+            print(f"警告: 无法抽样图片 {img_path}: {e}")
+
+    if not thumbnails:
+        return None, float('inf')
+
+    # 纵向拼接所有抽样帧，等价于合并后的颜色直方图
+    width, height = thumb_size
+    mosaic = Image.new('RGB', (width, height * len(thumbnails)))
+    for i, thumb in enumerate(thumbnails):
+        mosaic.paste(thumb, (0, i * height))
+
+    quantized = mosaic.quantize(colors=min(256, colors), method=Image.Quantize.MEDIANCUT)
+    palette = bytes(quantized.getpalette('RGB'))
+    error = palette_error(mosaic, palette)
+
+    if max_error is not None and error > max_error:
+        return None, error
+    return palette, error
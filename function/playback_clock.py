@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+预览播放时钟模块
+按单调时钟计算每一帧的目标显示时间，修正 after() 调度和渲染带来的累积误差，
+渲染跟不上时跳过过期的帧，并统计实际帧率
+"""
+
+import time
+from collections import deque
+
+
+# 统计实际帧率时使用的最近显示帧数
+FPS_WINDOW = 30
+
+
+class PlaybackClock:
+    """
+    预览播放时钟
+
+    用法:
+        clock.start(duration_ms)
+        ...  # 每次定时器触发时
+        advance = clock.tick(duration_ms)
+        # 前进 advance 帧（大于1表示跳过了 advance - 1 帧），渲染完成后
+        # 在 clock.next_delay() 毫秒后再次触发
+
+    目标显示时间按帧间隔累加，而不是从上一帧实际显示的时刻起算，
+    因此 after() 的延迟误差和渲染耗时不会累积，播放速度与浏览器中一致。
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        """
+        初始化播放时钟
+
+        Args:
+            clock: 返回秒数的单调时钟函数
+        """
+        self.clock = clock
+        self.next_due = None
+        self.dropped = 0
+        self.presented = 0
+        self._timestamps = deque(maxlen=FPS_WINDOW)
+
+    def start(self, duration_ms):
+        """
+        开始播放，当前帧视为刚刚显示
+
+        Args:
+            duration_ms: 每帧持续时间（毫秒）
+
+        Returns:
+            到下一帧的延迟（毫秒）
+        """
+        now = self.clock()
+        self.next_due = now + duration_ms / 1000
+        self.dropped = 0
+        self.presented = 0
+        self._timestamps.clear()
+        self._timestamps.append(now)
+        return max(1, int(duration_ms))
+
+    def tick(self, duration_ms):
+        """
+        定时器触发时调用，计算应前进的帧数
+
+        Args:
+            duration_ms: 当前的每帧持续时间（毫秒），播放中修改会从下一帧起生效
+
+        Returns:
+            前进的帧数，至少为1，超过1的部分为跳过的帧
+        """
+        interval = max(duration_ms, 1) / 1000
+        now = self.clock()
+        if self.next_due is None:
+            self.next_due = now
+        advance = 1
+        if now >= self.next_due + interval:
+            # 已经落后至少一整帧，跳过已过期的帧，直接显示当前时刻应显示的帧
+            advance += int((now - self.next_due) / interval)
+            self.dropped += advance - 1
+        self.next_due += advance * interval
+        self.presented += 1
+        self._timestamps.append(now)
+        return advance
+
+    def next_delay(self):
+        """
+        计算到下一帧目标显示时间的延迟，应在当前帧渲染完成后调用，以扣除渲染耗时
+
+        Returns:
+            延迟毫秒数，至少为1
+        """
+        return max(1, int(round((self.next_due - self.clock()) * 1000)))
+
+    def measured_fps(self):
+        """
+        计算最近若干帧的实际显示帧率
+
+        Returns:
+            帧率，样本不足时返回None
+        """
+        if len(self._timestamps) < 2:
+            return None
+        elapsed = self._timestamps[-1] - self._timestamps[0]
+        if elapsed <= 0:
+            return None
+        return (len(self._timestamps) - 1) / elapsed
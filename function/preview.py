@@ -6,7 +6,10 @@
 
 import tkinter as tk
 from tkinter import messagebox
-from PIL import Image
+
+
+# 等待预览帧源的全局调色板时轮询的间隔（毫秒）
+PALETTE_POLL_MS = 50
 
 
 def zoom_in_preview(main_window_instance):
@@ -87,10 +90,9 @@ def fit_preview_to_window(main_window_instance):
     - 这是典型的 Object-fit: contain 逻辑，但应用于整个图片集合
 
     计算逻辑：
-    - 使用当前缩放比例计算所有图片的布局
-    - 检查布局的总尺寸（最大 x 和最大 y）
-    - 如果布局超出窗口，调整缩放比例
-    - 重复计算直到所有图片都能完整显示
+    - 从元数据索引读取所有图片的尺寸（不打开图片）
+    - 对每个可能的列数直接算出能放下的最大缩放比例
+    - 从大到小验证候选比例，取第一个使布局总尺寸不超出窗口的比例
 
     适用场景：
     - 多张图片：确保所有图片都能完整显示在窗口内
@@ -113,47 +115,14 @@ def fit_preview_to_window(main_window_instance):
     if canvas_width <= 0 or canvas_height <= 0:
         return
 
-    # 导入布局计算函数
-    from function.image_utils import calculate_grid_layout
-
-    # 二分查找法找到合适的缩放比例
-    min_scale = 0.01
-    max_scale = 5.0
-    best_scale = 1.0
-    tolerance = 0.001
-
-    for _ in range(20):  # 最多迭代20次
-        test_scale = (min_scale + max_scale) / 2
-
-        # 使用测试缩放比例计算布局
-        layout = calculate_grid_layout(
-            main_window_instance.image_paths,
-            main_window_instance.pending_crops,
-            test_scale,
-            canvas_width=canvas_width,
-            canvas_height=canvas_height
-        )
-
-        if not layout:
-            break
-
-        # 计算布局的总尺寸
-        max_x = max(item['position'][0] + item['size'][0] for item in layout)
-        max_y = max(item['position'][1] + item['size'][1] for item in layout)
-
-        # 检查布局是否能完整显示在Canvas中（考虑padding）
-        padding = 10
-        if max_x <= canvas_width - padding and max_y <= canvas_height - padding:
-            # 布局可以完整显示，尝试更大的缩放比例
-            best_scale = test_scale
-            min_scale = test_scale
-        else:
-            # 布局超出窗口，尝试更小的缩放比例
-            max_scale = test_scale
-
-        # 如果缩放范围已经很小，停止迭代
-        if max_scale - min_scale < tolerance:
-            break
+    # 直接求解最大缩放比例（只使用布局引擎中保存的图片尺寸）
+    from function.grid_layout import fit_grid_scale
+
+    main_window_instance.grid_layout.update(main_window_instance.image_paths)
+    best_scale = fit_grid_scale(main_window_instance.grid_layout.sizes, canvas_width, canvas_height)
+    if best_scale is None:
+        # 最小缩放比例也放不下时使用原始尺寸
+        best_scale = 1.0
 
     # 应用最佳缩放比例
     main_window_instance.preview_scale = best_scale
@@ -268,30 +237,37 @@ def preview_gif(main_window_instance):
         return
 
     try:
-        # 加载并处理所有图片帧
-        frames = []
         duration = main_window_instance.duration.get()
         loop = main_window_instance.loop.get()
 
-        for img_path in main_window_instance.image_paths:
-            try:
-                img = Image.open(img_path)
-
-                # 转换为调色板模式以优化GIF
-                if img.mode != 'P':
-                    img = img.convert('P', palette=Image.ADAPTIVE)
+        # 与导出一致，所有帧统一缩放到第一张图片的尺寸
+        from function.gif_operations import probe_size
+        size = probe_size(main_window_instance.image_paths)
+        if size is None:
+            raise ValueError("没有成功加载任何图片")
 
-                frames.append(img)
+        # 帧在预览窗口打开后按需解码，只保留播放位置附近的帧
+        from function.frame_cache import get_default_cache
+        from function.frame_source import LazyFrameSource
+        palette_mode = 'global' if main_window_instance.global_palette.get() else 'local'
+        frames = LazyFrameSource(main_window_instance.image_paths, resize=size, palette_mode=palette_mode,
+                                 cache=get_default_cache())
+
+        output_path = main_window_instance.output_path.get()
+
+        def open_window():
+            # 全局调色板在后台线程中计算，完成前只轮询，不阻塞界面线程
+            if not frames.is_palette_ready():
+                main_window_instance.root.after(PALETTE_POLL_MS, open_window)
+                return
+            from gui.gifpreview_gui import GifPreviewWindow
+            try:
+                GifPreviewWindow(main_window_instance.root, frames, duration, output_path, loop)
             except Exception as e:
-                print(f"警告: 无法加载图片 {img_path}: {e}")
-                continue
-
-        if not frames:
-            raise ValueError("没有成功加载任何图片")
+                frames.close()
+                messagebox.showerror("错误", f"预览GIF失败:\n{str(e)}")
 
-        # 创建预览窗口
-        from gui.gifpreview_gui import GifPreviewWindow
-        preview_window = GifPreviewWindow(main_window_instance.root, frames, duration, main_window_instance.output_path.get(), loop)
+        open_window()
 
     except Exception as e:
         messagebox.showerror("错误", f"预览GIF失败:\n{str(e)}")
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+共享内存帧传输模块
+进程池中的工作进程把预处理好的调色板帧像素直接写入共享内存的环形槽位，
+主进程在同一块内存上构造图片对象，帧像素不再经过 pickle 序列化和管道传输
+"""
+
+import threading
+import weakref
+from multiprocessing import shared_memory
+
+from PIL import Image
+
+
+# 每个工作进程最多同时保持映射的共享内存块数量
+MAX_ATTACHED = 4
+
+# 工作进程中已映射的共享内存块（按名称复用，避免每帧重新映射）
+_attached = {}
+
+
+class SharedFrame:
+    """
+    已写入共享内存槽位的调色板帧
+
+    只包含槽位编号、尺寸、调色板和图片信息，在进程之间传递时不含像素数据。
+    """
+
+    def __init__(self, slot, size, palette, info):
+        self.slot = slot
+        self.size = size
+        self.palette = palette
+        self.info = info
+
+
+class SharedFrameRing:
+    """
+    共享内存帧环形缓冲区
+
+    一块共享内存平均分成若干槽位，每个槽位容纳一帧调色板帧的像素（每像素1字节）。
+    主进程提交任务前用 acquire() 取得空闲槽位，工作进程用 write_shared_frame() 写入像素，
+    主进程用 open() 得到直接引用槽位内存的图片对象；该图片对象被释放时槽位自动归还。
+    没有空闲槽位或帧超出槽位大小时，调用方回退到普通的 pickle 传输。
+    """
+
+    def __init__(self, slot_count, slot_bytes):
+        """
+        创建共享内存
+
+        Args:
+            slot_count: 槽位数量
+            slot_bytes: 每个槽位的字节数
+        """
+        self.slot_count = slot_count
+        self.slot_bytes = slot_bytes
+        self.shm = shared_memory.SharedMemory(create=True, size=slot_count * slot_bytes)
+        self.name = self.shm.name
+        self.closed = False
+        self._free = list(range(slot_count - 1, -1, -1))
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        取得一个空闲槽位
+
+        Returns:
+            槽位编号，没有空闲槽位时返回None
+        """
+        with self._lock:
+            if self.closed or not self._free:
+                return None
+            return self._free.pop()
+
+    def release(self, slot):
+        """
+        归还槽位
+
+        Args:
+            slot: 槽位编号
+        """
+        with self._lock:
+            if not self.closed:
+                self._free.append(slot)
+
+    def task_args(self, slot):
+        """
+        生成传给工作进程的槽位参数
+
+        Args:
+            slot: 槽位编号或None
+
+        Returns:
+            (共享内存名称, 槽位编号, 槽位字节数)，slot 为None时返回None
+        """
+        if slot is None:
+            return None
+        return self.name, slot, self.slot_bytes
+
+    def open(self, shared):
+        """
+        在槽位内存上构造图片对象（不复制像素）
+
+        图片对象被释放时槽位自动归还，因此调用方持有它期间槽位不会被覆盖。
+
+        Args:
+            shared: 工作进程返回的 SharedFrame 对象
+
+        Returns:
+            'P' 模式的只读PIL.Image对象（修改时 Pillow 会先复制）
+        """
+        width, height = shared.size
+        start = shared.slot * self.slot_bytes
+        view = self.shm.buf[start:start + width * height]
+        # 监视内存视图而不是图片对象：视图在 Pillow 释放像素缓冲区之后才会销毁
+        weakref.finalize(view, self.release, shared.slot)
+        frame = Image.frombuffer('P', shared.size, view, 'raw', 'P', 0, 1)
+        frame.putpalette(shared.palette)
+        frame.info.update(shared.info)
+        return frame
+
+    def close(self):
+        """关闭并删除共享内存"""
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+        try:
+            self.shm.close()
+        except BufferError:
+            # 仍有图片对象引用槽位内存，映射在这些对象释放后随垃圾回收关闭
+            pass
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _attach(name):
+    """
+    在工作进程中映射主进程创建的共享内存
+
+    Args:
+        name: 共享内存名称
+
+    Returns:
+        SharedMemory对象
+    """
+    shm = _attached.get(name)
+    if shm is not None:
+        return shm
+    while len(_attached) >= MAX_ATTACHED:
+        # 关闭最早映射的共享内存（通常所属的导出已经结束）
+        _attached.pop(next(iter(_attached))).close()
+    try:
+        # 共享内存归主进程所有，工作进程退出时不应删除
+        shm = shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python 3.13 之前没有 track 参数
+        shm = shared_memory.SharedMemory(name=name)
+    _attached[name] = shm
+    return shm
+
+
+def write_shared_frame(frame, shared):
+    """
+    在工作进程中把调色板帧写入共享内存槽位
+
+    Args:
+        frame: PIL.Image对象
+        shared: SharedFrameRing.task_args() 返回的槽位参数或None
+
+    Returns:
+        写入成功时返回 SharedFrame 对象；未分配槽位、不是 'P' 模式或超出槽位大小时返回原帧
+    """
+    if shared is None or frame.mode != 'P':
+        return frame
+    name, slot, slot_bytes = shared
+    width, height = frame.size
+    if width * height > slot_bytes:
+        return frame
+    shm = _attach(name)
+    start = slot * slot_bytes
+    shm.buf[start:start + width * height] = frame.tobytes()
+    return SharedFrame(slot, frame.size, bytes(frame.getpalette('RGB') or []), dict(frame.info))
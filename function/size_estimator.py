@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""
+导出大小和耗时估算模块
+用真实的导出设置处理并编码一部分抽样帧，推算完整导出的文件大小和耗时，并给出置信区间
+"""
+
+import io
+import math
+import os
+import threading
+import time
+
+from .frame_pipeline import process_frame, resolve_workers
+from .gif_operations import frame_durations, probe_size
+from .gif_writer import GifStreamWriter
+from .palette import build_global_palette
+
+
+# 默认抽样帧数量
+DEFAULT_SAMPLE_COUNT = 8
+# 置信区间使用的正态分布分位数（约95%）
+CONFIDENCE_Z = 1.96
+# 文件头和循环扩展块之外的结束符字节数
+TRAILER_BYTES = 1
+
+
+class EstimateCancelled(Exception):
+    """估算在完成前被取消"""
+
+
+def _sample_indices(count, sample_count):
+    """
+    在 [0, count) 中均匀抽取若干个索引
+
+    Args:
+        count: 总帧数
+        sample_count: 抽样数量
+
+    Returns:
+        升序的索引列表
+    """
+    if count <= sample_count:
+        return list(range(count))
+    step = (count - 1) / (sample_count - 1)
+    return sorted({round(i * step) for i in range(sample_count)})
+
+
+def _mean_and_margin(values, population):
+    """
+    计算样本均值及其置信区间半宽（含有限总体校正）
+
+    Args:
+        values: 样本值列表
+        population: 总体数量
+
+    Returns:
+        (均值, 置信区间半宽)
+    """
+    n = len(values)
+    mean = sum(values) / n
+    if n < 2 or population <= n:
+        return mean, 0.0
+    variance = sum((v - mean) ** 2 for v in values) / (n - 1)
+    correction = math.sqrt((population - n) / (population - 1))
+    return mean, CONFIDENCE_Z * math.sqrt(variance / n) * correction
+
+
+def estimate_export(image_paths, resize=None, duration=100, palette_mode='local', delta=False, colors=256,
+                    workers=None, sample_count=DEFAULT_SAMPLE_COUNT, should_stop=None):
+    """
+    估算导出GIF的文件大小和耗时
+
+    均匀抽取若干帧，按与 create_gif() 相同的方式解码、缩放、量化和编码，
+    以每帧字节数和耗时的样本均值推算总量，并按样本方差给出约95%的置信区间。
+    启用 delta 时同时处理每个抽样帧的前一帧，以便按相邻帧计算差分。
+    重复帧合并的效果不计入估算，因此含大量重复帧的序列估算值偏大。
+
+    Args:
+        image_paths: 图片路径列表
+        resize: 调整尺寸 (width, height) 或 None
+        duration: 每帧持续时间（毫秒），或逐帧持续时间列表
+        palette_mode: 调色板模式，'local' 或 'global'
+        delta: 是否启用帧间差分编码
+        colors: 调色板的最大颜色数
+        workers: 预处理进程数（用于推算并行导出的耗时）
+        sample_count: 抽样帧数量
+        should_stop: 无参数的回调，返回True时中止估算并抛出 EstimateCancelled
+
+    Returns:
+        字典，包含 bytes、bytes_low、bytes_high（字节），seconds、seconds_low、seconds_high（秒），
+        total_duration_ms、frame_count、sample_count
+    """
+    if not image_paths:
+        raise ValueError("至少需要一张图片")
+
+    def check_stop():
+        if should_stop is not None and should_stop():
+            raise EstimateCancelled()
+
+    frame_count = len(image_paths)
+    durations = frame_durations(duration, frame_count)
+    start = time.perf_counter()
+    target_size = tuple(resize) if resize else probe_size(image_paths)
+    if target_size is None:
+        raise ValueError("没有成功加载任何图片")
+
+    global_palette = None
+    if palette_mode == 'global':
+        global_palette, _ = build_global_palette(image_paths, target_size, colors=colors)
+    fixed_seconds = time.perf_counter() - start
+
+    from .frame_delta import DeltaFrameEncoder
+
+    def encode_sample(index, previous=None):
+        # 返回 (编码字节数, 预处理耗时, 编码耗时, 文件头字节数)，previous 为差分编码的参考帧路径
+        encoder = None
+        if previous is not None:
+            encoder = DeltaFrameEncoder()
+            encoder.encode(process_frame(previous, target_size, global_palette, colors))
+        t0 = time.perf_counter()
+        frame = process_frame(image_paths[index], target_size, global_palette, colors)
+        t1 = time.perf_counter()
+        # 局部调色板模式下用占位的全局颜色表，使抽样帧和实际导出的后续帧一样写出局部颜色表
+        writer = GifStreamWriter(io.BytesIO(), size=target_size, loop=0,
+                                 global_palette=global_palette or b'\x00\x00\x00')
+        if encoder is not None:
+            region, offset, transparency, disposal = encoder.encode(frame)
+            writer.add_frame(region, duration=durations[index], disposal=disposal, offset=offset,
+                             transparency=transparency)
+        else:
+            writer.add_frame(frame, duration=durations[index])
+        t2 = time.perf_counter()
+        return writer.bytes_written - writer.header_bytes, t1 - t0, t2 - t1, writer.header_bytes
+
+    fixed_bytes = TRAILER_BYTES
+    sample_range = range(frame_count)
+    if delta and frame_count > 1:
+        # 差分模式下第一帧总是完整帧，单独计入固定开销，其余帧按相邻帧差分抽样
+        try:
+            first_bytes, first_process, first_encode, _ = encode_sample(0)
+            fixed_bytes += first_bytes
+            fixed_seconds += first_process + first_encode
+            sample_range = range(1, frame_count)
+        except Exception as e:
+            print(f"警告: 无法抽样图片 {image_paths[0]}: {e}")
+
+    frame_bytes = []
+    process_seconds = []
+    encode_seconds = []
+    header_bytes = 0
+    for offset in _sample_indices(len(sample_range), sample_count):
+        check_stop()
+        index = sample_range[offset]
+        previous = image_paths[index - 1] if delta and index > 0 else None
+        try:
+            size, process_time, encode_time, header_bytes = encode_sample(index, previous)
+        except Exception as e:
+            print(f"警告: 无法抽样图片 {image_paths[index]}: {e}")
+            continue
+        frame_bytes.append(size)
+        process_seconds.append(process_time)
+        encode_seconds.append(encode_time)
+
+    if not frame_bytes:
+        raise ValueError("没有成功加载任何图片")
+
+    population = len(sample_range)
+    bytes_mean, bytes_margin = _mean_and_margin(frame_bytes, population)
+    # 预处理可以分摊到多个进程，编码始终在主进程中串行执行
+    parallelism = min(resolve_workers(workers), os.cpu_count() or 1)
+    frame_seconds = [p / parallelism + e for p, e in zip(process_seconds, encode_seconds)]
+    seconds_mean, seconds_margin = _mean_and_margin(frame_seconds, population)
+
+    fixed_bytes += header_bytes
+    return {
+        'bytes': int(fixed_bytes + bytes_mean * population),
+        'bytes_low': int(fixed_bytes + max(0.0, bytes_mean - bytes_margin) * population),
+        'bytes_high': int(fixed_bytes + (bytes_mean + bytes_margin) * population),
+        'seconds': fixed_seconds + seconds_mean * population,
+        'seconds_low': fixed_seconds + max(0.0, seconds_mean - seconds_margin) * population,
+        'seconds_high': fixed_seconds + (seconds_mean + seconds_margin) * population,
+        'total_duration_ms': sum(durations),
+        'frame_count': frame_count,
+        'sample_count': len(frame_bytes),
+    }
+
+
+def format_estimate(estimate):
+    """
+    将估算结果格式化为简短的文字说明
+
+    Args:
+        estimate: estimate_export() 的返回值
+
+    Returns:
+        如 "≈1.2MB (0.9-1.5MB)，导出≈3.4s" 的字符串
+    """
+    def size_text(num_bytes):
+        if num_bytes >= 1024 * 1024:
+            return f"{num_bytes / 1024 / 1024:.1f}MB"
+        return f"{num_bytes / 1024:.0f}KB"
+
+    return (f"≈{size_text(estimate['bytes'])} ({size_text(estimate['bytes_low'])}-{size_text(estimate['bytes_high'])})，"
+            f"导出≈{estimate['seconds']:.1f}s")
+
+
+class BackgroundEstimator:
+    """
+    在后台线程中运行估算
+
+    每组设置只估算一次；设置变化后正在运行的旧估算会在下一个抽样帧处中止，
+    结果只保留最新一组设置的。
+    """
+
+    def __init__(self, **defaults):
+        """
+        初始化后台估算器
+
+        Args:
+            **defaults: 每次估算都传给 estimate_export() 的默认参数
+        """
+        self.defaults = defaults
+        self._lock = threading.Lock()
+        self._key = None
+        self._result = None
+        self._error = None
+        self._thread = None
+
+    def request(self, image_paths, **settings):
+        """
+        请求估算给定设置的导出结果
+
+        Args:
+            image_paths: 图片路径列表
+            **settings: 传给 estimate_export() 的参数（值必须可哈希或为列表/元组）
+
+        Returns:
+            (状态, 结果)，状态为 'ready'（结果为估算字典）、'running'（结果为None）或 'error'（结果为异常）
+        """
+        key = (tuple(image_paths),) + tuple(sorted(
+            (name, tuple(value) if isinstance(value, list) else value) for name, value in settings.items()))
+        with self._lock:
+            if key == self._key:
+                if self._result is not None:
+                    return 'ready', self._result
+                if self._error is not None:
+                    return 'error', self._error
+                return 'running', None
+            self._key, self._result, self._error = key, None, None
+            thread = threading.Thread(target=self._run, args=(key, list(image_paths), settings), daemon=True)
+            self._thread = thread
+        thread.start()
+        return 'running', None
+
+    def _run(self, key, image_paths, settings):
+        options = dict(self.defaults)
+        options.update(settings)
+        try:
+            result = estimate_export(image_paths, should_stop=lambda: self._key != key, **options)
+        except EstimateCancelled:
+            return
+        except Exception as e:
+            with self._lock:
+                if self._key == key:
+                    self._error = e
+            return
+        with self._lock:
+            if self._key == key:
+                self._result = result
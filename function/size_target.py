@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+"""
+目标文件大小导出模块
+通过对抽样帧的试编码，搜索能满足文件大小上限的缩放比例、颜色数和抽帧间隔，
+再按搜索结果完成一次完整导出
+"""
+
+import io
+import re
+
+from PIL import Image
+
+from .gif_operations import create_gif, check_cancelled, SizeLimitExceeded, frame_durations, probe_size
+from .gif_writer import GifStreamWriter, optimize_palette, padded_color_table, palette_bytes
+from .image_utils import reduce_for_target
+from .multiframe import open_image
+from .palette import quantize_to_palette, sample_paths
+
+
+# 试编码的抽样帧数量
+TRIAL_SAMPLE_COUNT = 6
+# 依次尝试的颜色数
+COLOR_STEPS = (256, 128, 64, 32)
+# 依次尝试的抽帧间隔（每 N 帧保留一帧）
+DECIMATION_STEPS = (1, 2, 3, 4)
+# 允许的最小缩放比例
+MIN_SCALE = 0.1
+# 缩放比例不低于该值时直接采用，不再尝试减少颜色或抽帧
+ACCEPTABLE_SCALE = 0.5
+# 缩放比例二分搜索的次数
+SCALE_SEARCH_STEPS = 6
+# 估算时只使用上限的该比例，为抽样误差留出余量
+SAFETY_MARGIN = 0.9
+# 文件头、全局颜色表、循环扩展块和结束符的大致字节数
+HEADER_BYTES = 800
+# 完整导出超限时的最大重试次数
+MAX_ATTEMPTS = 4
+
+_SIZE_UNITS = {'': 1, 'B': 1, 'K': 1024, 'KB': 1024, 'M': 1024 ** 2, 'MB': 1024 ** 2, 'G': 1024 ** 3, 'GB': 1024 ** 3}
+
+
+def parse_size(text):
+    """
+    解析文件大小字符串
+
+    Args:
+        text: 如 "8MB"、"500KB"、"2.5M" 或纯数字（字节）
+
+    Returns:
+        字节数
+    """
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMG]?B?)\s*', str(text), re.IGNORECASE)
+    if not match:
+        raise ValueError(f"无法识别的文件大小: {text}（示例: 8MB、500KB）")
+    size = int(float(match.group(1)) * _SIZE_UNITS[match.group(2).upper()])
+    if size <= HEADER_BYTES:
+        raise ValueError(f"文件大小上限过小: {text}")
+    return size
+
+
+def decimate(image_paths, durations, step):
+    """
+    每 step 帧保留一帧，被丢弃帧的持续时间累加到保留的帧上，总时长不变
+
+    Args:
+        image_paths: 图片路径列表
+        durations: 逐帧持续时间列表
+        step: 抽帧间隔
+
+    Returns:
+        (保留的图片路径列表, 对应的持续时间列表)
+    """
+    if step <= 1:
+        return list(image_paths), list(durations)
+    paths = list(image_paths[::step])
+    merged = [sum(durations[i:i + step]) for i in range(0, len(image_paths), step)]
+    return paths, merged
+
+
+def scaled_size(size, scale):
+    """
+    按比例计算缩放后的尺寸
+
+    Args:
+        size: 原始尺寸 (width, height)
+        scale: 缩放比例
+
+    Returns:
+        (width, height)，每边至少1像素
+    """
+    return max(1, round(size[0] * scale)), max(1, round(size[1] * scale))
+
+
+class _TrialEncoder:
+    """
+    抽样帧试编码器
+
+    抽样帧只解码一次并保存在内存中，每次试编码时缩放、量化后写入内存，
+    用平均每帧字节数推算完整导出的大小。
+    """
+
+    def __init__(self, image_paths, size, palette_mode='local', sample_count=TRIAL_SAMPLE_COUNT, cancel_event=None):
+        self.size = size
+        self.palette_mode = palette_mode
+        self.cancel_event = cancel_event
+        self.samples = []
+        for img_path in sample_paths(image_paths, sample_count):
+            try:
+                with open_image(img_path) as img:
+                    sample = reduce_for_target(img, size)
+                    self.samples.append(sample.convert('RGB').resize(size, Image.Resampling.LANCZOS))
+            except Exception as e:
+                print(f"警告: 无法抽样图片 {img_path}: {e}")
+        # {(scale, colors): (全局调色板或None, 已测量的逐帧字节数列表)}
+        self._results = {}
+
+    def _palette(self, frames, colors):
+        """全局调色板模式下，从缩放后的抽样帧计算共享调色板"""
+        if self.palette_mode != 'global':
+            return None
+        width, height = frames[0].size
+        mosaic = Image.new('RGB', (width, height * len(frames)))
+        for i, frame in enumerate(frames):
+            mosaic.paste(frame, (0, i * height))
+        return bytes(mosaic.quantize(colors=colors, method=Image.Quantize.MEDIANCUT).getpalette('RGB'))
+
+    def frame_bytes(self, scale, colors, limit=None):
+        """
+        估算给定设置下平均每帧的编码字节数
+
+        累计字节数一旦超过 limit * 抽样帧数就提前停止，此时返回的是下限。
+        已测量的帧会保留下来，之后以更宽松的 limit 再次查询时从中断处继续。
+
+        Args:
+            scale: 缩放比例
+            colors: 颜色数
+            limit: 平均每帧字节数上限，None表示完整测量
+
+        Returns:
+            (平均每帧字节数, 是否完整测量)
+        """
+        count = len(self.samples)
+        budget = None if limit is None else limit * count
+        key = (scale, colors)
+        if key not in self._results:
+            palette = None
+            if self.palette_mode == 'global':
+                size = scaled_size(self.size, scale)
+                palette = self._palette([sample.resize(size, Image.Resampling.LANCZOS)
+                                         for sample in self.samples], colors)
+            self._results[key] = (palette, [])
+        palette, measured = self._results[key]
+
+        size = scaled_size(self.size, scale)
+        while len(measured) < count and (budget is None or sum(measured) <= budget):
+            check_cancelled(self.cancel_event)
+            # 与完整导出使用相同的重采样算法，否则模糊的试编码帧会低估压缩后的大小
+            frame = self.samples[len(measured)].resize(size, Image.Resampling.LANCZOS)
+            if palette is not None:
+                frame = quantize_to_palette(frame, palette)
+                table_bytes = 0
+            else:
+                frame = frame.convert('P', palette=Image.ADAPTIVE, colors=colors)
+                # 局部调色板模式下每帧都带一份局部颜色表
+                table_bytes = len(padded_color_table(palette_bytes(optimize_palette(frame)[0])))
+            writer = GifStreamWriter(io.BytesIO(), size=size, loop=None, global_palette=palette)
+            writer.add_frame(frame)
+            # 文件头和全局颜色表不计入帧大小
+            measured.append(writer.bytes_written - writer.header_bytes + table_bytes)
+
+        return sum(measured) / count, len(measured) == count
+
+    def fits(self, scale, colors, frame_count, max_bytes):
+        """
+        判断给定设置下完整导出是否能满足大小上限
+
+        Returns:
+            (是否满足, 估算的文件大小)
+        """
+        limit = (max_bytes * SAFETY_MARGIN - HEADER_BYTES) / frame_count
+        frame_bytes, _ = self.frame_bytes(scale, colors, limit)
+        estimate = int(HEADER_BYTES + frame_bytes * frame_count)
+        return frame_bytes <= limit, estimate
+
+
+def _search_scale(trial, colors, frame_count, max_bytes, low, high, estimate):
+    """
+    在 [low, high] 区间内二分搜索可行的最大缩放比例（low 必须可行）
+
+    Returns:
+        (缩放比例, 估算的文件大小)
+    """
+    for _ in range(SCALE_SEARCH_STEPS):
+        middle = (low + high) / 2
+        fits, middle_estimate = trial.fits(middle, colors, frame_count, max_bytes)
+        if fits:
+            low, estimate = middle, middle_estimate
+        else:
+            high = middle
+    return low, estimate
+
+
+def find_export_settings(image_paths, max_bytes, size=None, duration=100, palette_mode='local', cancel_event=None):
+    """
+    搜索满足文件大小上限的导出设置
+
+    先用最激进的设置（最小缩放、最少颜色、最大抽帧间隔）试编码，仍无法满足时立即报错。
+    随后按 (抽帧间隔, 颜色数) 的优先顺序逐一尝试：缩放比例 ACCEPTABLE_SCALE 可行的第一个组合
+    再用二分搜索找出最大缩放比例并采用；所有组合都不可行时，
+    采用最激进的组合并在 [MIN_SCALE, ACCEPTABLE_SCALE] 内搜索缩放比例。
+    试编码超出预算时会提前停止，因此不可行的组合几乎没有开销。
+
+    Args:
+        image_paths: 图片路径列表
+        max_bytes: 文件大小上限（字节）
+        size: 基准尺寸 (width, height)，None表示使用第一张图片的尺寸
+        duration: 每帧持续时间（毫秒），或逐帧持续时间列表
+        palette_mode: 调色板模式，'local' 或 'global'
+        cancel_event: threading.Event对象，设置后中止搜索并抛出 ExportCancelled
+
+    Returns:
+        包含 scale、resize、colors、step、image_paths、durations、estimated_bytes 的字典
+    """
+    if not image_paths:
+        raise ValueError("至少需要一张图片")
+    size = tuple(size) if size else probe_size(image_paths)
+    if size is None:
+        raise ValueError("没有成功加载任何图片")
+    durations = frame_durations(duration, len(image_paths))
+
+    trial = _TrialEncoder(image_paths, size, palette_mode, cancel_event=cancel_event)
+    if not trial.samples:
+        raise ValueError("没有成功加载任何图片")
+
+    def settings(scale, colors, step, estimate):
+        paths, step_durations = decimate(image_paths, durations, step)
+        return {
+            'scale': scale,
+            'resize': scaled_size(size, scale),
+            'colors': colors,
+            'step': step,
+            'image_paths': paths,
+            'durations': step_durations,
+            'estimated_bytes': estimate,
+        }
+
+    def frame_count(step):
+        return (len(image_paths) + step - 1) // step
+
+    # 最激进的设置都无法满足时，无需继续搜索
+    last_step, last_colors = DECIMATION_STEPS[-1], COLOR_STEPS[-1]
+    fits, estimate = trial.fits(MIN_SCALE, last_colors, frame_count(last_step), max_bytes)
+    if not fits:
+        raise ValueError(f"无法将GIF压缩到 {max_bytes} 字节以内（预计最小 {estimate} 字节），"
+                         f"请减少图片数量或放宽大小上限")
+
+    for step in DECIMATION_STEPS:
+        count = frame_count(step)
+        for colors in COLOR_STEPS:
+            fits, estimate = trial.fits(ACCEPTABLE_SCALE, colors, count, max_bytes)
+            if not fits:
+                continue
+            full_fits, full_estimate = trial.fits(1.0, colors, count, max_bytes)
+            if full_fits:
+                return settings(1.0, colors, step, full_estimate)
+            scale, estimate = _search_scale(trial, colors, count, max_bytes, ACCEPTABLE_SCALE, 1.0, estimate)
+            return settings(scale, colors, step, estimate)
+
+    count = frame_count(last_step)
+    _, estimate = trial.fits(MIN_SCALE, last_colors, count, max_bytes)
+    scale, estimate = _search_scale(trial, last_colors, count, max_bytes, MIN_SCALE, ACCEPTABLE_SCALE, estimate)
+    return settings(scale, last_colors, last_step, estimate)
+
+
+def export_to_size(image_paths, output_path, max_bytes, duration=100, loop=0, resize=None, optimize=True,
+                   progress_callback=None, workers=None, palette_mode='local', delta=False, cache=None,
+                   cancel_event=None):
+    """
+    在文件大小上限内导出GIF
+
+    先用 find_export_settings() 搜索导出设置，再完整导出一次；
+    完整导出一旦预计超限就立即中止，按超出比例缩小尺寸后重试。
+    抽样帧互不相邻，无法估算帧间差分的效果，因此启用 delta 时先按原始设置直接导出，
+    预计超限而中止后才进入搜索。
+
+    Args:
+        image_paths: 图片路径列表
+        output_path: 输出GIF文件路径或可写的二进制文件对象
+        max_bytes: 文件大小上限（字节）
+        其余参数与 create_gif() 相同，resize 作为搜索的基准尺寸
+
+    Returns:
+        实际使用的导出设置字典（同 find_export_settings()）
+    """
+    def reset_output():
+        if hasattr(output_path, 'seek'):
+            output_path.seek(0)
+            output_path.truncate()
+
+    if delta:
+        try:
+            create_gif(image_paths, output_path, duration=duration, loop=loop, resize=resize, optimize=optimize,
+                       progress_callback=progress_callback, workers=workers, palette_mode=palette_mode,
+                       delta=True, cache=cache, max_bytes=max_bytes, cancel_event=cancel_event)
+            size = tuple(resize) if resize else probe_size(image_paths)
+            return {
+                'scale': 1.0,
+                'resize': size,
+                'colors': 256,
+                'step': 1,
+                'image_paths': list(image_paths),
+                'durations': frame_durations(duration, len(image_paths)),
+                'estimated_bytes': None,
+            }
+        except SizeLimitExceeded as e:
+            print(f"提示: {e}，搜索导出设置")
+            reset_output()
+
+    settings = find_export_settings(image_paths, max_bytes, resize, duration, palette_mode, cancel_event)
+
+    for attempt in range(MAX_ATTEMPTS):
+        print(f"目标大小导出: 尺寸 {settings['resize']}，{settings['colors']} 色，"
+              f"每 {settings['step']} 帧保留一帧，预计 {settings['estimated_bytes'] / 1024:.0f} KB")
+        reset_output()
+        try:
+            create_gif(settings['image_paths'], output_path, duration=settings['durations'], loop=loop,
+                       resize=settings['resize'], optimize=optimize, progress_callback=progress_callback,
+                       workers=workers, palette_mode=palette_mode, delta=delta, cache=cache,
+                       colors=settings['colors'], max_bytes=max_bytes, cancel_event=cancel_event)
+            return settings
+        except SizeLimitExceeded as e:
+            if attempt == MAX_ATTEMPTS - 1:
+                raise
+            # 文件大小约与像素数成正比，按超出比例缩小尺寸
+            ratio = (max_bytes * SAFETY_MARGIN / max(e.projected_bytes, 1)) ** 0.5
+            settings['scale'] *= min(ratio, 0.9)
+            if settings['scale'] < MIN_SCALE:
+                raise
+            settings['resize'] = scaled_size(resize or probe_size(image_paths), settings['scale'])
+            print(f"提示: {e}，缩小尺寸后重试")
+    return settings
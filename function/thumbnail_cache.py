@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+缩略图缓存模块
+为网格预览缓存每张图片的多级缩小画面（每级为原图的 1/2^k），
+任意缩放级别的缩略图都从最近的已缓存级别廉价地缩小得到，不再重新解码原图；
+可选的磁盘缩略图存储使下次打开同一批图片时也无需解码原图
+"""
+
+import math
+
+from PIL import Image
+
+from .gif_blocks import file_signature
+from .image_utils import has_transparency, load_image, reduce_for_target, resize_image, to_standard_mode
+from .lru_cache import ByteBudgetLRU
+from .multiframe import source_path
+from .thumbnail_store import store_sizes_for
+
+
+# 缩略图缓存的默认容量（字节）
+THUMBNAIL_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# 缓存条目分组：多级画面和最终尺寸的缩略图，超出预算时先淘汰可以廉价重建的缩略图
+GROUP_LEVEL = 'level'
+GROUP_THUMBNAIL = 'thumbnail'
+
+
+def _image_bytes(image):
+    """估算图片占用的内存字节数"""
+    return image.width * image.height * len(image.getbands())
+
+
+def _level_for(full_size, target_size):
+    """
+    计算满足目标尺寸的最小级别
+
+    Args:
+        full_size: 原图尺寸
+        target_size: 目标尺寸
+
+    Returns:
+        级别 k（该级别尺寸为原图的 1/2^k，且不小于目标尺寸），目标不小于原图时为0
+    """
+    ratio = min(full_size[0] / max(1, target_size[0]), full_size[1] / max(1, target_size[1]))
+    if ratio < 2:
+        return 0
+    return int(math.log2(ratio))
+
+
+def _level_size(full_size, level):
+    """计算级别 level 的尺寸（向上取整，保证不小于按该比例缩小的目标尺寸）"""
+    factor = 1 << level
+    return -(-full_size[0] // factor), -(-full_size[1] // factor)
+
+
+class ThumbnailCache:
+    """
+    网格预览的缩略图缓存
+
+    按 (图片路径, 修改时间和大小, 目标尺寸) 缓存最终的缩略图；未命中时从该图片已缓存的
+    多级画面中选出不小于目标尺寸的最小一级缩小得到；没有合适的级别时先查询磁盘缩略图存储，
+    仍未命中才解码原图，生成新的一级并把固定尺寸的缩略图写入存储。
+    所有条目共享一个字节预算，按最近使用淘汰。
+    """
+
+    def __init__(self, max_bytes=THUMBNAIL_CACHE_MAX_BYTES, store=None):
+        """
+        初始化缓存
+
+        Args:
+            max_bytes: 缓存容量上限（字节）
+            store: ThumbnailStore对象，None表示不使用磁盘缩略图存储
+        """
+        self.lru = ByteBudgetLRU(max_bytes)
+        self.lru.set_active_group(GROUP_LEVEL)
+        self.store = store
+        self.decodes = 0
+        # (图片路径, 文件标识) -> {级别键: 级别尺寸}，级别键为整数 k 或 ('store', 方框边长)
+        self._sources = {}
+
+    def get(self, image_path, size):
+        """
+        获取指定尺寸的缩略图
+
+        Args:
+            image_path: 图片路径或多帧图片的帧引用
+            size: 目标尺寸 (width, height)
+
+        Returns:
+            PIL.Image对象（调用方不应修改），加载失败时返回None
+        """
+        size = (max(1, int(size[0])), max(1, int(size[1])))
+        signature = file_signature(source_path(image_path))
+        if signature is None:
+            return None
+        source = (image_path, signature)
+        key = (GROUP_THUMBNAIL, source, size)
+        thumbnail = self.lru.get(key)
+        if thumbnail is not None:
+            return thumbnail
+
+        level_image = self._nearest_level(source, size)
+        if level_image is None and self.store is not None:
+            level_image = self._load_stored(source, size)
+        if level_image is None:
+            level_image = self._decode_level(source, size)
+            if level_image is None:
+                return None
+        if level_image.size == size:
+            thumbnail = level_image
+        else:
+            thumbnail = resize_image(level_image, size[0], size[1])
+        self.lru.put(key, thumbnail, _image_bytes(thumbnail), GROUP_THUMBNAIL)
+        return thumbnail
+
+    def _nearest_level(self, source, size):
+        """
+        从已缓存的级别中找出不小于目标尺寸的最小一级
+
+        Returns:
+            PIL.Image对象，没有合适的级别时返回None
+        """
+        levels = self._sources.get(source)
+        if not levels:
+            return None
+        candidates = [(level_size[0] * level_size[1], level) for level, level_size in levels.items()
+                      if level_size[0] >= size[0] and level_size[1] >= size[1]]
+        for _, level in sorted(candidates, key=lambda candidate: candidate[0]):
+            image = self.lru.get((GROUP_LEVEL, source, level))
+            if image is not None:
+                return image
+            # 已被淘汰
+            del levels[level]
+        return None
+
+    def _add_level(self, source, level, image):
+        """把一级画面加入缓存"""
+        self._sources.setdefault(source, {})[level] = image.size
+        self.lru.put((GROUP_LEVEL, source, level), image, _image_bytes(image), GROUP_LEVEL)
+
+    def _load_stored(self, source, size):
+        """
+        从磁盘缩略图存储读取不小于目标尺寸的缩略图，作为一级画面加入缓存
+
+        Returns:
+            PIL.Image对象，未命中时返回None
+        """
+        stored = self.store.get(source[0], source[1], size)
+        if stored is None:
+            return None
+        edge, image = stored
+        self._add_level(source, ('store', edge), image)
+        return image
+
+    def _decode_level(self, source, size):
+        """
+        解码原图并生成满足目标尺寸的最小一级
+
+        Returns:
+            PIL.Image对象，加载失败时返回None
+        """
+        image_path = source[0]
+        img = load_image(image_path)
+        if img is None:
+            return None
+        try:
+            full_size = img.size
+            level = _level_for(full_size, size)
+            level_size = _level_size(full_size, level)
+            stored_sizes = store_sizes_for(full_size) if self.store is not None else []
+            # 解码尺寸需同时满足该级别和要写入存储的最大缩略图
+            decode_size = (max([level_size[0]] + [stored[0] for _, stored in stored_sizes]),
+                           max([level_size[1]] + [stored[1] for _, stored in stored_sizes]))
+            # 在缩小之前按原图判断是否需要保留透明信息（缩小前的模式转换可能丢失调色板透明色）
+            mode = 'RGBA' if has_transparency(img) else 'RGB'
+            # 尚未解码时先用 draft()/reduce() 廉价地缩小到接近所需的尺寸
+            reduced = reduce_for_target(img, decode_size) if decode_size != full_size else img
+            # 黑白和16位图片先转换为标准模式，16位灰度按比例缩放而不是截断
+            base = to_standard_mode(reduced).convert(mode)
+            image = base if base.size == level_size else base.resize(level_size, Image.Resampling.LANCZOS)
+            for edge, stored_size in stored_sizes:
+                stored = base if base.size == stored_size else base.resize(stored_size, Image.Resampling.LANCZOS)
+                self.store.put(image_path, source[1], edge, stored)
+        except Exception as e:
+            print(f"无法生成缩略图 {image_path}: {e}")
+            return None
+        finally:
+            img.close()
+        self.decodes += 1
+        self._add_level(source, level, image)
+        return image
+
+    def clear(self):
+        """删除所有缓存的画面"""
+        self.lru.clear()
+        self._sources.clear()
+
+    def stats(self):
+        """
+        获取缓存统计信息
+
+        Returns:
+            ByteBudgetLRU.stats() 的结果，另含解码原图的次数 decodes
+        """
+        stats = self.lru.stats()
+        stats['decodes'] = self.decodes
+        return stats
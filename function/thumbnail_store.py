@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+"""
+缩略图持久化存储模块
+把每张图片几个固定尺寸的缩略图保存在用户缓存目录中，跨会话复用，
+再次打开同一批图片时网格预览直接从磁盘读取缩略图，无需解码原图
+"""
+
+import hashlib
+import io
+import os
+import queue
+import threading
+import time
+
+from PIL import Image
+
+from .frame_cache import get_user_cache_dir
+
+
+# 存储格式版本，缩略图生成方式变化时递增以使旧条目失效
+STORE_VERSION = 1
+# 保存的缩略图尺寸：缩小到能放进 N x N 的方框内（不放大）
+STORE_SIZES = (128, 256, 512)
+# 默认存储容量上限（字节）
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# 条目超过该时长未被使用时在垃圾回收中删除（秒）
+MAX_UNUSED_AGE = 30 * 24 * 3600
+# 两次垃圾回收之间的最小间隔（秒）
+GC_INTERVAL = 24 * 3600
+# 不透明缩略图的 JPEG 质量
+JPEG_QUALITY = 90
+# 存储条目扩展名
+STORE_SUFFIX = '.thumb'
+# 记录上次垃圾回收时间的文件
+GC_STAMP = 'last_gc'
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def store_sizes_for(full_size):
+    """
+    计算一张图片需要保存的缩略图尺寸
+
+    原图能放进某个方框时，该尺寸保存原尺寸的画面，更大的尺寸不再重复保存。
+
+    Args:
+        full_size: 原图尺寸 (width, height)
+
+    Returns:
+        [(方框边长, 缩略图尺寸)] 列表，按边长升序
+    """
+    sizes = []
+    for edge in STORE_SIZES:
+        scale = min(1.0, edge / max(full_size))
+        sizes.append((edge, (max(1, round(full_size[0] * scale)), max(1, round(full_size[1] * scale)))))
+        if scale == 1.0:
+            break
+    return sizes
+
+
+class ThumbnailStore:
+    """
+    缩略图的磁盘存储
+
+    条目键由图片路径、修改时间、文件大小和方框边长共同决定，图片被修改后旧条目不再命中，
+    随后在垃圾回收中按未使用时长删除。读取时更新文件修改时间作为最近使用时间；
+    总大小超过 max_bytes 时删除最久未使用的条目。写入在后台线程中进行，不阻塞界面。
+    """
+
+    def __init__(self, store_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        初始化存储，距上次垃圾回收超过 GC_INTERVAL 时先执行一次垃圾回收
+
+        Args:
+            store_dir: 存储目录，None表示使用用户缓存目录下的 thumbnails 子目录
+            max_bytes: 存储容量上限（字节）
+        """
+        self.store_dir = store_dir or get_user_cache_dir('thumbnails')
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._queue = None
+        os.makedirs(self.store_dir, exist_ok=True)
+        self.total_bytes = sum(size for _, size, _ in self._scan())
+        if self._gc_due():
+            self.collect_garbage()
+
+    def _scan(self):
+        """
+        列出所有存储条目
+
+        Returns:
+            (路径, 大小, 修改时间) 列表
+        """
+        entries = []
+        for entry in os.scandir(self.store_dir):
+            if entry.name.endswith(STORE_SUFFIX):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((entry.path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def make_key(self, image_path, signature, edge):
+        """
+        计算缩略图的存储键
+
+        Args:
+            image_path: 图片路径或多帧图片的帧引用
+            signature: 图片文件的 (修改时间纳秒, 大小)
+            edge: 方框边长
+
+        Returns:
+            存储键字符串
+        """
+        source = (STORE_VERSION, os.path.abspath(image_path), tuple(signature), edge)
+        return hashlib.sha1(repr(source).encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.store_dir, key + STORE_SUFFIX)
+
+    def get(self, image_path, signature, size):
+        """
+        读取不小于目标尺寸的最小一张缩略图
+
+        Args:
+            image_path: 图片路径或多帧图片的帧引用
+            signature: 图片文件的 (修改时间纳秒, 大小)
+            size: 目标尺寸 (width, height)
+
+        Returns:
+            (方框边长, PIL.Image对象)，没有合适的缩略图时返回None
+        """
+        for edge in STORE_SIZES:
+            if edge < max(size):
+                continue
+            path = self._entry_path(self.make_key(image_path, signature, edge))
+            try:
+                with Image.open(path) as img:
+                    img.load()
+                # 更新修改时间，作为最近使用时间
+                os.utime(path)
+            except (OSError, ValueError):
+                continue
+            if img.width >= size[0] and img.height >= size[1]:
+                with self._lock:
+                    self.hits += 1
+                return edge, img
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, image_path, signature, edge, image):
+        """
+        在后台线程中写入一张缩略图
+
+        Args:
+            image_path: 图片路径或多帧图片的帧引用
+            signature: 图片文件的 (修改时间纳秒, 大小)
+            edge: 方框边长
+            image: 'RGB' 或 'RGBA' 模式的PIL.Image对象（写入前调用方不应修改）
+        """
+        with self._lock:
+            if self._queue is None:
+                self._queue = queue.Queue()
+                threading.Thread(target=self._run_writer, daemon=True).start()
+        self._queue.put((self.make_key(image_path, signature, edge), image))
+
+    def flush(self):
+        """等待所有已提交的缩略图写入完成"""
+        if self._queue is not None:
+            self._queue.join()
+
+    def _run_writer(self):
+        """后台写入线程"""
+        while True:
+            key, image = self._queue.get()
+            try:
+                self._write(key, image)
+            finally:
+                self._queue.task_done()
+
+    def _write(self, key, image):
+        """编码并写入一个条目，超出容量时淘汰最久未使用的条目"""
+        path = self._entry_path(key)
+        if os.path.exists(path):
+            # 同一图片同一版本的缩略图内容相同，无需重写
+            return
+        buffer = io.BytesIO()
+        if image.mode == 'RGBA':
+            image.save(buffer, 'PNG', compress_level=1)
+        else:
+            image.convert('RGB').save(buffer, 'JPEG', quality=JPEG_QUALITY)
+        data = buffer.getvalue()
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"警告: 无法写入缩略图: {e}")
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return
+
+        with self._lock:
+            self.total_bytes += len(data)
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self, max_age=None):
+        """
+        删除最久未使用的条目，直到总大小降到上限的 90% 以下（调用方需持有锁）
+
+        Args:
+            max_age: 同时删除超过该时长（秒）未使用的条目，None表示只按容量淘汰
+        """
+        entries = sorted(self._scan(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        limit = self.max_bytes * 0.9
+        oldest_kept = time.time() - max_age if max_age is not None else None
+        for path, size, mtime in entries:
+            if total <= limit and (oldest_kept is None or mtime >= oldest_kept):
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+        self.total_bytes = total
+
+    def _gc_due(self):
+        """判断距上次垃圾回收是否已超过 GC_INTERVAL"""
+        try:
+            last = os.path.getmtime(os.path.join(self.store_dir, GC_STAMP))
+        except OSError:
+            return True
+        return time.time() - last >= GC_INTERVAL
+
+    def collect_garbage(self):
+        """
+        删除超过 MAX_UNUSED_AGE 未使用的条目（包括图片修改或删除后不再命中的旧条目）
+        和中断写入遗留的临时文件，并记录本次垃圾回收的时间
+        """
+        with self._lock:
+            self._evict(MAX_UNUSED_AGE)
+            for entry in os.scandir(self.store_dir):
+                if entry.name.endswith('.tmp'):
+                    try:
+                        if time.time() - entry.stat().st_mtime > GC_INTERVAL:
+                            os.remove(entry.path)
+                    except OSError:
+                        pass
+        try:
+            with open(os.path.join(self.store_dir, GC_STAMP), 'w', encoding='utf-8') as f:
+                f.write(str(int(time.time())))
+        except OSError as e:
+            print(f"警告: 无法记录缩略图垃圾回收时间: {e}")
+
+    def stats(self):
+        """
+        获取存储统计信息
+
+        Returns:
+            包含 hits、misses、evictions、hit_rate、total_bytes 的字典
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'total_bytes': self.total_bytes,
+            }
+
+
+def get_default_store():
+    """
+    获取默认的共享缩略图存储（首次调用时创建）
+
+    Returns:
+        ThumbnailStore对象，存储目录无法创建时返回None
+    """
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            try:
+                _default_store = ThumbnailStore()
+            except OSError as e:
+                print(f"警告: 无法创建缩略图存储目录: {e}")
+                return None
+        return _default_store
@@ -263,10 +263,8 @@ def update_status_info(main_window_instance):
                 total_time_s, total_time_ms = calculate_total_time(num_images, duration_ms)
                 main_window_instance.total_time_label.config(text=f"总时间: {total_time_s:.1f}s ({num_images}张 x {duration_ms}ms)")
 
-                # 估算GIF大小 - 从file_manager导入
-                from function.file_manager import estimate_gif_size
-                estimated_gif_size = estimate_gif_size(main_window_instance.image_paths)
-                main_window_instance.gif_size_label.config(text=f"GIF大小: {estimated_gif_size:.2f}KB")
+                # 估算GIF大小和导出耗时（后台抽样编码，完成后自动刷新）
+                refresh_size_estimate(main_window_instance)
 
             except Exception as e:
                 main_window_instance.current_img_size_label.config(text="当前图片: 无法读取")
@@ -285,6 +283,63 @@ def update_status_info(main_window_instance):
     main_window_instance.zoom_label.config(text=f"缩放: {zoom_percent}%")
 
 
+# 后台估算进行中时轮询结果的间隔（毫秒）
+SIZE_ESTIMATE_POLL_MS = 200
+
+
+def _export_settings(main_window_instance):
+    """
+    读取主窗口中与导出结果相关的设置
+
+    Returns:
+        可传给 estimate_export() 的参数字典
+    """
+    resize = None
+    try:
+        width = int(main_window_instance.resize_width.get())
+        height = int(main_window_instance.resize_height.get())
+        if width > 0 and height > 0:
+            resize = (width, height)
+    except (ValueError, tk.TclError):
+        pass
+    return {
+        'resize': resize,
+        'duration': main_window_instance.duration.get(),
+        'palette_mode': 'global' if main_window_instance.global_palette.get() else 'local',
+    }
+
+
+def refresh_size_estimate(main_window_instance):
+    """
+    刷新状态栏中的GIF大小和导出耗时估算
+
+    估算在后台线程中对抽样帧进行真实编码；尚未完成时显示“估算中”，
+    并用 after() 轮询结果，完成后更新状态栏。
+    """
+    if not main_window_instance.image_paths:
+        main_window_instance.gif_size_label.config(text="GIF大小: --")
+        return
+
+    from function.size_estimator import format_estimate
+    status, result = main_window_instance.size_estimator.request(
+        main_window_instance.image_paths, **_export_settings(main_window_instance))
+
+    if status == 'ready':
+        main_window_instance.gif_size_label.config(text=f"GIF大小: {format_estimate(result)}")
+    elif status == 'error':
+        main_window_instance.gif_size_label.config(text="GIF大小: --")
+    else:
+        main_window_instance.gif_size_label.config(text="GIF大小: 估算中...")
+        if not getattr(main_window_instance, '_size_estimate_polling', False):
+            main_window_instance._size_estimate_polling = True
+
+            def poll():
+                main_window_instance._size_estimate_polling = False
+                refresh_size_estimate(main_window_instance)
+
+            main_window_instance.root.after(SIZE_ESTIMATE_POLL_MS, poll)
+
+
 def update_size_label(x1_var, y1_var, x2_var, y2_var, size_label):
     """
     更新实时尺寸显示
@@ -548,8 +548,12 @@ class CropDialog:
     def load_image(self, image_path):
         """加载图片文件"""
         try:
-            # 加载原始图像
-            self.original_image = Image.open(image_path)
+            # 加载原始图像；多帧图片的帧引用（"路径::帧索引"）由帧索引解码为该帧的完整画面
+            from function.image_utils import load_image as load_source_image
+            image = load_source_image(image_path)
+            if image is None:
+                raise FileNotFoundError(image_path)
+            self.original_image = image
             
             # 延迟加载图片，确保画布尺寸正确
             self.dialog.after(50, self._load_image_delayed)
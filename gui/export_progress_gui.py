@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+导出进度模块
+显示后台导出的进度、吞吐量和剩余时间，并提供取消按钮
+"""
+
+import tkinter as tk
+from tkinter import ttk
+
+
+# 轮询导出状态的间隔（毫秒）
+POLL_INTERVAL_MS = 100
+
+
+def _format_seconds(seconds):
+    """将秒数格式化为 mm:ss"""
+    seconds = int(round(seconds))
+    return f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+
+class ExportProgressDialog:
+    """导出进度对话框"""
+
+    def __init__(self, parent, task, on_finished=None, title="导出GIF"):
+        """
+        创建并显示进度对话框，启动轮询
+
+        Args:
+            parent: 父窗口
+            task: 已启动的ExportTask对象
+            on_finished: 导出结束后调用的回调，参数为 task.snapshot() 的结果
+            title: 窗口标题
+        """
+        self.task = task
+        self.on_finished = on_finished
+
+        self.dialog = tk.Toplevel(parent)
+        self.dialog.title(title)
+        self.dialog.resizable(False, False)
+        self.dialog.transient(parent)
+
+        frame = ttk.Frame(self.dialog, padding="15")
+        frame.pack(fill=tk.BOTH, expand=True)
+
+        self.progress_var = tk.DoubleVar(value=0)
+        self.progress_bar = ttk.Progressbar(frame, variable=self.progress_var, maximum=100, length=360)
+        self.progress_bar.pack(fill=tk.X)
+
+        self.status_label = ttk.Label(frame, text="准备中...", anchor=tk.W)
+        self.status_label.pack(fill=tk.X, pady=(8, 8))
+
+        self.cancel_button = ttk.Button(frame, text="取消", command=self.cancel)
+        self.cancel_button.pack(side=tk.RIGHT)
+
+        # 关闭窗口等同于取消
+        self.dialog.protocol("WM_DELETE_WINDOW", self.cancel)
+
+        # 居中显示在父窗口上方
+        self.dialog.update_idletasks()
+        x = parent.winfo_rootx() + (parent.winfo_width() - self.dialog.winfo_width()) // 2
+        y = parent.winfo_rooty() + (parent.winfo_height() - self.dialog.winfo_height()) // 2
+        self.dialog.geometry(f"+{max(0, x)}+{max(0, y)}")
+
+        self.dialog.after(POLL_INTERVAL_MS, self.poll)
+
+    def cancel(self):
+        """请求取消导出，等待工作线程在下一帧处停止"""
+        self.task.cancel()
+        self.cancel_button.config(state=tk.DISABLED)
+        self.status_label.config(text="正在取消...")
+
+    def poll(self):
+        """在界面线程中读取导出状态并刷新控件"""
+        state = self.task.snapshot()
+        if state['done']:
+            self.dialog.destroy()
+            if self.on_finished:
+                self.on_finished(state)
+            return
+
+        if not self.task.cancel_event.is_set():
+            self.progress_var.set(state['progress'])
+            parts = [f"{state['progress']}%", f"已用 {_format_seconds(state['elapsed'])}"]
+            if state['frames_per_second']:
+                parts.append(f"{state['frames_per_second']:.1f} 帧/秒")
+            if state['eta'] is not None:
+                parts.append(f"剩余 {_format_seconds(state['eta'])}")
+            self.status_label.config(text=" | ".join(parts))
+
+        self.dialog.after(POLL_INTERVAL_MS, self.poll)
@@ -8,13 +8,37 @@ GIF预览模块
 import os
 import tkinter as tk
 from tkinter import ttk, messagebox
-from PIL import Image, ImageTk
+from PIL import ImageTk
+
+from function.frame_prefetch import FramePrefetcher, display_size, render_frame
+from function.gif_blocks import file_signature
+from function.lru_cache import ByteBudgetLRU
+from function.playback_clock import PlaybackClock
+
+
+# 拖动进度条时合并跳转请求的间隔（毫秒）
+SCRUB_INTERVAL_MS = 30
+# PhotoImage缓存的默认内存上限（字节）
+PHOTO_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# Tk 照片图像每个像素占用的字节数（RGBA）
+PHOTO_BYTES_PER_PIXEL = 4
 
 
 class GifPreviewWindow:
     """GIF预览窗口"""
 
-    def __init__(self, parent, frames, duration, output_path, loop=0):
+    def __init__(self, parent, frames, duration, output_path, loop=0, photo_cache_bytes=PHOTO_CACHE_MAX_BYTES):
+        """
+        创建预览窗口
+
+        Args:
+            parent: 父窗口
+            frames: 帧序列，可以是帧列表或支持 len() 和下标访问的 LazyFrameSource
+            duration: 每帧持续时间（毫秒）
+            output_path: 默认的输出文件路径
+            loop: 循环次数
+            photo_cache_bytes: PhotoImage缓存的内存上限（字节）
+        """
         self.frames = frames
         self.duration = duration
         self.output_path = output_path
@@ -23,8 +47,16 @@ class GifPreviewWindow:
         self.is_playing = False
         self.animation_id = None
         self.zoom_scale = 1.0  # 缩放比例
-        self.photo_cache = {}  # 缓存所有帧的PhotoImage对象，防止被垃圾回收
+        # 按内存预算缓存PhotoImage对象，超出上限时优先淘汰其他缩放级别的条目
+        self.photo_cache = ByteBudgetLRU(photo_cache_bytes)
         self.photo = None  # 当前显示的PhotoImage对象
+        self.prefetcher = FramePrefetcher(frames)  # 在工作线程中预渲染后续帧
+        self.playback_clock = PlaybackClock()  # 按目标显示时间调度播放
+        self.pending_seek = None  # 拖动进度条时最近一次请求的帧索引
+        self.seek_id = None
+        self.saved_export = None  # 上次保存的文件信息，用于只修改时间信息的快速保存
+        self.export_task = None  # 正在后台进行的保存任务
+        self.closed = False
 
         # 创建窗口
         self.window = tk.Toplevel(parent)
@@ -161,6 +193,10 @@ class GifPreviewWindow:
         self.frame_label = ttk.Label(center_container1, text="0 / 0", width=10)
         self.frame_label.pack(side=tk.LEFT, padx=(0, 10))
 
+        # 播放时显示实际帧率和目标帧率
+        self.fps_label = ttk.Label(center_container1, text="", width=24)
+        self.fps_label.pack(side=tk.LEFT, padx=(0, 10))
+
         # 控制区域 - 第二行：帧导航和缩放控制
         control_frame2 = ttk.Frame(main_frame)
         control_frame2.grid(row=2, column=0, sticky=(tk.W, tk.E), pady=(5, 5))
@@ -345,29 +381,30 @@ class GifPreviewWindow:
                 scale = self.zoom_scale
 
             # 计算实际显示尺寸
-            display_width = int(orig_width * scale)
-            display_height = int(orig_height * scale)
+            display_width, display_height = display_size(frame.size, scale)
 
             # 创建缓存键，包含帧索引和显示尺寸（使用整数避免浮点数精度问题）
             cache_key = (frame_index, display_width, display_height)
 
             # 检查缓存中是否已有该帧的PhotoImage
-            if cache_key in self.photo_cache:
-                self.photo = self.photo_cache[cache_key]
+            self.photo_cache.set_active_group(scale)
+            cached = self.photo_cache.get(cache_key)
+            if cached is not None:
+                self.photo = cached
             else:
-                # 调整图片大小，根据缩放方向选择合适的插值算法
-                frame_copy = frame.copy()
-                if scale >= 1.0:
-                    # 放大时使用高质量插值，保持清晰
-                    resampling = Image.Resampling.LANCZOS
-                else:
-                    # 缩小时使用双线性插值，提高性能
-                    resampling = Image.Resampling.BILINEAR
-                frame_copy = frame_copy.resize((display_width, display_height), resampling)
+                # 优先使用工作线程预渲染好的图片，界面线程只负责转换为PhotoImage
+                rendered = self.prefetcher.take(frame_index, (display_width, display_height))
+                if rendered is None:
+                    # 尚未预渲染（如刚跳转或刚缩放），在界面线程中渲染这一帧
+                    rendered = render_frame(frame, (display_width, display_height))
 
                 # 转换为PhotoImage并缓存
-                self.photo = ImageTk.PhotoImage(frame_copy)
-                self.photo_cache[cache_key] = self.photo
+                self.photo = ImageTk.PhotoImage(rendered)
+                self.photo_cache.put(cache_key, self.photo, display_width * display_height * PHOTO_BYTES_PER_PIXEL,
+                                     group=scale)
+
+            # 让工作线程按当前缩放比例预渲染后续帧
+            self.prefetcher.request(frame_index + 1, scale)
 
             # 先更新Canvas上的图片
             self.canvas.itemconfig(self.image_id, image=self.photo)
@@ -425,8 +462,6 @@ class GifPreviewWindow:
         # 检查放大后是否会超出边界
         if self.zoom_scale < 10.0:  # 设置最大缩放倍数
             self.zoom_scale *= 1.25
-            # 清除缓存，因为缩放比例改变了
-            self.photo_cache.clear()
             self.photo = None  # 清除当前图片引用
             self.display_frame(self.current_frame_index)
 
@@ -434,16 +469,12 @@ class GifPreviewWindow:
         """缩小画面"""
         if self.zoom_scale > 0.1:  # 设置最小缩放倍数
             self.zoom_scale /= 1.25
-            # 清除缓存，因为缩放比例改变了
-            self.photo_cache.clear()
             self.photo = None  # 清除当前图片引用
             self.display_frame(self.current_frame_index)
 
     def reset_zoom(self):
         """原始大小 - 按图片原始尺寸显示"""
         self.zoom_scale = 1.0
-        # 清除缓存，因为缩放比例改变了
-        self.photo_cache.clear()
         self.photo = None  # 清除当前图片引用
         self.display_frame(self.current_frame_index)
 
@@ -473,8 +504,6 @@ class GifPreviewWindow:
         fit_scale = min(scale_width, scale_height)  # 保持宽高比
         # 更新缩放比例
         self.zoom_scale = fit_scale
-        # 清除缓存，因为缩放比例改变了
-        self.photo_cache.clear()
         self.photo = None  # 清除当前图片引用
         self.display_frame(self.current_frame_index)
 
@@ -497,7 +526,9 @@ class GifPreviewWindow:
         self.is_playing = True
         self.play_button.configure(text="⏸")
         self.create_tooltip(self.play_button, "暂停")
-        self.animate()
+        # 当前帧视为刚刚显示，按目标时间调度下一帧
+        delay = self.playback_clock.start(self.duration_var.get())
+        self.animation_id = self.window.after(delay, self.animate)
 
     def stop(self):
         """停止播放"""
@@ -507,27 +538,56 @@ class GifPreviewWindow:
         if self.animation_id:
             self.window.after_cancel(self.animation_id)
             self.animation_id = None
+        self.fps_label.configure(text="")
 
     def animate(self):
-        """动画播放"""
+        """动画播放，按单调时钟修正调度误差，渲染跟不上时跳过过期的帧"""
         if not self.is_playing:
             return
 
-        # 移动到下一帧
-        next_frame = (self.current_frame_index + 1) % len(self.frames)
+        duration = self.duration_var.get()
+        advance = self.playback_clock.tick(duration)
+
+        # 移动到当前时刻应显示的帧
+        next_frame = (self.current_frame_index + advance) % len(self.frames)
         self.display_frame(next_frame)
+        self.update_fps_label(duration)
 
-        # 继续播放，使用当前的持续时间
-        self.animation_id = self.window.after(self.duration_var.get(), self.animate)
+        # 按下一帧的目标显示时间调度，扣除本帧渲染已用去的时间
+        self.animation_id = self.window.after(self.playback_clock.next_delay(), self.animate)
+
+    def update_fps_label(self, duration):
+        """显示实际帧率、目标帧率和累计跳过的帧数"""
+        fps = self.playback_clock.measured_fps()
+        if fps is None:
+            return
+        text = f"{fps:.1f}/{1000 / max(duration, 1):.1f} fps"
+        if self.playback_clock.dropped:
+            text += f" 丢帧 {self.playback_clock.dropped}"
+        self.fps_label.configure(text=text)
 
     def on_progress_change(self, value):
-        """进度条拖动回调"""
+        """进度条拖动回调，快速拖动时只显示最后一次请求的帧"""
         frame_index = int(float(value))
-        if frame_index != self.current_frame_index:
+        if frame_index == self.current_frame_index:
+            return
+        self.pending_seek = frame_index
+        # 立即让工作线程转向最新位置，之前请求的帧不再渲染
+        self.prefetcher.request(frame_index, self.zoom_scale)
+        if self.seek_id is None:
+            self.seek_id = self.window.after(SCRUB_INTERVAL_MS, self.apply_pending_seek)
+
+    def apply_pending_seek(self):
+        """显示拖动期间最后一次请求的帧"""
+        self.seek_id = None
+        frame_index, self.pending_seek = self.pending_seek, None
+        if frame_index is not None and frame_index != self.current_frame_index:
             self.display_frame(frame_index)
 
     def save_gif(self):
-        """保存GIF"""
+        """保存GIF，重新编码时在后台线程中进行并显示进度"""
+        if self.export_task is not None:
+            return  # 上一次保存尚未结束
         # 如果没有设置输出文件路径，或路径不包含目录部分，弹出文件保存对话框
         import os
         if not self.output_path or not os.path.dirname(self.output_path):
@@ -554,14 +614,87 @@ class GifPreviewWindow:
             
             self.output_path = selected_file
 
+        output_path = self.output_path
         try:
-            from function.gif_operations import save_gif as ops_save_gif
-            ops_save_gif(self.frames, self.output_path, self.duration_var.get(), self.loop_var.get())
-            messagebox.showinfo("成功", f"GIF已保存到:\n{self.output_path}")
+            duration = self.duration_var.get()
+            loop = self.loop_var.get()
+            if self.can_patch_timing():
+                # 帧内容未变，只改写已保存文件中的持续时间和循环次数，不重新编码
+                from function.gif_blocks import patch_gif_timing
+                saved_duration = self.saved_export['duration']
+                patch_gif_timing(output_path,
+                                 duration=lambda ms: max(1, round(ms / saved_duration)) * duration, loop=loop)
+                self.on_save_finished(output_path, duration)
+                return
         except Exception as e:
             messagebox.showerror("错误", f"保存GIF失败:\n{str(e)}")
+            return
+
+        def export(progress_callback, cancel_event):
+            if hasattr(self.frames, 'export'):
+                # 延迟帧源逐帧取出预览用的帧（已解码或来自帧缓存）直接写入，不重新量化
+                self.frames.export(output_path, duration, loop, progress_callback=progress_callback,
+                                   cancel_event=cancel_event)
+            else:
+                from function.gif_operations import save_gif as ops_save_gif
+                ops_save_gif(self.frames, output_path, duration, loop, progress_callback=progress_callback,
+                             cancel_event=cancel_event)
+
+        def on_finished(state):
+            self.export_task = None
+            if self.closed:
+                return
+            if state['cancelled']:
+                messagebox.showinfo("提示", "已取消保存")
+            elif state['error'] is not None:
+                messagebox.showerror("错误", f"保存GIF失败:\n{str(state['error'])}")
+            else:
+                self.on_save_finished(output_path, duration)
+
+        # 在后台线程中保存，界面保持响应，可以继续播放或取消保存
+        from function.export_task import ExportTask
+        from gui.export_progress_gui import ExportProgressDialog
+        self.export_task = ExportTask(export, total_frames=len(self.frames))
+        self.export_task.start()
+        ExportProgressDialog(self.window, self.export_task, on_finished=on_finished, title="保存GIF")
+
+    def on_save_finished(self, output_path, duration):
+        """记录保存的文件信息并提示保存成功"""
+        self.saved_export = {
+            'path': os.path.abspath(output_path),
+            'signature': file_signature(output_path),
+            'duration': duration,
+        }
+        messagebox.showinfo("成功", f"GIF已保存到:\n{output_path}")
+
+    def can_patch_timing(self):
+        """
+        判断能否只修改已保存文件的时间信息
+
+        本窗口上次保存的文件仍未被改动，且输出路径相同时，帧数据一定相同，
+        重复帧合并后每帧的持续时间都是设置值的整数倍，可以按比例换算。
+
+        Returns:
+            bool
+        """
+        saved = self.saved_export
+        return (saved is not None and saved['duration'] > 0
+                and saved['path'] == os.path.abspath(self.output_path)
+                and saved['signature'] == file_signature(self.output_path))
 
     def on_close(self):
         """窗口关闭事件"""
+        self.closed = True
         self.stop()
+        if self.export_task is not None:
+            # 取消未完成的保存，工作线程在下一帧处停止并删除未完成的文件
+            self.export_task.cancel()
+            self.export_task.wait()
+        if self.seek_id:
+            self.window.after_cancel(self.seek_id)
+        self.prefetcher.close()
+        self.photo_cache.clear()
+        if hasattr(self.frames, 'close'):
+            # 停止延迟帧源的后台解码线程
+            self.frames.close()
         self.window.destroy()
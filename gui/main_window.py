@@ -15,12 +15,17 @@ from tkinterdnd2 import DND_FILES, TkinterDnD
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # 导入功能模块
-from function.image_utils import load_image, get_image_info, resize_image, create_photo_image, calculate_scale_to_fit, calculate_scale_to_fill
+from function.image_utils import get_image_info, resize_image, create_photo_image, calculate_scale_to_fit, calculate_scale_to_fill
 from function.crop_backup import crop_image
 from function.history_manager import HistoryManager
 from function.file_manager import get_image_files, validate_image_path, get_file_size_kb
 from function.gif_operations import create_gif
 from function.file_manager import calculate_total_time, validate_gif_params, estimate_gif_size
+from function.size_estimator import BackgroundEstimator
+from function.multiframe import open_image, expand_multiframe_paths
+from function.thumbnail_cache import ThumbnailCache
+from function.thumbnail_store import get_default_store
+from function.grid_layout import GridLayoutEngine
 
 
 class GifMakerGUI:
@@ -55,11 +60,18 @@ class GifMakerGUI:
         self.duration = tk.IntVar(value=100)  # GIF每帧持续时间，默认100ms
         self.loop = tk.IntVar(value=0)  # 循环次数，0表示无限循环
         self.optimize = tk.BooleanVar(value=True)  # 是否优化GIF
+        self.global_palette = tk.BooleanVar(value=True)  # 是否使用共享的全局调色板
+        self.max_size = tk.StringVar()  # GIF文件大小上限（如 8MB），为空表示不限制
+        self.size_estimator = BackgroundEstimator(workers=0)  # 后台估算导出大小和耗时
+        self.export_task = None  # 正在进行的后台导出任务
+        self.last_export = None  # 上次完整导出的记录，用于只重新编码改动过的帧
         self.resize_width = tk.StringVar()  # 调整宽度
         self.resize_height = tk.StringVar()  # 调整高度
         self.current_photo = None  # 当前PhotoImage对象
         self.preview_scale = 1.0  # 预览缩放比例
         self.preview_photos = []  # 存储所有PhotoImage对象
+        self.thumbnail_cache = ThumbnailCache(store=get_default_store())  # 网格预览的多级缩略图缓存（附带磁盘存储）
+        self.grid_layout = GridLayoutEngine()  # 网格预览布局（增量更新）
         self.image_rects = []  # 存储所有图片的矩形区域信息
         self.selected_image_index = -1  # 当前选中的图片索引
         self.selected_image_indices = set()  # 多选图片索引集合
@@ -275,6 +287,25 @@ class GifMakerGUI:
         btn_preview_gif.pack(side=tk.LEFT, padx=(0, 3))
         self.create_tooltip(btn_preview_gif, "预览GIF")
 
+        # 导出GIF按钮
+        from function.gif_operations import create_gif_from_gui
+        btn_export_gif = ttk.Button(control_frame, text="📤", command=lambda: create_gif_from_gui(self), width=5)
+        btn_export_gif.pack(side=tk.LEFT, padx=(0, 3))
+        self.create_tooltip(btn_export_gif, "导出GIF")
+
+        # 文件大小上限输入框
+        ttk.Label(control_frame, text="上限").pack(side=tk.LEFT, padx=(5, 2))
+        max_size_entry = ttk.Entry(control_frame, textvariable=self.max_size, width=7)
+        max_size_entry.pack(side=tk.LEFT, padx=(0, 3))
+        self.create_tooltip(max_size_entry, "GIF文件大小上限，如 8MB、500KB；留空表示不限制")
+
+        # 全局调色板开关
+        from function.ui_operations import refresh_size_estimate
+        chk_global_palette = ttk.Checkbutton(control_frame, text="全局调色板", variable=self.global_palette,
+                                             command=lambda: refresh_size_estimate(self))
+        chk_global_palette.pack(side=tk.LEFT, padx=(0, 3))
+        self.create_tooltip(chk_global_palette, "所有帧共用一个调色板，文件更小；色彩差异大的序列可取消勾选")
+
         # 分隔线
         ttk.Separator(control_frame, orient=tk.VERTICAL).pack(side=tk.LEFT, fill=tk.Y, padx=5)
 
@@ -444,7 +475,7 @@ class GifMakerGUI:
         try:
             # 加载图片
             img_path = self.image_paths[index]
-            img = Image.open(img_path)
+            img = open_image(img_path)
 
             # 获取原始尺寸
             orig_width, orig_height = img.size
@@ -531,30 +562,13 @@ class GifMakerGUI:
         if not self.image_paths:
             return
 
-        # 计算网格布局
-        from function.image_utils import calculate_grid_layout
-        layout_data = calculate_grid_layout(
-            self.image_paths,
-            self.pending_crops,
-            self.preview_scale
-        )
-
-        if not layout_data:
-            return
-
         # 获取Canvas实际尺寸
         self.preview_canvas.update_idletasks()
         canvas_width = self.preview_canvas.winfo_width()
-        canvas_height = self.preview_canvas.winfo_height()
 
-        # 重新计算布局，使用实际的Canvas尺寸
-        layout_data = calculate_grid_layout(
-            self.image_paths,
-            self.pending_crops,
-            self.preview_scale,
-            canvas_width=canvas_width,
-            canvas_height=canvas_height
-        )
+        # 按实际的Canvas尺寸更新网格布局（只重新计算变化的部分）
+        self.grid_layout.update(self.image_paths, self.preview_scale, canvas_width)
+        layout_data = self.grid_layout.layout(self.pending_crops)
 
         # 遍历布局数据，显示每张图片
         for item in layout_data:
@@ -565,12 +579,12 @@ class GifMakerGUI:
             # 如果图片已裁剪，使用裁剪后的图片
             if img_path in self.pending_crops:
                 img = self.pending_crops[img_path]
+                img_resized = resize_image(img, size[0], size[1]) if img else None
             else:
-                img = load_image(img_path)
+                # 从缩略图缓存获取，缩放、撤销或删除后重绘时不再重新解码原图
+                img_resized = self.thumbnail_cache.get(img_path, size)
 
-            if img:
-                # 调整图片大小
-                img_resized = resize_image(img, size[0], size[1])
+            if img_resized:
                 photo = create_photo_image(img_resized)
                 self.preview_photos.append(photo)
 
@@ -1153,21 +1167,13 @@ class GifMakerGUI:
 
     def update_image_positions(self):
         """更新图片位置（使用双缓冲技术减少闪烁）"""
-        from function.image_utils import calculate_grid_layout
-        
         # 获取Canvas实际尺寸
         self.preview_canvas.update_idletasks()
         canvas_width = self.preview_canvas.winfo_width()
-        canvas_height = self.preview_canvas.winfo_height()
 
-        # 计算布局，使用实际的Canvas尺寸
-        layout_data = calculate_grid_layout(
-            self.image_paths,
-            self.pending_crops,
-            self.preview_scale,
-            canvas_width=canvas_width,
-            canvas_height=canvas_height
-        )
+        # 更新布局，拖动调整顺序时只重新计算移动位置之后的行
+        self.grid_layout.update(self.image_paths, self.preview_scale, canvas_width)
+        layout_data = self.grid_layout.layout(self.pending_crops)
 
         if not layout_data:
             return
@@ -1189,12 +1195,12 @@ class GifMakerGUI:
             # 如果图片已裁剪，使用裁剪后的图片
             if img_path in self.pending_crops:
                 img = self.pending_crops[img_path]
+                img_resized = resize_image(img, size[0], size[1]) if img else None
             else:
-                img = load_image(img_path)
+                # 从缩略图缓存获取，缩放、撤销或删除后重绘时不再重新解码原图
+                img_resized = self.thumbnail_cache.get(img_path, size)
 
-            if img:
-                # 调整图片大小
-                img_resized = resize_image(img, size[0], size[1])
+            if img_resized:
                 photo = create_photo_image(img_resized)
                 new_photos.append(photo)
                 new_rects.append({
@@ -1401,8 +1407,8 @@ class GifMakerGUI:
                         image_paths.append(path)
 
             if image_paths:
-                # 清除已有图片，只保留新拖拽的图片
-                self.image_paths = image_paths
+                # 清除已有图片，只保留新拖拽的图片；动画GIF等多帧图片展开为逐帧引用
+                self.image_paths = expand_multiframe_paths(image_paths)
 
                 # 重置选择状态
                 self.selected_image_indices = set()
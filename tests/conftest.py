@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+测试公共配置
+把项目根目录加入导入路径，缓存目录重定向到临时目录，并提供生成测试图片的工具
+"""
+
+import os
+import random
+import sys
+
+import pytest
+from PIL import Image, ImageDraw
+
+# 添加项目根目录到系统路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    """每个测试使用独立的用户缓存目录，不读写真实的缓存"""
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    monkeypatch.setenv('LOCALAPPDATA', str(tmp_path / 'cache'))
+
+
+def make_images(directory, count, size=(160, 120), mode='RGB', ext='.png', seed=0):
+    """
+    生成内容各不相同的测试图片（渐变背景 + 随机色块）
+
+    Args:
+        directory: 输出目录
+        count: 图片数量
+        size: 图片尺寸
+        mode: 保存前转换到的图片模式（如 'P'、'1'、'I;16'）
+        ext: 文件扩展名
+        seed: 随机种子
+
+    Returns:
+        图片路径列表
+    """
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    width, height = size
+    gradient = Image.linear_gradient('L').resize(size)
+    paths = []
+    for i in range(count):
+        img = Image.merge('RGB', (gradient, gradient.rotate(90), Image.new('L', size, (i * 37) % 256)))
+        draw = ImageDraw.Draw(img)
+        for _ in range(6):
+            x, y = rng.randrange(width), rng.randrange(height)
+            draw.ellipse((x, y, x + width // 4, y + height // 4),
+                         fill=tuple(rng.randrange(256) for _ in range(3)))
+        if mode == 'P':
+            img = img.convert('P', palette=Image.ADAPTIVE)
+        elif mode == 'I;16':
+            img = img.convert('L').point(lambda v: v * 256, 'I').convert('I;16')
+        elif mode != 'RGB':
+            img = img.convert(mode)
+        path = os.path.join(str(directory), f"img_{i:03d}{ext}")
+        img.save(path)
+        paths.append(path)
+    return paths
+
+
+@pytest.fixture
+def image_factory(tmp_path):
+    """返回在临时目录中生成测试图片的函数"""
+    counter = iter(range(1000))
+
+    def factory(count, size=(160, 120), mode='RGB', ext='.png', seed=0):
+        return make_images(tmp_path / f"images_{next(counter)}", count, size, mode, ext, seed)
+    return factory
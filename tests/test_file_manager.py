@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+裁剪保存测试：多帧图片中单帧的裁剪结果另存为独立文件，原文件保持不变
+"""
+
+from PIL import Image, ImageChops
+
+from function.crop_backup import crop_image
+from function.file_manager import batch_save_cropped_images
+from function.image_utils import load_image
+from function.multiframe import make_frame_ref
+
+
+def test_crop_frame_ref_saves_separate_file(image_factory, tmp_path):
+    frames = [Image.open(path).convert('RGB') for path in image_factory(3)]
+    gif_path = str(tmp_path / 'anim.gif')
+    frames[0].save(gif_path, save_all=True, append_images=frames[1:], duration=100)
+    with open(gif_path, 'rb') as f:
+        original = f.read()
+
+    ref = make_frame_ref(gif_path, 1)
+    # 已有同名文件时不能被覆盖
+    existing = tmp_path / 'anim_frame1.png'
+    existing.write_bytes(b'keep')
+    image_paths = [make_frame_ref(gif_path, 0), ref, make_frame_ref(gif_path, 2)]
+    cropped = crop_image(load_image(ref), 10, 20, 90, 100)
+
+    assert batch_save_cropped_images({ref: cropped}, image_paths) == (1, 0)
+
+    save_path = str(tmp_path / 'anim_frame1_1.png')
+    assert image_paths == [make_frame_ref(gif_path, 0), save_path, make_frame_ref(gif_path, 2)]
+    assert existing.read_bytes() == b'keep'
+    with Image.open(save_path) as saved:
+        assert saved.size == (80, 80)
+        assert ImageChops.difference(saved.convert('RGB'), cropped.convert('RGB')).getbbox() is None
+    with open(gif_path, 'rb') as f:
+        assert f.read() == original
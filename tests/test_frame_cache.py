@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""
+帧缓存测试：记录的总大小必须与磁盘上的缓存条目一致
+"""
+
+from PIL import Image, ImageChops
+
+from function.frame_cache import FrameCache
+
+
+def _frame(color):
+    return Image.new('RGB', (64, 48), color).convert('P', palette=Image.ADAPTIVE)
+
+
+def _disk_bytes(cache):
+    return sum(size for _, size, _ in cache._scan())
+
+
+def test_overwrite_keeps_total_bytes(tmp_path):
+    cache = FrameCache(str(tmp_path / 'frames'))
+    for color in ((255, 0, 0), (0, 255, 0), (0, 0, 255)):
+        cache.put('same-key', _frame(color))
+    assert cache.total_bytes == _disk_bytes(cache)
+    assert ImageChops.difference(cache.get('same-key').convert('RGB'),
+                                 _frame((0, 0, 255)).convert('RGB')).getbbox() is None
+
+
+def test_overwrite_does_not_evict_other_entries(tmp_path):
+    first = _frame((255, 0, 0))
+    cache = FrameCache(str(tmp_path / 'frames'))
+    cache.put('other', first)
+    entry_bytes = cache.total_bytes
+    cache.max_bytes = entry_bytes * 3
+    for _ in range(10):
+        cache.put('same-key', first)
+    assert cache.evictions == 0
+    assert cache.get('other') is not None
+    assert cache.total_bytes == _disk_bytes(cache) == entry_bytes * 2
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+帧间差分编码测试：差分编码的GIF解码后每帧画面必须与完整帧编码相同
+"""
+
+from PIL import Image, ImageChops, ImageDraw
+
+from function.gif_operations import create_gif, save_gif
+
+
+def _decoded_frames(path):
+    frames = []
+    with Image.open(path) as gif:
+        for index in range(gif.n_frames):
+            gif.seek(index)
+            frames.append((gif.convert('RGB'), gif.info.get('duration')))
+    return frames
+
+
+def _assert_same_animation(a, b):
+    assert len(a) == len(b)
+    for (frame_a, duration_a), (frame_b, duration_b) in zip(a, b):
+        assert duration_a == duration_b
+        assert ImageChops.difference(frame_a, frame_b).getbbox() is None
+
+
+def _screen_frames(directory, count):
+    """大部分画面静止、只有小块区域变化的序列"""
+    paths = []
+    base = Image.new('RGB', (160, 120), (230, 230, 230))
+    ImageDraw.Draw(base).rectangle((0, 0, 160, 20), fill=(40, 40, 60))
+    for i in range(count):
+        img = base.copy()
+        ImageDraw.Draw(img).rectangle((10 + i * 12, 50, 30 + i * 12, 70), fill=(20, 120, 220))
+        path = str(directory / f"screen_{i:02d}.png")
+        img.save(path)
+        paths.append(path)
+    return paths
+
+
+def test_delta_export_matches_full_frames(image_factory, tmp_path):
+    for paths in (_screen_frames(tmp_path, 6), image_factory(5)):
+        full_path = str(tmp_path / 'full.gif')
+        delta_path = str(tmp_path / 'delta.gif')
+        for palette_mode in ('local', 'global'):
+            create_gif(paths, full_path, resize=(160, 120), palette_mode=palette_mode, coalesce=False)
+            create_gif(paths, delta_path, resize=(160, 120), palette_mode=palette_mode, coalesce=False, delta=True)
+            _assert_same_animation(_decoded_frames(full_path), _decoded_frames(delta_path))
+
+
+def test_save_gif_delta_matches_full_frames(tmp_path):
+    frames = [Image.open(path).convert('P', palette=Image.ADAPTIVE) for path in _screen_frames(tmp_path, 5)]
+    full_path = str(tmp_path / 'full.gif')
+    delta_path = str(tmp_path / 'delta.gif')
+    save_gif(frames, full_path, duration=80, delta=False)
+    save_gif(frames, delta_path, duration=80, delta=True)
+    _assert_same_animation(_decoded_frames(full_path), _decoded_frames(delta_path))
+
+
+def test_save_gif_scales_mixed_sizes_to_canvas(tmp_path):
+    sizes = [(50, 50), (80, 80), (30, 30)]
+    frames = [Image.new('RGB', size, (40 * i, 200, 90)) for i, size in enumerate(sizes)]
+    output_path = str(tmp_path / 'mixed.gif')
+    save_gif(frames, output_path, duration=50)
+
+    decoded = _decoded_frames(output_path)
+    assert len(decoded) == len(frames)
+    for (frame, _), source in zip(decoded, frames):
+        assert frame.size == (50, 50)
+        expected = source.resize((50, 50), Image.Resampling.NEAREST).convert('RGB')
+        assert ImageChops.difference(frame, expected).getbbox() is None
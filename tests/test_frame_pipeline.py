@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+帧预处理流水线测试：并行模式（包括共享内存传输）与串行模式的结果必须完全一致
+"""
+
+from PIL import Image, ImageChops
+
+from function.frame_pipeline import iter_processed_frames, process_frame, shutdown_worker_pool
+from function.gif_operations import create_gif
+
+
+def _same_pixels(a, b):
+    return a.size == b.size and ImageChops.difference(a.convert('RGB'), b.convert('RGB')).getbbox() is None
+
+
+def test_parallel_frames_match_serial(image_factory):
+    paths = image_factory(8)
+    try:
+        parallel = [(path, frame.copy()) for path, frame, error in
+                    iter_processed_frames(paths, (80, 60), workers=2) if error is None]
+    finally:
+        shutdown_worker_pool()
+    serial = [(path, frame) for path, frame, error in iter_processed_frames(paths, (80, 60), workers=1)]
+    assert [path for path, _ in parallel] == paths
+    for (path, a), (_, b) in zip(parallel, serial):
+        assert a.tobytes() == b.tobytes()
+        assert a.getpalette() == b.getpalette()
+        assert _same_pixels(a, process_frame(path, (80, 60)))
+
+
+def test_parallel_export_is_byte_identical(image_factory, tmp_path):
+    paths = image_factory(8)
+    outputs = {}
+    try:
+        for workers in (1, 2):
+            for palette_mode in ('local', 'global'):
+                output = str(tmp_path / f"out_{workers}_{palette_mode}.gif")
+                create_gif(paths, output, duration=[40 + i for i in range(len(paths))], resize=(80, 60),
+                           workers=workers, palette_mode=palette_mode)
+                with open(output, 'rb') as f:
+                    outputs[workers, palette_mode] = f.read()
+    finally:
+        shutdown_worker_pool()
+    assert outputs[1, 'local'] == outputs[2, 'local']
+    assert outputs[1, 'global'] == outputs[2, 'global']
+
+
+def test_export_decodes_to_processed_frames(image_factory, tmp_path):
+    paths = image_factory(4)
+    output = str(tmp_path / 'out.gif')
+    create_gif(paths, output, resize=(80, 60), coalesce=False)
+    with Image.open(output) as gif:
+        assert gif.n_frames == len(paths)
+        for index, path in enumerate(paths):
+            gif.seek(index)
+            assert _same_pixels(gif.convert('RGB'), process_frame(path, (80, 60)))
+
+
+def _frame_bytes(frames):
+    return [(path, frame.tobytes(), frame.getpalette()) for path, frame, error in frames if error is None]
+
+
+def test_shared_memory_frames_match_pickled(image_factory, monkeypatch):
+    from function import frame_pipeline
+    from function.shared_frames import SharedFrameRing
+
+    paths = image_factory(10)
+    opened = []
+    original_open = SharedFrameRing.open
+
+    def recording_open(ring, shared):
+        opened.append(shared.slot)
+        return original_open(ring, shared)
+
+    monkeypatch.setattr(SharedFrameRing, 'open', recording_open)
+    try:
+        # 保留所有产出的帧，槽位全部占满后剩余的帧回退到序列化传输
+        shared = list(iter_processed_frames(paths, (80, 60), workers=2))
+        shared_bytes = _frame_bytes(shared)
+        monkeypatch.setattr(frame_pipeline, '_create_ring', lambda slot_count, slot_bytes: None)
+        pickled = _frame_bytes(iter_processed_frames(paths, (80, 60), workers=2))
+    finally:
+        shutdown_worker_pool()
+    assert opened, "并行模式应通过共享内存传回帧"
+    assert shared_bytes == pickled == _frame_bytes(iter_processed_frames(paths, (80, 60), workers=1))
+
+
+def test_shared_memory_frames_fill_cache(image_factory, tmp_path):
+    from function.frame_cache import FrameCache
+
+    paths = image_factory(6)
+    cache = FrameCache(str(tmp_path / 'frames'))
+    try:
+        # 启用编码且需要写入缓存时，帧像素经共享内存传回主进程写入缓存
+        encoded = [frame for _, frame, error in
+                   iter_processed_frames(paths, (80, 60), workers=2, cache=cache, encode=True) if error is None]
+    finally:
+        shutdown_worker_pool()
+    assert len(encoded) == len(paths)
+    for path in paths:
+        cached = cache.get(cache.make_key(path, (80, 60)))
+        assert cached is not None
+        assert cached.tobytes() == process_frame(path, (80, 60)).tobytes()
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+延迟帧源测试：从预览保存的GIF必须与预览中显示的帧完全一致
+"""
+
+import os
+import threading
+
+import pytest
+from PIL import Image, ImageChops
+
+from function.frame_cache import FrameCache
+from function.frame_source import LazyFrameSource
+from function.gif_operations import ExportCancelled
+
+
+@pytest.mark.parametrize('palette_mode', ['local', 'global'])
+def test_export_writes_preview_frames(image_factory, tmp_path, palette_mode):
+    paths = image_factory(6)
+    output_path = str(tmp_path / 'preview.gif')
+    source = LazyFrameSource(paths, resize=(160, 120), palette_mode=palette_mode,
+                             cache=FrameCache(str(tmp_path / 'frames')))
+    try:
+        expected = [source.get(index, seek=False).convert('RGB') for index in range(len(source))]
+        progress = []
+        source.export(output_path, duration=80, progress_callback=progress.append)
+    finally:
+        source.close()
+
+    assert progress[-1] == 100
+    with Image.open(output_path) as gif:
+        assert gif.n_frames == len(expected)
+        for index, frame in enumerate(expected):
+            gif.seek(index)
+            assert ImageChops.difference(gif.convert('RGB'), frame).getbbox() is None
+
+
+def test_export_cancel_removes_file(image_factory, tmp_path):
+    output_path = str(tmp_path / 'cancelled.gif')
+    source = LazyFrameSource(image_factory(3), resize=(160, 120))
+    cancel_event = threading.Event()
+    cancel_event.set()
+    try:
+        with pytest.raises(ExportCancelled):
+            source.export(output_path, cancel_event=cancel_event)
+    finally:
+        source.close()
+    assert not os.path.exists(output_path)
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+GIF帧修补测试：修补后的文件解码结果必须与完整重新导出一致（替换帧允许量化误差）
+"""
+
+import threading
+
+import pytest
+from PIL import Image, ImageChops, ImageDraw, ImageStat
+
+from function.gif_operations import ExportCancelled, create_gif
+from function.gif_splice import make_export_manifest, plan_splice, splice_gif_frames
+from function.palette import MAX_PALETTE_ERROR
+
+
+def _decoded_frames(path):
+    frames = []
+    with Image.open(path) as gif:
+        for index in range(gif.n_frames):
+            gif.seek(index)
+            frames.append(gif.convert('RGB'))
+    return frames
+
+
+def _rms_error(a, b):
+    rms = ImageStat.Stat(ImageChops.difference(a.convert('RGB'), b.convert('RGB'))).rms
+    return sum(rms) / len(rms)
+
+
+def _replacement(path):
+    """颜色与原有各帧完全不同的新图片"""
+    img = Image.new('RGB', (160, 120), (250, 20, 200))
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((20, 20, 100, 80), fill=(10, 240, 30))
+    draw.ellipse((90, 40, 150, 110), fill=(255, 230, 0))
+    img.save(path)
+    return path
+
+
+@pytest.mark.parametrize('palette_mode', ['local', 'global'])
+@pytest.mark.parametrize('delta', [False, True])
+def test_splice_matches_full_export(image_factory, tmp_path, palette_mode, delta):
+    # 原有各帧只有灰度，替换图片是高饱和度的彩色
+    paths = image_factory(6, mode='L')
+    options = dict(resize=(160, 120), palette_mode=palette_mode, delta=delta, coalesce=False)
+    spliced_path = str(tmp_path / 'spliced.gif')
+    full_path = str(tmp_path / 'full.gif')
+    create_gif(paths, spliced_path, **options)
+    original = _decoded_frames(spliced_path)
+
+    new_image = _replacement(str(tmp_path / 'new.png'))
+    splice_gif_frames(spliced_path, {2: new_image})
+    create_gif(paths[:2] + [new_image] + paths[3:], full_path, **options)
+
+    spliced = _decoded_frames(spliced_path)
+    full = _decoded_frames(full_path)
+    assert len(spliced) == len(full) == len(original)
+    for index, frame in enumerate(spliced):
+        if index != 2:
+            # 其余帧与修补前的画面完全相同
+            assert ImageChops.difference(frame, original[index]).getbbox() is None
+    source = Image.open(new_image).convert('RGB')
+    assert _rms_error(spliced[2], source) <= max(_rms_error(full[2], source), 1.0) + 1.0
+    assert _rms_error(spliced[2], source) < MAX_PALETTE_ERROR
+
+
+@pytest.mark.parametrize('resize', [None, (160, 120)])
+def test_plan_splice_first_image_defines_canvas(image_factory, tmp_path, resize):
+    paths = image_factory(4)
+    options = dict(resize=resize, palette_mode='local')
+    output_path = str(tmp_path / 'out.gif')
+    frame_map = []
+    create_gif(paths, output_path, frame_map=frame_map, **options)
+    manifest = make_export_manifest(paths, output_path, options, frame_map)
+
+    new_image = _replacement(str(tmp_path / 'new.png'))
+    assert plan_splice(manifest, paths[:1] + [new_image] + paths[2:], output_path, options) == {1: new_image}
+    # 未统一尺寸时第一张图片决定画布尺寸，改动后必须完整重新导出
+    replacements = plan_splice(manifest, [new_image] + paths[1:], output_path, options)
+    if resize is None:
+        assert replacements is None
+    else:
+        assert replacements == {0: new_image}
+
+
+def test_splice_cancel_keeps_original(image_factory, tmp_path):
+    paths = image_factory(4)
+    output_path = str(tmp_path / 'out.gif')
+    create_gif(paths, output_path, resize=(160, 120))
+    with open(output_path, 'rb') as f:
+        original = f.read()
+
+    cancel_event = threading.Event()
+    cancel_event.set()
+    with pytest.raises(ExportCancelled):
+        splice_gif_frames(output_path, {1: _replacement(str(tmp_path / 'new.png'))}, cancel_event=cancel_event)
+    with open(output_path, 'rb') as f:
+        assert f.read() == original
+    assert not any(p.suffix == '.tmp' for p in tmp_path.iterdir())
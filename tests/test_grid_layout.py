@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+网格布局测试：直接求解的适应窗口比例不能小于逐个试算得到的最大比例，
+布局引擎增量更新后的布局必须与逐张循环计算的完整布局一致
+"""
+
+import random
+
+import numpy as np
+import pytest
+
+from function import grid_layout
+from function.grid_layout import (FIT_MAX_SCALE, FIT_MIN_SCALE, GRID_PADDING, GridLayoutEngine, fit_grid_scale,
+                                  fits_canvas, scale_sizes)
+
+
+def _brute_force_scale(sizes, canvas_width, canvas_height, steps=2000):
+    """在按等比间隔取的缩放比例中逐个试算，返回能放下的最大比例"""
+    best = None
+    for scale in np.geomspace(FIT_MIN_SCALE, FIT_MAX_SCALE, steps):
+        if fits_canvas(scale_sizes(sizes, scale), canvas_width, canvas_height):
+            best = float(scale)
+    return best
+
+
+def _bisect_scale(sizes, canvas_width, canvas_height):
+    """原有方法：在缩放范围内二分，精度 0.001"""
+    low, high, best = FIT_MIN_SCALE, FIT_MAX_SCALE, None
+    for _ in range(20):
+        scale = (low + high) / 2
+        if fits_canvas(scale_sizes(sizes, scale), canvas_width, canvas_height):
+            best = low = scale
+        else:
+            high = scale
+        if high - low < 0.001:
+            break
+    return best
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_fit_scale_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    for _ in range(6):
+        count = int(rng.integers(1, 60))
+        sizes = np.stack((rng.integers(20, 3000, count), rng.integers(20, 3000, count)), axis=1)
+        canvas_width, canvas_height = int(rng.integers(300, 1900)), int(rng.integers(300, 1100))
+        scale = fit_grid_scale(sizes, canvas_width, canvas_height)
+        brute = _brute_force_scale(sizes, canvas_width, canvas_height)
+        if brute is None:
+            assert scale is None or fits_canvas(scale_sizes(sizes, scale), canvas_width, canvas_height)
+            continue
+        assert scale is not None
+        assert fits_canvas(scale_sizes(sizes, scale), canvas_width, canvas_height)
+        assert scale >= brute * (1 - 1e-4)
+        bisected = _bisect_scale(sizes, canvas_width, canvas_height)
+        if bisected is not None:
+            assert scale >= bisected * (1 - 1e-4)
+
+
+def _loop_layout(sizes, scale, canvas_width):
+    """原有方法：逐张图片循环计算列宽、行高和坐标，返回 [((x, y), (width, height))]"""
+    display_sizes = [(w, h) if scale == 1.0 else (int(w * scale), int(h * scale)) for w, h in sizes]
+    if not display_sizes:
+        return []
+    avg_width = sum(size[0] for size in display_sizes) / len(display_sizes)
+    cols = max(1, int(canvas_width / (avg_width + GRID_PADDING)))
+    rows = (len(display_sizes) + cols - 1) // cols
+    col_widths = [0] * cols
+    row_heights = [0] * rows
+    for i, (width, height) in enumerate(display_sizes):
+        col_widths[i % cols] = max(col_widths[i % cols], width)
+        row_heights[i // cols] = max(row_heights[i // cols], height)
+    col_positions = [GRID_PADDING]
+    for i in range(1, cols):
+        col_positions.append(col_positions[-1] + col_widths[i - 1] + GRID_PADDING)
+    row_positions = [GRID_PADDING]
+    for i in range(1, rows):
+        row_positions.append(row_positions[-1] + row_heights[i - 1] + GRID_PADDING)
+    return [((col_positions[i % cols], row_positions[i // cols]), size) for i, size in enumerate(display_sizes)]
+
+
+def test_engine_matches_loop_layout(monkeypatch):
+    rng = random.Random(3)
+    known_sizes = {}
+
+    def new_path():
+        path = f"img_{len(known_sizes):05d}.png"
+        known_sizes[path] = (rng.randint(20, 900), rng.randint(20, 700))
+        return path
+
+    # update() 从元数据索引读取尺寸，这里直接返回生成的尺寸
+    monkeypatch.setattr(grid_layout, 'get_grid_sizes', lambda image_paths: np.array(
+        [known_sizes[path] for path in image_paths], dtype=np.int64).reshape(-1, 2))
+
+    engine = GridLayoutEngine(0.37, 1300)
+    paths = []
+    for _ in range(400):
+        operation = rng.random()
+        if operation < 0.3 or not paths:
+            index = rng.randint(0, len(paths))
+            added = [new_path() for _ in range(rng.randint(1, 30))]
+            engine.insert(index, added, [known_sizes[path] for path in added])
+            paths[index:index] = added
+        elif operation < 0.5:
+            removed = set(rng.sample(range(len(paths)), min(len(paths), rng.randint(1, 10))))
+            engine.delete(sorted(removed))
+            paths = [path for i, path in enumerate(paths) if i not in removed]
+        elif operation < 0.7:
+            source, target = rng.randrange(len(paths)), rng.randrange(len(paths))
+            engine.move(source, target)
+            paths.insert(target, paths.pop(source))
+        elif operation < 0.8:
+            engine.update(paths, rng.choice([1.0, 0.5, 0.37, 1.25, 0.1]), rng.randint(200, 3000))
+        else:
+            # 任意改动后的完整路径列表
+            paths = list(paths)
+            tail = rng.randint(0, len(paths))
+            shuffled = paths[tail:]
+            rng.shuffle(shuffled)
+            paths[tail:] = shuffled
+            paths.insert(rng.randint(0, len(paths)), new_path())
+            engine.update(paths)
+
+        assert engine.paths == paths
+        expected = _loop_layout([known_sizes[path] for path in paths], engine.scale, engine.canvas_width)
+        assert [(tuple(item['position']), tuple(item['size'])) for item in engine.layout()] == expected
+        if expected:
+            assert engine.extent() == (max(x + w for (x, _), (w, _) in expected),
+                                       max(y + h for (_, y), (_, h) in expected))
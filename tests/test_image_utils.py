@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+图像工具测试：快速缩小解码必须支持 reduce() 不能直接处理的调色板、黑白和16位图片
+"""
+
+import pytest
+from PIL import Image, ImageChops, ImageStat
+
+from function.gif_operations import create_gif
+from function.image_utils import load_image, reduce_for_target, to_standard_mode
+
+# reduce() 不支持或会算错的模式
+SPECIAL_MODES = ('P', '1', 'I;16')
+
+
+def _mean_difference(a, b):
+    return sum(ImageStat.Stat(ImageChops.difference(a.convert('RGB'), b.convert('RGB'))).mean) / 3
+
+
+@pytest.mark.parametrize('mode', SPECIAL_MODES)
+def test_reduce_for_target_handles_special_modes(image_factory, mode):
+    path = image_factory(1, size=(1600, 1200), mode=mode)[0]
+    with Image.open(path) as img:
+        assert img.mode == mode
+        reduced = reduce_for_target(img, (200, 150))
+        assert reduced.size == (400, 300)
+        assert reduced.mode in ('L', 'RGB', 'RGBA')
+    with Image.open(path) as img:
+        expected = to_standard_mode(img).resize((400, 300), Image.Resampling.BOX)
+    assert _mean_difference(reduced, expected) < 2
+
+
+@pytest.mark.parametrize('mode', SPECIAL_MODES)
+def test_load_image_with_target_size(image_factory, mode):
+    path = image_factory(1, size=(1600, 1200), mode=mode)[0]
+    img = load_image(path, (200, 150))
+    assert img is not None
+    assert img.size == (400, 300)
+
+
+@pytest.mark.parametrize('mode', SPECIAL_MODES)
+def test_create_gif_downscales_special_modes(image_factory, tmp_path, mode):
+    paths = image_factory(3, size=(1600, 1200), mode=mode)
+    output = str(tmp_path / 'out.gif')
+    create_gif(paths, output, resize=(200, 150))
+    with Image.open(output) as gif:
+        assert gif.n_frames == 3
+        assert gif.size == (200, 150)
+        for index, path in enumerate(paths):
+            gif.seek(index)
+            with Image.open(path) as img:
+                expected = to_standard_mode(img).resize((200, 150), Image.Resampling.LANCZOS)
+            assert _mean_difference(gif, expected) < 12
+
+
+def test_palette_transparency_becomes_alpha(tmp_path):
+    img = Image.new('P', (800, 600), 1)
+    img.putpalette([0, 0, 0, 255, 0, 0])
+    img.paste(0, (0, 0, 400, 600))
+    img.info['transparency'] = 0
+    path = str(tmp_path / 'transparent.png')
+    img.save(path, transparency=0)
+    with Image.open(path) as opened:
+        reduced = reduce_for_target(opened, (100, 75))
+    assert reduced.mode == 'RGBA'
+    assert reduced.getpixel((0, 0))[3] == 0
+    assert reduced.getpixel((reduced.width - 1, 0)) == (255, 0, 0, 255)
+
+
+def test_sixteen_bit_is_scaled_not_clipped():
+    img = Image.new('I;16', (4, 4), 30000)
+    assert to_standard_mode(img).getpixel((0, 0)) == 30000 // 256
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+多帧图片测试：按帧引用随机访问的画面必须与 Pillow 顺序解码一致，帧索引缓存有容量和数量上限
+"""
+
+import os
+import random
+import time
+from collections import OrderedDict
+
+import pytest
+from PIL import Image, ImageChops, ImageDraw
+
+from function import multiframe
+from function.image_utils import load_image
+from function.multiframe import collect_index_garbage, get_frame_index, make_frame_ref
+
+
+@pytest.fixture(autouse=True)
+def fresh_indexes(monkeypatch):
+    """每个测试使用空的内存索引和重新统计的缓存大小"""
+    monkeypatch.setattr(multiframe, '_indexes', OrderedDict())
+    monkeypatch.setattr(multiframe, '_store_bytes', None)
+    monkeypatch.setattr(multiframe, '_gc_checked', False)
+
+
+def _delta_gif(path, count=10, seed=0):
+    """大部分画面静止的差分编码GIF，除第一帧外都依赖之前的画面"""
+    rng = random.Random(seed)
+    base = Image.effect_noise((160, 120), 64).convert('RGB')
+    images = []
+    for i in range(count):
+        img = base.copy()
+        x, y = rng.randrange(140), rng.randrange(100)
+        ImageDraw.Draw(img).rectangle((x, y, x + 20, y + 20), fill=(rng.randrange(256), 40, 200))
+        images.append(img)
+    images[0].save(str(path), save_all=True, append_images=images[1:], optimize=True, disposal=1)
+    return str(path)
+
+
+def _index_dir_bytes():
+    total = 0
+    for directory, _, names in os.walk(multiframe._index_dir()):
+        total += sum(os.path.getsize(os.path.join(directory, name)) for name in names)
+    return total
+
+
+def test_random_access_matches_sequential_decode(tmp_path, monkeypatch):
+    monkeypatch.setattr(multiframe, 'KEYFRAME_INTERVAL', 4)
+    gif_path = _delta_gif(tmp_path / 'anim.gif')
+    expected = []
+    with Image.open(gif_path) as gif:
+        for index in range(gif.n_frames):
+            gif.seek(index)
+            expected.append(gif.convert('RGB'))
+    # 先顺序访问一遍写入关键帧，再乱序访问
+    for index in list(range(len(expected))) + [9, 2, 7, 0, 5]:
+        frame = load_image(make_frame_ref(gif_path, index)).convert('RGB')
+        assert ImageChops.difference(frame, expected[index]).getbbox() is None
+
+
+def test_open_indexes_are_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(multiframe, 'MAX_OPEN_INDEXES', 2)
+    paths = [_delta_gif(tmp_path / f'anim_{i}.gif', count=3, seed=i) for i in range(4)]
+    for path in paths:
+        get_frame_index(path).frame(2)
+    assert len(multiframe._indexes) == 2
+    assert [key[0] for key in multiframe._indexes] == [os.path.abspath(path) for path in paths[2:]]
+
+
+def test_index_cache_byte_cap(tmp_path, monkeypatch):
+    monkeypatch.setattr(multiframe, 'KEYFRAME_INTERVAL', 2)
+    monkeypatch.setattr(multiframe, 'INDEX_MAX_BYTES', 300 * 1024)
+    paths = [_delta_gif(tmp_path / f'anim_{i}.gif', count=9, seed=i) for i in range(6)]
+    for path in paths:
+        get_frame_index(path).frame(8)
+        # 每个索引使用后，缓存目录的大小不超过上限
+        assert _index_dir_bytes() <= multiframe.INDEX_MAX_BYTES
+    # 最近使用的索引仍在缓存中
+    assert os.path.exists(get_frame_index(paths[-1]).index_path)
+
+
+def test_unused_indexes_are_collected(tmp_path):
+    old_path = _delta_gif(tmp_path / 'old.gif', count=3, seed=1)
+    new_path = _delta_gif(tmp_path / 'new.gif', count=3, seed=2)
+    old_index = get_frame_index(old_path).index_path
+    new_index = get_frame_index(new_path).index_path
+    stale = time.time() - multiframe.MAX_UNUSED_AGE - 60
+    os.utime(old_index, (stale, stale))
+    collect_index_garbage()
+    assert not os.path.exists(old_index)
+    assert os.path.exists(new_index)
+    assert os.path.exists(os.path.join(multiframe._index_dir(), multiframe.GC_STAMP))
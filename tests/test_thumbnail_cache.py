@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+缩略图缓存测试：调色板、黑白和16位图片缩小解码后必须得到正确的缩略图，调色板透明色不能丢失
+"""
+
+import pytest
+from PIL import Image, ImageChops, ImageStat
+
+from function.thumbnail_cache import ThumbnailCache
+from function.thumbnail_store import ThumbnailStore
+
+
+def _caches(tmp_path):
+    return [ThumbnailCache(), ThumbnailCache(store=ThumbnailStore(str(tmp_path / 'thumbnails')))]
+
+
+@pytest.mark.parametrize('mode', ['P', '1', 'I;16'])
+def test_thumbnail_for_unreducible_modes(image_factory, tmp_path, mode):
+    path = image_factory(1, size=(640, 480), mode=mode)[0]
+    reference = image_factory(1, size=(640, 480), mode='L' if mode in ('1', 'I;16') else 'RGB')[0]
+    with Image.open(reference) as img:
+        expected = img.convert('RGB').resize((80, 60), Image.Resampling.LANCZOS)
+    for cache in _caches(tmp_path):
+        thumbnail = cache.get(path, (80, 60))
+        assert thumbnail is not None
+        assert thumbnail.size == (80, 60)
+        if mode != '1':
+            # 黑白图片经过阈值化，只检查能生成缩略图
+            rms = ImageStat.Stat(ImageChops.difference(thumbnail.convert('RGB'), expected)).rms
+            assert max(rms) < 16
+
+
+def test_palette_transparency_is_kept(tmp_path):
+    img = Image.new('P', (640, 480), 1)
+    img.putpalette([0, 0, 0, 255, 0, 0])
+    img.paste(0, (0, 0, 320, 480))
+    img.info['transparency'] = 0
+    path = str(tmp_path / 'transparent.png')
+    img.save(path, transparency=0)
+    for cache in _caches(tmp_path):
+        thumbnail = cache.get(path, (80, 60))
+        assert thumbnail.mode == 'RGBA'
+        assert thumbnail.getpixel((10, 30))[3] == 0
+        assert thumbnail.getpixel((70, 30)) == (255, 0, 0, 255)